@@ -26,6 +26,18 @@ if config.config_file_name is not None:
 from app.models import SQLModel
 target_metadata = SQLModel.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Full-text search objects are not on the models (see app/search.py); keep
+    # autogenerate from proposing to drop them
+    if reflected and compare_to is None:
+        if name in ("search_vector", "ix_savedroutine_search", "ix_tasks_search"):
+            return False
+        if type_ == "table" and name.startswith(("savedroutine_fts", "tasks_fts")):
+            return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +60,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -71,7 +84,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,46 @@
+"""owner scoped tasks and owner indexes
+
+Revision ID: c4e1a9f2b7d3
+Revises: add_owner_to_tasks
+Create Date: 2025-11-03 09:12:44.318207
+
+"""
+from typing import Sequence
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e1a9f2b7d3'
+down_revision: str | Sequence[str] | None = 'add_owner_to_tasks'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+NAMING_CONVENTION = {"pk": "%(table_name)s_pkey"}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows created before tasks had an owner are unreachable through the API;
+    # keep them, but give them an explicit empty owner so the column can join the key.
+    op.execute("UPDATE tasks SET owner = '' WHERE owner IS NULL")
+    # Batch mode: SQLite cannot alter a column or a primary key in place, so there the table
+    # is copied; Postgres gets the plain ALTERs. The naming convention gives SQLite's
+    # unnamed primary key the name Postgres already uses.
+    with op.batch_alter_table('tasks', naming_convention=NAMING_CONVENTION) as batch:
+        batch.alter_column('owner', existing_type=sa.String(), nullable=False)
+        batch.drop_constraint('tasks_pkey', type_='primary')
+        # owner leads the key, so the primary key index also serves WHERE owner = ...
+        batch.create_primary_key('tasks_pkey', ['owner', 'task_name'])
+    op.create_index(op.f('ix_savedroutine_owner'), 'savedroutine', ['owner'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_savedroutine_owner'), table_name='savedroutine')
+    with op.batch_alter_table('tasks', naming_convention=NAMING_CONVENTION) as batch:
+        batch.drop_constraint('tasks_pkey', type_='primary')
+        # fails if two users now share a task name, which the old schema cannot represent
+        batch.create_primary_key('tasks_pkey', ['task_name'])
+        batch.alter_column('owner', existing_type=sa.String(), nullable=True)
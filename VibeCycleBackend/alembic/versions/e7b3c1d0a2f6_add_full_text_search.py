@@ -0,0 +1,96 @@
+"""add full text search
+
+Revision ID: e7b3c1d0a2f6
+Revises: 9a3d6e1f4c58
+Create Date: 2025-11-19 10:26:53.140927
+
+"""
+from typing import Sequence
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3c1d0a2f6'
+down_revision: str | Sequence[str] | None = '9a3d6e1f4c58'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        _upgrade_sqlite()
+        return
+    # Stored generated columns (Postgres 12+) stay in step with every write without triggers.
+    # Adding them rewrites both tables, so run this outside peak hours on large databases.
+    op.execute(
+        "ALTER TABLE savedroutine ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', content), 'B')"
+        ") STORED"
+    )
+    op.execute("CREATE INDEX ix_savedroutine_search ON savedroutine USING gin (search_vector)")
+    op.execute(
+        "ALTER TABLE tasks ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', task_name), 'A') || setweight(to_tsvector('english', coalesce(routine_type, '')), 'B')"
+        ") STORED"
+    )
+    op.execute("CREATE INDEX ix_tasks_search ON tasks USING gin (search_vector)")
+
+
+def _upgrade_sqlite() -> None:
+    # FTS5 tables kept in step by triggers, then filled from the existing rows. tasks_fts is
+    # keyed through tasks_fts_key rather than tasks' implicit rowid, which VACUUM may renumber
+    op.execute("CREATE VIRTUAL TABLE savedroutine_fts USING fts5(title, content, content='savedroutine', content_rowid='id', tokenize='porter unicode61')")
+    op.execute(
+        "CREATE TRIGGER savedroutine_fts_insert AFTER INSERT ON savedroutine BEGIN "
+        "INSERT INTO savedroutine_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER savedroutine_fts_delete AFTER DELETE ON savedroutine BEGIN "
+        "INSERT INTO savedroutine_fts (savedroutine_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END"
+    )
+    op.execute(
+        "CREATE TRIGGER savedroutine_fts_update AFTER UPDATE OF title, content ON savedroutine BEGIN "
+        "INSERT INTO savedroutine_fts (savedroutine_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO savedroutine_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END"
+    )
+    op.execute("INSERT INTO savedroutine_fts (savedroutine_fts) VALUES ('rebuild')")
+    op.execute("CREATE TABLE tasks_fts_key (id INTEGER PRIMARY KEY, owner TEXT NOT NULL, task_name TEXT NOT NULL, UNIQUE (owner, task_name))")
+    op.execute("CREATE VIRTUAL TABLE tasks_fts USING fts5(task_name, routine_type, tokenize='porter unicode61')")
+    op.execute(
+        "CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts_key (owner, task_name) VALUES (new.owner, new.task_name); "
+        "INSERT INTO tasks_fts (rowid, task_name, routine_type) VALUES (last_insert_rowid(), new.task_name, new.routine_type); END"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+        "DELETE FROM tasks_fts WHERE rowid = (SELECT id FROM tasks_fts_key WHERE owner = old.owner AND task_name = old.task_name); "
+        "DELETE FROM tasks_fts_key WHERE owner = old.owner AND task_name = old.task_name; END"
+    )
+    op.execute(
+        "CREATE TRIGGER tasks_fts_update AFTER UPDATE OF owner, task_name, routine_type ON tasks BEGIN "
+        "UPDATE tasks_fts_key SET owner = new.owner, task_name = new.task_name WHERE owner = old.owner AND task_name = old.task_name; "
+        "UPDATE tasks_fts SET task_name = new.task_name, routine_type = new.routine_type "
+        "WHERE rowid = (SELECT id FROM tasks_fts_key WHERE owner = new.owner AND task_name = new.task_name); END"
+    )
+    op.execute("INSERT INTO tasks_fts_key (owner, task_name) SELECT owner, task_name FROM tasks")
+    op.execute(
+        "INSERT INTO tasks_fts (rowid, task_name, routine_type) "
+        "SELECT k.id, t.task_name, t.routine_type FROM tasks t JOIN tasks_fts_key k ON k.owner = t.owner AND k.task_name = t.task_name"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        for name in ("tasks", "savedroutine"):
+            for event in ("insert", "delete", "update"):
+                op.execute(f"DROP TRIGGER IF EXISTS {name}_fts_{event}")
+            op.execute(f"DROP TABLE IF EXISTS {name}_fts")
+        op.execute("DROP TABLE IF EXISTS tasks_fts_key")
+        return
+    op.drop_index('ix_tasks_search', table_name='tasks')
+    op.drop_column('tasks', 'search_vector')
+    op.drop_index('ix_savedroutine_search', table_name='savedroutine')
+    op.drop_column('savedroutine', 'search_vector')
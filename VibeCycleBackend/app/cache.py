@@ -0,0 +1,199 @@
+import hashlib
+import json
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Protocol
+
+from app.settings import get_settings
+
+
+class CacheBackend(Protocol):
+    # True when every worker process sees the same entries
+    shared: bool
+
+    async def get(self, key: str) -> str | None: ...
+
+    async def set(self, key: str, value: str, ttl: float) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+
+class LRUCache:
+    """In-process LRU cache with a per-entry TTL. Safe to share across the sync worker threadpool."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class MemoryCache:
+    """Backend over an LRUCache, for a single process. Never waits, so the coroutines are only for the interface."""
+
+    shared = False
+
+    def __init__(self, cache: LRUCache) -> None:
+        self.cache = cache
+
+    async def get(self, key: str) -> Any | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self.cache.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+class RedisCache:
+    """Backend for any asyncio client speaking the Redis get/set/delete commands (redis.asyncio, fakeredis, ...)."""
+
+    shared = True
+
+    def __init__(self, client: Any, prefix: str = "vibecycle:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> str | None:
+        value = await self.client.get(self.prefix + key)
+        if isinstance(value, bytes):
+            return value.decode()
+        return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self.client.set(self.prefix + key, value, ex=max(1, math.ceil(ttl)))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+
+class CollectionVersions:
+    """Opaque per-owner version tokens for list endpoints, used to build ETags.
+
+    A mutation replaces the token with a fresh random one. A token that is missing
+    (never set, evicted or expired) is regenerated too, so a lost entry can only cause
+    a cache miss on the client, never a stale 304.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 86400.0) -> None:
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    async def current(self, collection: str, owner: str) -> str:
+        key = f"version:{collection}:{owner}"
+        token = await self.backend.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            await self.backend.set(key, token, self.ttl)
+        return token
+
+    async def bump(self, collection: str, owner: str) -> None:
+        await self.backend.set(f"version:{collection}:{owner}", uuid.uuid4().hex, self.ttl)
+
+
+class RoutineCache:
+    """Caches generated routines keyed on a normalized hash of everything that shapes the prompt.
+
+    Each user has a version token that is part of the key, so invalidating a user's
+    entries after their task set changes is a single write instead of a key scan.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = 600.0, version_ttl: float = 86400.0) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        # outlives any entry, including precomputed ones stored with a longer ttl
+        self.versions = CollectionVersions(backend, ttl=max(ttl, version_ttl))
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def shared(self) -> bool:
+        return self.backend.shared
+
+    async def key(self, username: str, model: str, energy_level: int, items: list[str], prompt_version: int) -> str:
+        normalized = sorted({item.strip().lower() for item in items if item.strip()})
+        payload = json.dumps([model, energy_level, normalized, prompt_version], separators=(",", ":"))
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        return f"routine:{username}:{await self.versions.current('routine', username)}:{digest}"
+
+    async def get(self, key: str) -> str | None:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, routine: str, ttl: float | None = None) -> None:
+        await self.backend.set(key, routine, self.ttl if ttl is None else ttl)
+
+    async def invalidate_user(self, username: str) -> None:
+        await self.versions.bump("routine", username)
+
+    def stats(self) -> dict:
+        return {"backend": type(self.backend).__name__, "shared": self.shared, "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+@lru_cache
+def _redis_client(url: str) -> Any:
+    # redis is optional; only needed when a shared cache is configured. Connections open
+    # lazily, on the event loop that first uses them, so creating it at import is fine
+    import redis.asyncio
+
+    return redis.asyncio.Redis.from_url(url)
+
+
+def build_backend(maxsize: int, ttl: float) -> CacheBackend:
+    redis_url = get_settings().redis_url
+    if redis_url:
+        return RedisCache(_redis_client(redis_url))
+    return MemoryCache(LRUCache(maxsize=maxsize, ttl=ttl))
+
+
+def build_routine_cache() -> RoutineCache:
+    settings = get_settings()
+    return RoutineCache(build_backend(settings.routine_cache_size, settings.routine_cache_ttl), ttl=settings.routine_cache_ttl)
+
+
+routine_cache = build_routine_cache()
+collection_versions = CollectionVersions(build_backend(maxsize=4096, ttl=86400.0))
@@ -0,0 +1,199 @@
+"""Per-user change feed, so clients can keep a local copy of their tasks and routines
+instead of refetching the lists after every change.
+
+Mutating endpoints publish one compact event per change after their commit:
+
+    {"id": "...", "owner": "ann", "collection": "tasks", "op": "upsert", "items": [{...}]}
+
+`op` is "upsert" (items are rows, partial for routines), "delete" (items are keys) or
+"reset" (refetch the collection; "*" means every collection). Subscribers that fall
+behind, or reconnect with an id that is no longer buffered, get a reset.
+"""
+import asyncio
+import json
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from sqlalchemy import text
+
+from app.metrics import CallbackMetric, registry
+from app.settings import get_settings
+
+CHANNEL = "vibecycle_changes"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_NOTIFY_PAYLOAD = 7900
+
+
+class ChangeFeed:
+    """In-process pub/sub: events reach subscribers connected to this worker only."""
+
+    def __init__(self, queue_size: int = 256, replay: int = 1000) -> None:
+        self.queue_size = queue_size
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        # recent events of every user, for clients resuming with Last-Event-ID
+        self._recent: deque[dict] = deque(maxlen=replay)
+        self.published = 0
+        self.overflows = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, owner: str, collection: str, op: str, items: list) -> None:
+        await self._send({"id": uuid.uuid4().hex, "owner": owner, "collection": collection, "op": op, "items": items})
+
+    async def _send(self, event: dict) -> None:
+        self.deliver(event)
+
+    def deliver(self, event: dict) -> None:
+        self.published += 1
+        self._recent.append(event)
+        for queue in self._subscribers.get(event["owner"], ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # a client this far behind is better off refetching than replaying
+                self.overflows += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(_reset(event["owner"], "*"))
+
+    def _replay(self, owner: str, last_event_id: str) -> list[dict]:
+        recent = list(self._recent)
+        for position, event in enumerate(recent):
+            if event["id"] == last_event_id:
+                return [event for event in recent[position + 1:] if event["owner"] == owner]
+        return [_reset(owner, "*")]
+
+    @contextmanager
+    def subscribe(self, owner: str, last_event_id: str | None = None) -> Iterator[asyncio.Queue]:
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        if last_event_id:
+            missed = self._replay(owner, last_event_id)
+            for event in missed if len(missed) <= self.queue_size else [_reset(owner, "*")]:
+                queue.put_nowait(event)
+        self._subscribers.setdefault(owner, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(owner)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[owner]
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "published": self.published,
+            "overflows": self.overflows,
+        }
+
+
+def _reset(owner: str, collection: str) -> dict:
+    return {"id": uuid.uuid4().hex, "owner": owner, "collection": collection, "op": "reset", "items": []}
+
+
+class PostgresChangeFeed(ChangeFeed):
+    """Fans events out to every worker through LISTEN/NOTIFY on the app database.
+
+    Publishing goes through the pooled engine; each worker keeps one extra asyncpg
+    connection that listens and hands events to its own subscribers, including the
+    publishing worker's. The engine is passed as a factory so that building the feed
+    does not create it.
+
+    A notify that fails is lost for every worker; the change it described is already
+    committed. Local subscribers get a reset at once, and a reset for the collection is
+    sent again every `reconnect_delay` seconds until it gets through to all the others.
+    """
+
+    def __init__(self, dsn: str, engine: Callable[[], Any], queue_size: int = 256, replay: int = 1000, reconnect_delay: float = 1.0) -> None:
+        super().__init__(queue_size, replay)
+        self.dsn = dsn
+        self.engine = engine
+        self.reconnect_delay = reconnect_delay
+        self._listener: asyncio.Task | None = None
+        self._resender: asyncio.Task | None = None
+        self._pending_resets: set[tuple[str, str]] = set()
+        self.failed = 0
+
+    async def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        for task in (self._listener, self._resender):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    async def _send(self, event: dict) -> None:
+        payload = json.dumps(event, separators=(",", ":"), default=str)
+        if len(payload.encode()) > MAX_NOTIFY_PAYLOAD:
+            payload = json.dumps(_reset(event["owner"], event["collection"]), separators=(",", ":"))
+        try:
+            await self._notify([payload])
+        except Exception:
+            self.failed += 1
+            self.deliver(_reset(event["owner"], event["collection"]))
+            self._pending_resets.add((event["owner"], event["collection"]))
+            if self._resender is None or self._resender.done():
+                self._resender = asyncio.create_task(self._send_resets())
+
+    async def _notify(self, payloads: list[str]) -> None:
+        async with self.engine().connect() as conn:
+            for payload in payloads:
+                await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+            await conn.commit()
+
+    async def _send_resets(self) -> None:
+        while self._pending_resets:
+            await asyncio.sleep(self.reconnect_delay)
+            pending = list(self._pending_resets)
+            try:
+                await self._notify([json.dumps(_reset(owner, collection), separators=(",", ":")) for owner, collection in pending])
+            except Exception:
+                continue
+            self._pending_resets.difference_update(pending)
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        while True:
+            lost = asyncio.Event()
+            try:
+                conn = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            try:
+                conn.add_termination_listener(lambda _: lost.set())
+                await conn.add_listener(CHANNEL, lambda _conn, _pid, _channel, payload: self.deliver(json.loads(payload)))
+                await lost.wait()
+            finally:
+                await conn.close()
+            # events sent while disconnected are gone, so every subscriber has to refetch
+            for owner in list(self._subscribers):
+                self.deliver(_reset(owner, "*"))
+
+
+def build_change_feed() -> ChangeFeed:
+    settings = get_settings()
+    queue_size, replay = settings.change_feed_queue_size, settings.change_feed_replay
+    if settings.change_feed_backend == "postgres":
+        from sqlalchemy.engine import make_url
+
+        from app.database import get_engine
+
+        # asyncpg takes a plain postgresql:// DSN, without the SQLAlchemy driver suffix
+        dsn = make_url(settings.database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresChangeFeed(dsn, get_engine, queue_size, replay)
+    return ChangeFeed(queue_size, replay)
+
+
+change_feed = build_change_feed()
+registry.register(CallbackMetric("change_feed_subscribers", "Open change feed connections on this worker.", lambda: change_feed.stats()["subscribers"]))
@@ -0,0 +1,188 @@
+"""Task completions ("done" clicks) and the daily rollups their stats are served from.
+
+A click is appended to an in-process buffer and answered straight away. The buffer is
+written every COMPLETION_FLUSH_INTERVAL seconds, or as soon as COMPLETION_BATCH events
+are waiting, in one transaction: a single multi-row insert of the events and one upsert
+adding them to the per-user, per-day counts in completion_daily. Stats only read those
+counts, never the events.
+
+Shutdown flushes the buffer; a process that dies loses at most one interval of clicks.
+"""
+import asyncio
+import math
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import services
+from app.database import insert_on_conflict, new_session
+from app.metrics import CallbackMetric, registry
+from app.models import Completion, CompletionDaily
+from app.schemas import CompletionCreate
+from app.settings import get_settings
+
+# completed_at may be sent for clicks made offline; this much clock skew is accepted
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+MAX_STATS_PERIODS = 366
+
+
+class CompletionBufferFull(Exception):
+    """Raised when `max_pending` events are waiting, e.g. while the database is down; maps to 503."""
+
+
+class CompletionBuffer:
+    """Write-behind buffer for completion events, one per process.
+
+    Events stay in the buffer until the transaction holding them commits, so a failed
+    flush is retried with the next one. The flusher starts with the first event.
+    """
+
+    def __init__(self, batch_size: int = 500, interval: float = 2.0, max_pending: int = 10000) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._events: list[dict] = []
+        self._wake: asyncio.Event | None = None
+        self._lock: asyncio.Lock | None = None
+        self._task: asyncio.Task | None = None
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+
+    @classmethod
+    def from_settings(cls) -> "CompletionBuffer":
+        settings = get_settings()
+        return cls(
+            batch_size=settings.completion_batch,
+            interval=settings.completion_flush_interval,
+            max_pending=settings.completion_buffer_size,
+        )
+
+    def add(self, owner: str, routine_id: int | None, task: str, completed_at: datetime) -> dict:
+        # called from request handlers, so there is always a running loop
+        if len(self._events) >= self.max_pending:
+            raise CompletionBufferFull()
+        event = {"owner": owner, "routine_id": routine_id, "task": task, "completed_at": completed_at.astimezone(timezone.utc)}
+        self._events.append(event)
+        if self._task is None:
+            self._wake, self._lock = asyncio.Event(), asyncio.Lock()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if len(self._events) >= self.batch_size:
+            self._wake.set()
+        return event
+
+    def pending(self, owner: str) -> bool:
+        return any(event["owner"] == owner for event in self._events)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if not await self.flush():
+                # database unavailable: retry on the interval, not on every click
+                await asyncio.sleep(self.interval)
+
+    async def flush(self) -> bool:
+        """Write every buffered event. False when a batch failed; it stays buffered."""
+        if self._lock is None:
+            return True
+        async with self._lock:
+            while self._events:
+                batch = self._events[: self.batch_size]
+                try:
+                    await self._write(batch)
+                except Exception:
+                    self.failures += 1
+                    return False
+                del self._events[: len(batch)]
+                self.flushed += len(batch)
+                self.batches += 1
+        return True
+
+    @staticmethod
+    async def _write(batch: list[dict]) -> None:
+        days = Counter((event["owner"], event["completed_at"].date()) for event in batch)
+        async with new_session() as db:
+            await db.exec(insert(Completion).values(batch))
+            stmt = insert_on_conflict(db, CompletionDaily).values(
+                [{"owner": owner, "day": day, "completions": count} for (owner, day), count in days.items()]
+            )
+            await db.exec(stmt.on_conflict_do_update(
+                index_elements=["owner", "day"],
+                set_={"completions": CompletionDaily.completions + stmt.excluded.completions},
+            ))
+            await db.commit()
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        async with self._lock:
+            # with the lock held the flusher is not midway through a write, so cancelling
+            # it cannot leave a committed batch in the buffer to be written twice
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+        self._task = self._wake = self._lock = None
+
+    def stats(self) -> dict:
+        return {"pending": len(self._events), "flushed": self.flushed, "batches": self.batches, "failures": self.failures}
+
+
+async def record_completion(db: AsyncSession, username: str, body: CompletionCreate) -> dict:
+    now = datetime.now(timezone.utc)
+    completed_at = body.completed_at or now
+    if completed_at > now + MAX_CLOCK_SKEW:
+        raise HTTPException(status_code=422, detail="completed_at is in the future")
+    if body.routine_id is not None:
+        # 404 for unknown routines and other users' routines
+        await services.get_routine(db, username, body.routine_id)
+    try:
+        event = completion_buffer.add(username, body.routine_id, body.task, completed_at)
+    except CompletionBufferFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Completions cannot be saved right now, try again shortly",
+            headers={"Retry-After": str(math.ceil(completion_buffer.interval))},
+        )
+    return {key: value for key, value in event.items() if key != "owner"}
+
+
+async def completion_stats(db: AsyncSession, username: str, period: str, periods: int) -> dict:
+    """Completions per UTC day, or per ISO week (starting Monday), for the last `periods` periods.
+
+    Read from the daily rollups: one row per day with completions, whatever the number of clicks.
+    """
+    if completion_buffer.pending(username):
+        # the caller's own clicks show up at once; other workers' within their flush interval
+        await completion_buffer.flush()
+    today = datetime.now(timezone.utc).date()
+    step = timedelta(weeks=1) if period == "week" else timedelta(days=1)
+    current: date = today - timedelta(days=today.weekday()) if period == "week" else today
+    first = current - step * (periods - 1)
+    rows = (await db.exec(
+        select(CompletionDaily.day, CompletionDaily.completions)
+        .where(CompletionDaily.owner == username, CompletionDaily.day >= first, CompletionDaily.day <= today)
+    )).all()
+    series = {first + step * i: 0 for i in range(periods)}
+    for day, count in rows:
+        series[day - timedelta(days=(day - first).days % step.days)] += count
+    return {
+        "period": period,
+        "from": first,
+        "to": today,
+        "total": sum(series.values()),
+        "series": [{"start": start, "completions": count} for start, count in series.items()],
+    }
+
+
+completion_buffer = CompletionBuffer.from_settings()
+
+registry.register(CallbackMetric("completion_buffer_pending", "Completion events waiting to be written on this worker.", lambda: completion_buffer.stats()["pending"]))
+registry.register(CallbackMetric("completions_flushed_total", "Completion events written by this worker.", lambda: completion_buffer.flushed, "counter"))
@@ -1,10 +1,95 @@
-from decouple import config
-from sqlmodel import Session, create_engine
+from functools import lru_cache
 
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-DATABASE_URL = config("DATABASE_URL")
-engine = create_engine(DATABASE_URL)
+from app.metrics import instrument_engine
+from app.settings import get_settings
 
-def get_db():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+
+# DATABASE_URL stays a plain (sync) URL so Alembic can keep using it; the app swaps in the async driver
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend in ASYNC_DRIVERS and parsed.get_driver_name() not in ("asyncpg", "aiosqlite"):
+        parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+    return parsed.render_as_string(hide_password=False)
+
+
+def create_engine_from_settings(url: str | None = None):
+    settings = get_settings()
+    async_url = async_database_url(url or settings.database_url)
+    options: dict = {"pool_pre_ping": settings.db_pool_pre_ping}
+    backend = make_url(async_url).get_backend_name()
+    if backend == "postgresql":
+        options.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            # enforced server side so a runaway query cannot pin a pooled connection
+            connect_args={"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}},
+        )
+    elif backend == "sqlite":
+        # SQLite has no statement timeout; this bounds how long a writer waits on the file lock
+        options["connect_args"] = {"timeout": settings.db_statement_timeout_ms / 1000}
+    async_engine = create_async_engine(async_url, **options)
+    if backend == "sqlite":
+        # SQLite only honours ON DELETE CASCADE with foreign keys switched on per connection
+        event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+    return async_engine
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+@lru_cache(maxsize=None)
+def get_engine():
+    # Created on first use rather than at import: the driver imports are not free, and the
+    # preloading launcher imports the app before forking, when no process may own a pool yet
+    engine = create_engine_from_settings()
+    instrument_engine(engine.sync_engine)
+    return engine
+
+
+async def dispose_engine() -> None:
+    if get_engine.cache_info().currsize:
+        await get_engine().dispose()
+        get_engine.cache_clear()
+
+
+def new_session() -> AsyncSession:
+    # expire_on_commit=False: attribute access after commit would otherwise need implicit (sync) IO
+    return AsyncSession(get_engine(), expire_on_commit=False)
+
+
+async def get_db():
+    async with new_session() as session:
+        yield session
+
+
+async def create_db_and_tables() -> None:
+    # Alembic owns the real schema; this is for SQLite test and benchmark databases
+    import app.models  # noqa: F401  (registers the tables on SQLModel.metadata)
+    from app.search import create_search_indexes
+
+    async with get_engine().begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await create_search_indexes(conn)
+
+
+def insert_on_conflict(db: AsyncSession, model):
+    # INSERT ... ON CONFLICT is dialect specific; Postgres in production, SQLite locally
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
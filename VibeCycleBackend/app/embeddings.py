@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Sequence
+
+from app.cache import LRUCache
+from app.settings import get_settings
+
+# numpy is imported where vectors are built: only requests with notes over a large task
+# library get this far, and the import would otherwise add to every worker's startup
+if TYPE_CHECKING:
+    import numpy as np
+
+# Embeds a batch of texts with the given model
+Embedder = Callable[[str, list[str]], Awaitable[list[list[float]]]]
+
+# Task names sent to the embedding endpoint per call, so a first index build stays a few round trips
+EMBED_BATCH = 256
+
+
+class TaskVectors:
+    """One user's task-name embeddings: unit-length float32 rows, one per task name."""
+
+    def __init__(self) -> None:
+        import numpy as np
+
+        self.names: list[str] = []
+        self.rows: dict[str, int] = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def missing(self, names: Sequence[str]) -> list[str]:
+        return [name for name in dict.fromkeys(names) if name not in self.rows]
+
+    def sync(self, names: Sequence[str], added: dict[str, np.ndarray]) -> None:
+        # Drop rows for tasks that are gone, then append the newly embedded ones
+        current = set(names)
+        keep = [row for row, name in enumerate(self.names) if name in current]
+        if len(keep) != len(self.names):
+            self.matrix = self.matrix[keep]
+            self.names = [self.names[row] for row in keep]
+        # a concurrent request may have added some of these while we were embedding
+        present = set(self.names)
+        added = {name: vector for name, vector in added.items() if name not in present}
+        if added:
+            import numpy as np
+
+            block = _normalize(np.stack(list(added.values())))
+            self.matrix = block if not self.names else np.vstack([self.matrix, block])
+            self.names.extend(added)
+        self.rows = {name: row for row, name in enumerate(self.names)}
+
+    def top_k(self, query: np.ndarray, k: int) -> list[str]:
+        if k >= len(self.names):
+            return list(self.names)
+        # rows and query are unit length, so the dot product is the cosine similarity
+        import numpy as np
+
+        similarity = self.matrix @ _normalize(query)
+        best = np.argpartition(-similarity, k - 1)[:k]
+        return [self.names[row] for row in best[np.argsort(-similarity[best])]]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    import numpy as np
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class TaskEmbeddings:
+    """Narrows a large task library to the `top_k` tasks most similar to the request notes.
+
+    Each user's vectors are cached in process and kept in step with their tasks by name:
+    only names the index has not seen are embedded (so POST /tasks costs one task, not
+    the whole library) and deleted names are dropped. Requests without notes, libraries
+    of at most `top_k` tasks and embedding failures leave the task list unchanged. After a
+    failure the model is left alone for `retry_after` seconds, so a missing model or a down
+    server costs one failed call per interval rather than one per request.
+    """
+
+    def __init__(
+        self, embed: Embedder, model: str, top_k: int = 30, maxsize: int = 128, ttl: float = 86400.0, retry_after: float = 30.0,
+    ) -> None:
+        self.embed = embed
+        self.model = model
+        self.top_k = top_k
+        self.retry_after = retry_after
+        self._indexes = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._retry_at = 0.0
+        self.embedded = 0
+        self.selections = 0
+        self.failures = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_settings(cls, embed: Embedder) -> "TaskEmbeddings":
+        settings = get_settings()
+        return cls(
+            embed,
+            model=settings.embed_model,
+            top_k=settings.routine_embed_top_k,
+            maxsize=settings.routine_embed_cache_size,
+            retry_after=settings.embed_retry_after,
+        )
+
+    async def select(self, username: str, notes: str | None, tasks: Sequence) -> Sequence:
+        if self.top_k <= 0 or not notes or not notes.strip() or len(tasks) <= self.top_k:
+            return tasks
+        if time.monotonic() < self._retry_at:
+            self.skipped += 1
+            return tasks
+        import numpy as np
+
+        names = [task.task_name for task in tasks]
+        index = self._indexes.get(username) or TaskVectors()
+        missing = index.missing(names)
+        try:
+            added: dict[str, np.ndarray] = {}
+            for start in range(0, len(missing), EMBED_BATCH):
+                batch = missing[start:start + EMBED_BATCH]
+                added.update(zip(batch, np.asarray(await self.embed(self.model, batch), dtype=np.float32)))
+            query = np.asarray((await self.embed(self.model, [notes]))[0], dtype=np.float32)
+        except Exception:
+            # no embedding model available: the prompt budget still trims by score
+            self.failures += 1
+            self._retry_at = time.monotonic() + self.retry_after
+            return tasks
+        index.sync(names, added)
+        self._indexes.set(username, index)
+        self.embedded += len(added)
+        self.selections += 1
+        chosen = set(index.top_k(query, self.top_k))
+        return [task for task in tasks if task.task_name in chosen]
+
+    def forget(self, username: str) -> None:
+        self._indexes.delete(username)
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "top_k": self.top_k,
+            "users": len(self._indexes),
+            "embedded": self.embedded,
+            "selections": self.selections,
+            "failures": self.failures,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,370 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+from sqlalchemy import and_, delete, or_, select, update
+
+from app.database import new_session
+from app.models import RoutineJob
+from app.settings import get_settings
+
+# Runs one job: (owner, request) -> JSON-serialisable result
+Runner = Callable[[str, dict], Awaitable[dict]]
+
+PENDING = ("queued", "running")
+PRUNE_INTERVAL = 60.0
+# Seconds a worker waits before retrying a job it could not claim because the store failed
+STORE_RETRY_DELAY = 5.0
+# Seconds between checks of the store for a cancellation made by another process
+CANCEL_POLL_INTERVAL = 2.0
+
+logger = logging.getLogger("vibecycle.jobs")
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are pending; maps to 429 with Retry-After."""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+@dataclass
+class Job:
+    id: str
+    owner: str
+    key: str
+    request: dict
+    status: str = "queued"
+    result: dict | None = None
+    error: str | None = None
+    created_at: datetime = field(default_factory=_utcnow)
+    finished_at: datetime | None = None
+    task: asyncio.Task | None = field(default=None, repr=False)
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """Optional durable copy of the job table so queued jobs survive a restart."""
+
+    def _row(self, job: Job) -> dict:
+        return {
+            "id": job.id,
+            "owner": job.owner,
+            "dedup_key": job.key,
+            "status": job.status,
+            "request": json.dumps(job.request),
+            "result": json.dumps(job.result) if job.result is not None else None,
+            "error": job.error,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+        }
+
+    @staticmethod
+    def _job(row: RoutineJob) -> Job:
+        job = Job(
+            id=row.id,
+            owner=row.owner,
+            key=row.dedup_key,
+            request=json.loads(row.request),
+            status=row.status,
+            result=json.loads(row.result) if row.result else None,
+            error=row.error,
+            created_at=row.created_at,
+            finished_at=row.finished_at,
+        )
+        if job.status not in PENDING:
+            job.done.set()
+        return job
+
+    async def insert(self, job: Job) -> None:
+        async with new_session() as db:
+            db.add(RoutineJob(**self._row(job)))
+            await db.commit()
+
+    async def claim(self, job: Job) -> bool:
+        # conditional update, so a job recovered by several processes still runs once
+        async with new_session() as db:
+            claimed = await db.exec(
+                update(RoutineJob).where(RoutineJob.id == job.id, RoutineJob.status == "queued").values(status="running")
+            )
+            await db.commit()
+        return claimed.rowcount == 1
+
+    async def save(self, job: Job) -> bool:
+        # only a pending row is updated, so a cancellation made by another process is never
+        # overwritten by the result of the run it interrupted
+        row = self._row(job)
+        async with new_session() as db:
+            saved = await db.exec(
+                update(RoutineJob)
+                .where(RoutineJob.id == job.id, RoutineJob.status.in_(PENDING))
+                .values(**{k: row[k] for k in ("status", "result", "error", "finished_at")})
+            )
+            await db.commit()
+        return saved.rowcount == 1
+
+    async def cancel(self, job_id: str) -> bool:
+        async with new_session() as db:
+            cancelled = await db.exec(
+                update(RoutineJob)
+                .where(RoutineJob.id == job_id, RoutineJob.status.in_(PENDING))
+                .values(status="cancelled", finished_at=_utcnow())
+            )
+            await db.commit()
+        return cancelled.rowcount == 1
+
+    async def load(self, job_id: str) -> Job | None:
+        async with new_session() as db:
+            row = await db.get(RoutineJob, job_id)
+        return self._job(row) if row is not None else None
+
+    async def queued(self) -> list[Job]:
+        async with new_session() as db:
+            rows = (await db.exec(select(RoutineJob).where(RoutineJob.status == "queued").order_by(RoutineJob.created_at))).scalars().all()
+        return [self._job(row) for row in rows]
+
+    async def prune(self, cutoff: datetime) -> None:
+        # finished jobs past retention; running rows that old were orphaned by a stopped process
+        async with new_session() as db:
+            await db.exec(
+                delete(RoutineJob).where(
+                    or_(
+                        RoutineJob.finished_at < cutoff,
+                        and_(RoutineJob.status == "running", RoutineJob.created_at < cutoff),
+                    )
+                )
+            )
+            await db.commit()
+
+
+class JobManager:
+    """In-process worker pool for routine generation jobs.
+
+    A user submitting a request identical to one of their pending jobs gets that job
+    back instead of a new one. Finished jobs are kept for `ttl` seconds so clients can
+    collect the result. Workers start with the app (or the first submission, whichever
+    comes first); with a store, that is also when queued jobs from a previous run resume.
+    """
+
+    def __init__(self, runner: Runner, workers: int = 2, ttl: float = 600.0, max_pending: int = 100, store: JobStore | None = None) -> None:
+        self.runner = runner
+        self.workers = workers
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.store = store
+        self.jobs: dict[str, Job] = {}
+        self._pending: dict[tuple[str, str], Job] = {}
+        self._queue: asyncio.Queue[Job] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._pruned_at = float("-inf")
+        # finished jobs whose final state could not be written to the store yet
+        self._unsaved: dict[str, Job] = {}
+
+    @classmethod
+    def from_settings(cls, runner: Runner) -> "JobManager":
+        settings = get_settings()
+        return cls(
+            runner,
+            workers=settings.routine_job_workers,
+            ttl=settings.routine_job_ttl,
+            max_pending=settings.routine_job_queue_size,
+            store=JobStore() if settings.routine_jobs_durable else None,
+        )
+
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.store is not None:
+            for job in await self.store.queued():
+                self._track(job)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._queue = [], None
+        await self._save_unsaved()
+
+    def _track(self, job: Job) -> None:
+        self.jobs[job.id] = job
+        self._pending[(job.owner, job.key)] = job
+        self._queue.put_nowait(job)
+
+    async def submit(self, owner: str, key: str, request: dict) -> tuple[Job, bool]:
+        """Queue a job, or return the caller's identical pending job. The flag is True for a new job."""
+        await self.start()
+        await self.prune()
+        existing = self._pending.get((owner, key))
+        if existing is not None:
+            return existing, False
+        if len(self._pending) >= self.max_pending:
+            raise JobQueueFull()
+        job = Job(id=uuid.uuid4().hex, owner=owner, key=key, request=request)
+        if self.store is not None:
+            await self.store.insert(job)
+        self._track(job)
+        return job, True
+
+    async def get(self, owner: str, job_id: str) -> Job | None:
+        await self.prune()
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            # finished before a restart, or run by another process
+            job = await self.store.load(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    async def wait(self, job: Job, timeout: float) -> Job:
+        # long-poll: return as soon as the job finishes or the timeout passes
+        if timeout > 0 and job.status in PENDING and job.id in self.jobs:
+            try:
+                await asyncio.wait_for(job.done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def cancel(self, job: Job) -> Job:
+        if job.id not in self.jobs:
+            if self.store is None or job.status not in PENDING:
+                return job
+            # run by another process, whose worker sees the cancelled row on its next poll
+            await self.store.cancel(job.id)
+            return await self.store.load(job.id) or job
+        if job.status == "queued":
+            await self._finish(job, "cancelled")
+        elif job.status == "running" and job.task is not None:
+            # the worker records the cancellation once the generation unwinds
+            job.task.cancel()
+            await asyncio.wait({job.task})
+        return job
+
+    async def prune(self) -> None:
+        # at most once per PRUNE_INTERVAL, so polling does not turn into a delete per request
+        now = time.monotonic()
+        if now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        cutoff = _utcnow() - timedelta(seconds=self.ttl)
+        await self._save_unsaved()
+        # unsaved jobs stay in memory, where their result can still be collected
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff and job_id not in self._unsaved
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        if self.store is not None:
+            try:
+                await self.store.prune(cutoff)
+            except Exception:
+                logger.exception("Could not prune the job store")
+
+    async def _finish(self, job: Job, status: str, result: dict | None = None, error: str | None = None) -> None:
+        job.status, job.result, job.error, job.finished_at = status, result, error, _utcnow()
+        job.task = None
+        if self._pending.get((job.owner, job.key)) is job:
+            del self._pending[(job.owner, job.key)]
+        if self.store is not None:
+            await self._save(job)
+        # after the save, which may replace the status with one recorded by another process
+        job.done.set()
+
+    async def _save(self, job: Job) -> None:
+        try:
+            saved = await self.store.save(job)
+        except Exception:
+            # the result stays in memory; prune() and stop() try again
+            logger.exception("Could not save job %s, will retry", job.id)
+            self._unsaved[job.id] = job
+            return
+        self._unsaved.pop(job.id, None)
+        if not saved:
+            # finished elsewhere first (cancelled by another process); the store's state wins
+            stored = await self.store.load(job.id)
+            if stored is not None:
+                job.status, job.result, job.error, job.finished_at = stored.status, stored.result, stored.error, stored.finished_at
+
+    async def _cancelled_in_store(self, job: Job) -> bool:
+        try:
+            stored = await self.store.load(job.id)
+        except Exception:
+            logger.exception("Could not check job %s for cancellation", job.id)
+            return False
+        return stored is not None and stored.status == "cancelled"
+
+    async def _save_unsaved(self) -> None:
+        for job in list(self._unsaved.values()):
+            await self._save(job)
+
+    async def _worker(self) -> None:
+        # One failing job or store call must not end the worker: the pool would shrink
+        # silently until the process restarts
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except Exception:
+                logger.exception("Job %s failed in the worker", job.id)
+
+    async def _run(self, job: Job) -> None:
+        if job.status != "queued":
+            return  # cancelled while waiting
+        if self.store is not None:
+            try:
+                claimed = await self.store.claim(job)
+            except Exception:
+                logger.exception("Could not claim job %s, retrying in %ss", job.id, STORE_RETRY_DELAY)
+                await asyncio.sleep(STORE_RETRY_DELAY)
+                self._queue.put_nowait(job)
+                return
+            if not claimed:
+                # another process took it; forget the local copy
+                self._pending.pop((job.owner, job.key), None)
+                self.jobs.pop(job.id, None)
+                return
+        job.status = "running"
+        job.task = asyncio.create_task(self.runner(job.owner, job.request))
+        # with a store, a DELETE handled by another process only reaches this worker through the row
+        poll = CANCEL_POLL_INTERVAL if self.store is not None else None
+        try:
+            while not (await asyncio.wait({job.task}, timeout=poll))[0]:
+                if await self._cancelled_in_store(job):
+                    job.task.cancel()
+        except asyncio.CancelledError:
+            job.task.cancel()
+            raise
+        if job.task.cancelled():
+            await self._finish(job, "cancelled")
+        elif job.task.exception() is not None:
+            exc = job.task.exception()
+            await self._finish(job, "failed", error=str(exc) or type(exc).__name__)
+        else:
+            await self._finish(job, "succeeded", result=job.task.result())
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers, "ttl": self.ttl, "max_pending": self.max_pending, "durable": self.store is not None,
+            "jobs": counts, "unsaved": len(self._unsaved),
+        }
@@ -0,0 +1,165 @@
+"""Preloading multi-worker launcher:
+
+    python -m app.launcher --workers 4 --host 0.0.0.0 --port 8000
+
+The app and its heavy dependencies are imported once, in this process; the listening
+socket is bound, then the workers are forked from it. They share the imported code and
+module state copy-on-write, so each extra worker costs only what it writes to and starts
+serving without importing anything. Whatever must be per process (database pool, change
+feed listener, background workers, model warm-up) starts in each worker's lifespan.
+
+POSIX only; elsewhere use `uvicorn app.main:app --workers N`, which imports in every worker.
+
+More than one worker needs the state workers must agree on kept outside them: REDIS_URL
+for the caches and rate limits, CHANGE_FEED_BACKEND=postgres for the change feed. Without
+them the launcher refuses to start several workers unless --allow-local-state is given.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+from app.settings import get_settings
+
+logger = logging.getLogger("vibecycle.launcher")
+
+# Seconds before a worker that died unexpectedly is replaced, so a worker failing at
+# startup is not restarted in a tight loop
+RESTART_DELAY = 1.0
+
+
+def preload() -> None:
+    # Everything a worker would otherwise import at startup or on its first requests
+    import app.main  # noqa: F401
+    import numpy  # noqa: F401
+    import ollama  # noqa: F401
+
+    if get_settings().mcp_mount:
+        import app.mcp_tools  # noqa: F401
+
+
+def local_state() -> list[str]:
+    """What each worker would keep to itself, going stale whenever another worker handles a write."""
+    settings = get_settings()
+    problems = []
+    if not settings.redis_url:
+        problems.append("REDIS_URL is empty: routine cache, auth cache and rate limits are per worker")
+    if settings.change_feed_backend == "memory":
+        problems.append("CHANGE_FEED_BACKEND=memory: change events only reach clients of the worker that made them")
+    return problems
+
+
+def bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve(sock: socket.socket, args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from app.main import app
+
+    config = uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Launcher:
+    def __init__(self, sock: socket.socket, args: argparse.Namespace) -> None:
+        self.sock = sock
+        self.args = args
+        self.workers: set[int] = set()
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Own process group, so a Ctrl+C in the terminal reaches the launcher only and
+            # each worker gets exactly one SIGTERM (a second one makes uvicorn skip the shutdown)
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                serve(self.sock, self.args)
+            except BaseException:
+                logger.exception("Worker %d failed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers.add(pid)
+        logger.info("Started worker %d", pid)
+
+    def stop(self, signum, frame) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Stopping %d workers", len(self.workers))
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            self.workers.discard(pid)
+            if not self.stopping:
+                logger.warning("Worker %d exited (status %d), restarting", pid, os.waitstatus_to_exitcode(status))
+                time.sleep(RESTART_DELAY)
+                if not self.stopping:
+                    self.spawn()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: WEB_CONCURRENCY)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument(
+        "--allow-local-state", action="store_true",
+        help="start several workers even though caches, rate limits or the change feed are per worker",
+    )
+    args = parser.parse_args()
+    args.workers = args.workers or get_settings().web_concurrency
+    if not hasattr(os, "fork"):
+        parser.error("forking is not available on this platform; use uvicorn app.main:app --workers N")
+    problems = local_state() if args.workers > 1 else []
+    if problems and not args.allow_local_state:
+        parser.error(f"{args.workers} workers would not share state:\n  " + "\n  ".join(problems) + "\nset them, use --workers 1 or pass --allow-local-state")
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(levelname)s:     [launcher] %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(args.log_level.upper())
+    for problem in problems:
+        logger.warning("%s; clients may see stale data or get more than their rate limit", problem)
+    started = time.perf_counter()
+    preload()
+    sock = bind(args.host, args.port)
+    # Move everything imported so far out of the collector's generations: collections in the
+    # workers then never touch (and so never copy) the pages holding the shared objects
+    gc.collect()
+    gc.freeze()
+    logger.info("Preloaded in %.2fs, serving on %s:%d with %d workers", time.perf_counter() - started, args.host, args.port, args.workers)
+    Launcher(sock, args).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator
+
+from app.metrics import CallbackMetric, llm_generation_duration, llm_queue_wait, record_llm_response, registry
+from app.settings import get_settings
+
+
+class GatewayBusy(Exception):
+    """Raised when the generation queue is full; maps to 429 with Retry-After."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("LLM gateway queue is full")
+        self.retry_after = retry_after
+
+
+class GatewayTimeout(Exception):
+    """Raised when a generation exceeds the per-call timeout; maps to 504."""
+
+
+class LLMGateway:
+    """Single entry point to the model server.
+
+    At most `concurrency` generations run at once over a pooled connection; up to
+    `max_queue` more wait for a slot and anything beyond that is rejected immediately.
+    Identical prompts that are already in flight share one generation.
+    """
+
+    def __init__(
+        self,
+        host: str | None = None,
+        concurrency: int = 2,
+        max_queue: int = 16,
+        timeout: float = 120.0,
+        retry_after: int = 5,
+        keep_alive: float | str | None = None,
+    ) -> None:
+        # imported here: ollama (and httpx under it) is among the slowest imports of the app,
+        # and nothing needs it before the first generation or the warm-up
+        import httpx
+        import ollama
+
+        self.client = ollama.AsyncClient(
+            host=host,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        # embeddings get their own small pool so they never queue behind long generations
+        self.embed_client = ollama.AsyncClient(host=host, limits=httpx.Limits(max_connections=2, max_keepalive_connections=2))
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        # how long the model server keeps the model loaded after each call; None uses its default
+        self.keep_alive = keep_alive
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._flights: dict[str, asyncio.Future] = {}
+        self.waiting = 0
+        self.in_flight = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    @classmethod
+    def from_settings(cls) -> "LLMGateway":
+        settings = get_settings()
+        return cls(
+            host=settings.ollama_host,
+            concurrency=settings.llm_concurrency,
+            max_queue=settings.llm_queue_size,
+            timeout=settings.llm_timeout,
+            retry_after=settings.llm_retry_after,
+            keep_alive=settings.llm_keep_alive,
+        )
+
+    def check_admission(self) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise GatewayBusy(self.retry_after)
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        self.check_admission()
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+            llm_queue_wait.observe(time.perf_counter() - started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    @staticmethod
+    def _flight_key(model: str, prompt: str, options: dict) -> str:
+        payload = json.dumps([model, prompt, options], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    async def _generate(self, model: str, prompt: str, options: dict) -> Any:
+        async with self._slot():
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.generate(model=model, prompt=prompt, **{"keep_alive": self.keep_alive, **options}), self.timeout
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise GatewayTimeout(f"Generation exceeded {self.timeout:g}s") from None
+            llm_generation_duration.observe(time.perf_counter() - started, model, "generate")
+            record_llm_response(model, response)
+            return response
+
+    async def generate(self, model: str, prompt: str, **options: Any) -> Any:
+        key = self._flight_key(model, prompt, options)
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            flight = asyncio.ensure_future(self._generate(model, prompt, options))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        # shield so one caller going away does not cancel the generation others are waiting on
+        return await asyncio.shield(flight)
+
+    async def stream(self, model: str, prompt: str, **options: Any) -> AsyncIterator[Any]:
+        async with self._slot():
+            started = time.perf_counter()
+            try:
+                parts = await asyncio.wait_for(
+                    self.client.generate(model=model, prompt=prompt, stream=True, **{"keep_alive": self.keep_alive, **options}), self.timeout
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise GatewayTimeout(f"Generation exceeded {self.timeout:g}s") from None
+            try:
+                while True:
+                    try:
+                        part = await asyncio.wait_for(anext(parts), self.timeout)
+                    except StopAsyncIteration:
+                        llm_generation_duration.observe(time.perf_counter() - started, model, "stream")
+                        return
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        raise GatewayTimeout(f"No output from model for {self.timeout:g}s") from None
+                    if "done" in part and part["done"]:
+                        # the final chunk carries the token counts and durations
+                        record_llm_response(model, part)
+                    yield part
+            finally:
+                # closing the upstream stream drops the connection, which stops generation
+                await parts.aclose()
+
+    async def warm(self, model: str) -> None:
+        # an empty prompt just loads the model, so the first real request skips the load time
+        async with self._slot():
+            try:
+                await asyncio.wait_for(self.client.generate(model=model, prompt="", keep_alive=self.keep_alive), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise GatewayTimeout(f"Loading {model} exceeded {self.timeout:g}s") from None
+
+    async def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        # short calls on a separate model, so they bypass the generation slots but keep the timeout
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self.embed_client.embed(model=model, input=inputs, keep_alive=self.keep_alive), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise GatewayTimeout(f"Embedding exceeded {self.timeout:g}s") from None
+        llm_generation_duration.observe(time.perf_counter() - started, model, "embed")
+        return response["embeddings"]
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+@lru_cache
+def get_gateway() -> LLMGateway:
+    return LLMGateway.from_settings()
+
+
+def _gateway_stat(name: str) -> int:
+    # a scrape must not build the gateway (and its client) before anything has used it
+    return get_gateway().stats()[name] if get_gateway.cache_info().currsize else 0
+
+
+for _name, _kind, _help in (
+    ("in_flight", "gauge", "Generations currently running on the model server."),
+    ("waiting", "gauge", "Requests waiting for a gateway slot."),
+    ("coalesced", "counter", "Requests that joined an identical in-flight generation."),
+    ("rejected", "counter", "Requests rejected with 429 because the queue was full."),
+    ("timeouts", "counter", "Generations abandoned after LLM_TIMEOUT."),
+):
+    _metric = f"llm_gateway_{_name}_total" if _kind == "counter" else f"llm_gateway_{_name}"
+    registry.register(CallbackMetric(_metric, _help, lambda name=_name: _gateway_stat(name), _kind))
@@ -1,24 +1,74 @@
 from datetime import timedelta, datetime, timezone
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlmodel import Session, select
-from sqlalchemy import text
-from typing import Annotated
-
-from app.database import get_db
-from app.models import User, Tasks, SavedRoutine
-from app.schemas import CreateUserRequest, Token, UpdateSavedRoutine, RoutineGenerateRequest
+from starlette.requests import HTTPConnection
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, case, delete, false, func, insert, text, update
+from typing import Annotated, Literal
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager, nullcontext
+
+from app.database import dispose_engine, get_db, get_engine, new_session
+from app.models import User, Tasks, SavedRoutine, RoutineItem
+from app.schemas import CreateUserRequest, Token, UpdateSavedRoutine, RoutineGenerateRequest, RoutinePlan, WeeklyRoutineRequest
 from app.routers import ai, auth
 from pydantic import BaseModel
 from app.routers.auth import get_current_user
-from app.schemas import CreateSavedRoutine
-
-import ollama
-
-app = FastAPI(title="Vibe Cycle")
-
+from app.schemas import CompletionCreate, CreateSavedRoutine
+from app.cache import collection_versions, routine_cache
+from app.changes import change_feed
+from app.pagination import ListParams, conditional_list, decode_cursor, encode_cursor, paginate
+from app.llm.gateway import GatewayBusy, GatewayTimeout, get_gateway
+from app.jobs import JobManager, JobQueueFull
+from app.metrics import MetricsMiddleware, http_exceptions, registry
+from app.ratelimit import RateLimitMiddleware, rate_limiter
+from app import completions, search, services, transfer
+from app.search import SearchParams
+from app.settings import get_settings
+from app.routines import (
+    ROUTINE_MODEL,
+    ROUTINE_PROMPT_VERSION,
+    build_routine_text_prompt,
+    rank_routine_items,
+    collect_routine_items,
+    parse_routine_output,
+    render_routine_text,
+)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Per-process resources start here, once per worker: with the preloading launcher the
+    # module is imported before the fork, when nothing may own a pool or socket yet
+    get_engine()
+    # Workers start now rather than with the first submission, so durable jobs left queued
+    # by a previous run are picked up even if nobody submits a new one
+    await routine_jobs.start()
+    # Load the routine model in the background; startup must not wait on (or fail with) the model server
+    warmup = asyncio.create_task(_warm_model()) if LLM_WARMUP else None
+    await change_feed.start()
+    mcp_app = _mount_mcp(app) if MCP_MOUNT else None
+    # a mounted app's lifespan does not run by itself; the MCP session manager needs it
+    async with mcp_app.lifespan(app) if mcp_app is not None else nullcontext():
+        yield
+    await change_feed.stop()
+    if warmup is not None:
+        warmup.cancel()
+    await services.routine_precompute.stop()
+    await routine_jobs.stop()
+    await completions.completion_buffer.stop()
+    await dispose_engine()
+
+
+app = FastAPI(title="Vibe Cycle", lifespan=lifespan)
+
+
+# Innermost: runs before routing and any DB or model work, and its 429s still get CORS headers
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
 # Allow calls from the frontend dev server and provide permissive headers
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +78,8 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+# Outermost, so the timings include CORS handling
+app.add_middleware(MetricsMiddleware)
 
 
 @app.exception_handler(Exception)
@@ -37,31 +89,76 @@ async def global_exception_handler(request, exc):
     from fastapi.responses import JSONResponse
     import traceback
 
+    http_exceptions.inc(type(exc).__name__)
     tb = traceback.format_exc()
     return JSONResponse(status_code=500, content={"detail": "Internal server error", "error": str(exc), "trace": tb})
 
+@app.exception_handler(GatewayBusy)
+async def gateway_busy_handler(request, exc: GatewayBusy):
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Routine generation is busy, try again shortly"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(GatewayTimeout)
+async def gateway_timeout_handler(request, exc: GatewayTimeout):
+    return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content={"detail": str(exc)})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    # Prometheus text exposition format; scrape from inside the deployment, it is not authenticated
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(ai.router, prefix="/ai", tags=["ai"])
 
+# MCP tools for agents at /mcp/, in-process with the same pool, caches and gateway limits
+MCP_MOUNT = get_settings().mcp_mount
+
+
+def _mount_mcp(app: FastAPI):
+    # Mounted at startup rather than import: fastmcp is the slowest import of the app, and
+    # scripts that only need the routes should not pay for it. Each startup gets a fresh
+    # http app, since its session manager can only run once.
+    from app.mcp_tools import mcp
+
+    mcp_app = mcp.http_app(path="/")
+    app.router.routes[:] = [route for route in app.router.routes if getattr(route, "path", None) != "/mcp"]
+    app.mount("/mcp", mcp_app)
+    return mcp_app
+
+
 ### GET ###
 
 @app.get("/tasks")
-def get_tasks(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> list[Tasks]:
-    # return only tasks owned by the authenticated user
-    return db.exec(select(Tasks).where(Tasks.owner == current_user.username)).all()
+async def get_tasks(request: Request, response: Response, params: ListParams = Depends(), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[dict]:
+    if cached := await conditional_list("tasks", current_user.username, request, response):
+        return cached
+    return await services.list_tasks(db, current_user.username, params, response)
+
+@app.get("/tasks/search")
+async def search_tasks(response: Response, params: SearchParams = Depends(), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[dict]:
+    # declared before /tasks/{task_name}, which would otherwise take "search" as a name
+    return await search.search_tasks(db, current_user.username, params, response)
 
 @app.get("/tasks/{task_name}")
-def get_task(task_name: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> Tasks:
-    task: Tasks | None = db.get(Tasks, task_name)
-    if not task or task.owner != current_user.username:
+async def get_task(task_name: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> Tasks:
+    task: Tasks | None = await db.get(Tasks, {"owner": current_user.username, "task_name": task_name})
+    if not task:
         raise HTTPException(status_code=404, detail=f"Task '{task_name}' not found")
     return task
 
 @app.get("/users")
-async def get_users(db: Session = Depends(get_db)) -> list[User]:
-    users = db.exec(select(User)).all()
+async def get_users(request: Request, response: Response, params: ListParams = Depends(), db: AsyncSession = Depends(get_db)) -> list[dict]:
+    if cached := await conditional_list("users", "*", request, response):
+        return cached
+    # hashed_password is never selectable
+    users = await paginate(db, User, params, key=["username"], allowed=["username"], response=response)
 
-    if not users:
+    if not users and not params.cursor:
         raise HTTPException(status_code=404, detail="No users found")
     return users
 
@@ -76,170 +173,384 @@ async def read_own_items(current_user: User = Depends(auth.get_current_user)) ->
 ### POST ###
 
 @app.post("/tasks", status_code=status.HTTP_201_CREATED)
-def create_task(task: Tasks, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> dict:
-    # Normalize incoming task to only include the name for lookup
-    incoming = Tasks(task_name=task.task_name)
-
-    # Check for existing task with the same primary key
-    existing: Tasks | None = db.get(Tasks, incoming.task_name)
-    if existing:
-        # If it belongs to another user, refuse to create/update
-        if existing.owner and existing.owner != current_user.username:
-            raise HTTPException(status_code=409, detail="Task name already exists for another user")
-        # Otherwise treat as an idempotent update for the same owner
-        existing.owner = current_user.username
-        # copy optional fields if provided
-        if getattr(task, "routine_type", None) is not None:
-            existing.routine_type = task.routine_type
-        if getattr(task, "necessity_level", None) is not None:
-            existing.necessity_level = task.necessity_level
-        if getattr(task, "difficulty_level", None) is not None:
-            existing.difficulty_level = task.difficulty_level
-        if getattr(task, "amount_of_time", None) is not None:
-            existing.amount_of_time = task.amount_of_time
-        db.add(existing)
-        db.commit()
-        db.refresh(existing)
-        return {"response": "task updated"}
-
-    # No existing task, create new and set owner
-    incoming.owner = current_user.username
-    # copy optional metadata
-    incoming.routine_type = getattr(task, "routine_type", None)
-    incoming.necessity_level = getattr(task, "necessity_level", None)
-    incoming.difficulty_level = getattr(task, "difficulty_level", None)
-    incoming.amount_of_time = getattr(task, "amount_of_time", None)
-
-    db.add(incoming)
-    db.commit()
-    db.refresh(incoming)
-    return {"response": "task created"}
+async def create_task(task: Tasks, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    # Task names are scoped per owner, so creating an existing name is an idempotent update
+    await services.save_task_rows(db, current_user.username, [services.task_row(task, current_user.username)])
+    return {"response": "task saved"}
+
+
+@app.post("/tasks:batch")
+async def create_tasks_batch(tasks: list[Tasks], current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    return {"results": await services.upsert_tasks(db, current_user.username, tasks)}
+
+
+@app.delete("/tasks:batch")
+async def delete_tasks_batch(task_names: list[str], current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    return {"results": await services.delete_tasks(db, current_user.username, task_names)}
 
 @app.post("/routine")
-def generate_routine(body: RoutineGenerateRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> dict:
-    # Validate energy level via Pydantic (1-5)
-    energy_level = body.energy_level
-
-    # Fetch user's tasks from DB
-    db_tasks: list[Tasks] = db.exec(select(Tasks).where(Tasks.owner == current_user.username)).all()
-
-    # Helper to normalize text and strip simple HTML
-    import re
-
-    def strip_tags(s: str) -> str:
-        return re.sub(r"<[^>]+>", "", s or "").strip()
-
-    # Collect client-supplied items (prefer notes over explicit list when present)
-    client_items: list[str] = []
-    if body.notes:
-        notes_text = strip_tags(body.notes)
-        # split by newlines and common separators
-        parts = [p.strip() for p in re.split(r"[\r\n;•\-\u2022,]+", notes_text) if p.strip()]
-        client_items.extend(parts)
-    if body.tasks:
-        # explicit tasks override/augment; keep them after notes so notes are preferred
-        client_items.extend([t.strip() for t in body.tasks if t and t.strip()])
-
-    # Build final merged list (notes/tasks first, then DB tasks), dedupe case-insensitively
-    final_items: list[str] = []
-    seen = set()
-
-    def add_item(name: str):
-        key = name.strip().lower()
-        if not key or key in seen:
+async def generate_routine(body: RoutineGenerateRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    return await services.generate_routine(db, current_user.username, body)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/routine/week")
+async def generate_week(body: WeeklyRoutineRequest, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    return await services.generate_week(db, current_user.username, body)
+
+
+@app.post("/routine/stream")
+async def stream_routine(
+    body: RoutineGenerateRequest,
+    request: Request,
+    granularity: Literal["token", "line"] = "token",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    if body.mode != "llm":
+        # only the model's own text can be streamed; the scheduler's plan comes back whole from POST /routine
+        raise HTTPException(status_code=422, detail=f"mode={body.mode} cannot be streamed, use POST /routine")
+    db_tasks = await services.select_task_rows(db, current_user.username)
+    final_items = collect_routine_items(body, db_tasks)
+    gateway = get_gateway()
+    # Reject before the response starts so a saturated server still answers 429
+    gateway.check_admission()
+
+    async def events():
+        if not final_items:
+            yield _sse("done", {"routine": "No tasks found. Add some tasks first to generate routines."})
             return
-        seen.add(key)
-        final_items.append(name.strip())
-
-    for item in client_items:
-        add_item(item)
-
-    for t in db_tasks:
-        # include any DB task names (and amount_of_time if present)
-        name = t.task_name
-        if getattr(t, "amount_of_time", None):
-            name = f"{name} ({t.amount_of_time} min)"
-        add_item(name)
-
-    if not final_items:
-        return {"routine": "No tasks found. Add some tasks first to generate routines."}
-
-    task_list = "; ".join(final_items)
-
-    prompt: str = (
-        f"Generate one morning routine and one evening routine in a list format that includes the estimated amount of time for each task with the total estimated amount of time at the end of each list for someone with an energy level of {energy_level}. "
-        f"Include optional additional tasks that can be done if the person has a little more energy. "
-        f"Prefer tasks from the user's available tasks list and use that list as the primary source. "
-        f"User tasks: {task_list}. "
-    f"If a task from the list is not applicable, you may skip it, but favor items from the provided list. "
-    f"Do not use the '*' character anywhere in the output; avoid asterisk bullets. Use hyphens ('-') or numbered lists instead."
-    f" Produce ONLY a list of tasks with an estimated duration for each task, followed by a single line with the total estimated time. "
-    f"Do NOT include section headings, explanations, optional sections, or any extra commentary. "
-    f"Each task must appear on its own line in one of these formats (examples):\n"
-    f"- Task name (10 min)\n"
-    f"1. Task name - 10 min\n"
-    f"At the end include exactly one line that starts with 'Total estimated time:' followed by the total (e.g. 'Total estimated time: 45 min')."
-    f" If the user has no tasks, return a single line: 'No tasks available.'"
-    )
+
+        # own tag: the streamed result is free text, not the structured plan generate_routine caches
+        cache_key = await routine_cache.key(current_user.username, f"stream:{ROUTINE_MODEL}", body.energy_level, final_items, ROUTINE_PROMPT_VERSION)
+        cached = await routine_cache.get(cache_key)
+        if cached is not None:
+            yield _sse("done", {**json.loads(cached), "cached": True})
+            return
+
+        prompt_tasks = await services.task_embeddings.select(current_user.username, body.notes, db_tasks)
+        prompt = build_routine_text_prompt(body.energy_level, rank_routine_items(body, prompt_tasks))
+        chunks: list[str] = []
+        pending_line = ""
+        last_part = None
+        stream = gateway.stream(model=ROUTINE_MODEL, prompt=prompt.text)
+        try:
+            async for part in stream:
+                if await request.is_disconnected():
+                    # Closing the stream below drops the upstream connection, which stops generation
+                    return
+                last_part = part
+                token = part["response"]
+                chunks.append(token)
+                if granularity == "token":
+                    yield _sse("token", {"token": token})
+                    continue
+                pending_line += token
+                *lines, pending_line = pending_line.split("\n")
+                for line in lines:
+                    if line.strip():
+                        yield _sse("line", {"line": line.strip()})
+        except Exception as e:
+            yield _sse("error", {"detail": f"Error generating routine: {str(e)}"})
+            return
+        finally:
+            await stream.aclose()
+
+        if granularity == "line" and pending_line.strip():
+            yield _sse("line", {"line": pending_line.strip()})
+        result = {**services.routine_result("".join(chunks)), "prompt": prompt.meta(last_part)}
+        await routine_cache.set(cache_key, json.dumps(result))
+        yield _sse("done", result)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/routine/cache")
+async def routine_cache_stats(current_user: User = Depends(get_current_user)) -> dict:
+    return {**routine_cache.stats(), "precompute": services.routine_precompute.stats(), "embeddings": services.task_embeddings.stats()}
+
+
+async def _run_routine_job(owner: str, request: dict) -> dict:
+    return await services.generate_in_background(owner, RoutineGenerateRequest.model_validate(request))
+
+
+async def _warm_model() -> None:
+    try:
+        await get_gateway().warm(ROUTINE_MODEL)
+    except Exception:
+        # model server not up yet; the first request loads the model instead
+        pass
+
+
+routine_jobs = JobManager.from_settings(_run_routine_job)
+LLM_WARMUP = get_settings().llm_warmup
+
+# Upper bound for GET /routine/jobs/{id}?wait=..., below common proxy read timeouts
+MAX_JOB_WAIT = 30
+
+
+@app.post("/routine/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_routine_job(body: RoutineGenerateRequest, response: Response, current_user: User = Depends(get_current_user)) -> dict:
+    request = body.model_dump()
+    key = hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
     try:
-        response = ollama.generate(model="llama3", prompt=prompt)
-        return {"routine": response['response']}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating routine: {str(e)}")
+        job, created = await routine_jobs.submit(current_user.username, key, request)
+    except JobQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many routine jobs pending, try again shortly",
+            headers={"Retry-After": str(get_gateway().retry_after)},
+        )
+    response.headers["Location"] = f"/routine/jobs/{job.id}"
+    return {**job.to_dict(), "deduplicated": not created}
+
+
+@app.get("/routine/jobs/{job_id}")
+async def get_routine_job(job_id: str, wait: float = Query(0, ge=0, le=MAX_JOB_WAIT), current_user: User = Depends(get_current_user)) -> dict:
+    job = await routine_jobs.get(current_user.username, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return (await routine_jobs.wait(job, wait)).to_dict()
+
+
+@app.delete("/routine/jobs/{job_id}")
+async def cancel_routine_job(job_id: str, current_user: User = Depends(get_current_user)) -> dict:
+    job = await routine_jobs.get(current_user.username, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return (await routine_jobs.cancel(job)).to_dict()
 
 
 @app.post("/routines", status_code=status.HTTP_201_CREATED)
-def save_routine(body: CreateSavedRoutine, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> dict:
-    # store a routine snapshot
-    routine = SavedRoutine(owner=current_user.username, title=body.title, content=body.content)
-    db.add(routine)
-    db.commit()
-    db.refresh(routine)
-    return {"id": routine.id, "owner": routine.owner, "title": routine.title}
+async def save_routine(body: CreateSavedRoutine, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    # store a routine snapshot, plus its items in normalized form
+    stmt = (
+        insert(SavedRoutine)
+        .values(owner=current_user.username, title=body.title, content=body.content)
+        .returning(SavedRoutine.id)
+    )
+    routine_id = (await db.exec(stmt)).scalar_one()
+    await services.store_routine_items(db, routine_id, body.plan or parse_routine_output(body.content))
+    await db.commit()
+    await services.routines_changed(current_user.username)
+    # routine events carry id and title only; content can be long, clients fetch it on demand
+    await change_feed.publish(current_user.username, "routines", "upsert", [{"id": routine_id, "title": body.title}])
+    return {"id": routine_id, "owner": current_user.username, "title": body.title}
 
 
 @app.get("/routines")
-def list_routines(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> list[SavedRoutine]:
-    routines = db.exec(select(SavedRoutine).where(SavedRoutine.owner == current_user.username)).all()
-    return routines
+async def list_routines(request: Request, response: Response, params: ListParams = Depends(), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[dict]:
+    if cached := await conditional_list("routines", current_user.username, request, response):
+        return cached
+    return await services.list_routines(db, current_user.username, params, response)
+
+
+@app.get("/routines/summary")
+async def summarize_routines(response: Response, params: ListParams = Depends(), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[dict]:
+    # Durations are summed in SQL over routine_item; optional items are excluded like in RoutinePlan
+    def period_minutes(period: str):
+        counted = and_(RoutineItem.period == period, RoutineItem.optional == false())
+        return func.coalesce(func.sum(case((counted, RoutineItem.minutes), else_=0)), 0)
+
+    stmt = (
+        select(
+            SavedRoutine.id,
+            SavedRoutine.title,
+            period_minutes("morning").label("morning_minutes"),
+            period_minutes("evening").label("evening_minutes"),
+            func.count(RoutineItem.id).label("item_count"),
+        )
+        .outerjoin(RoutineItem, RoutineItem.routine_id == SavedRoutine.id)
+        .where(SavedRoutine.owner == current_user.username)
+        .group_by(SavedRoutine.id, SavedRoutine.title)
+        .order_by(SavedRoutine.id)
+    )
+    if params.limit is not None:
+        stmt = stmt.limit(params.limit + 1)
+    if params.cursor:
+        stmt = stmt.where(SavedRoutine.id > decode_cursor(params.cursor, 1)[0])
+    rows = (await db.exec(stmt)).all()
+    if params.limit is not None and len(rows) > params.limit:
+        rows = rows[: params.limit]
+        response.headers["X-Next-Cursor"] = encode_cursor([rows[-1].id])
+    return [
+        {**row._asdict(), "total_minutes": row.morning_minutes + row.evening_minutes}
+        for row in rows
+    ]
+
+
+@app.get("/routines/search")
+async def search_routines(response: Response, params: SearchParams = Depends(), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[dict]:
+    """Saved routines whose title or content mention the words in `q`, best match first."""
+    return await search.search_routines(db, current_user.username, params, response)
+
+
+@app.get("/routines/{routine_id}/items")
+async def list_routine_items(routine_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[RoutineItem]:
+    stmt = (
+        select(RoutineItem)
+        .join(SavedRoutine, RoutineItem.routine_id == SavedRoutine.id)
+        .where(RoutineItem.routine_id == routine_id, SavedRoutine.owner == current_user.username)
+        # "morning" sorts after "evening", so descending puts the morning section first
+        .order_by(RoutineItem.period.desc(), RoutineItem.position)
+    )
+    return (await db.exec(stmt)).all()
 
 
 @app.get("/routines/{routine_id}")
-def get_routine(routine_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> SavedRoutine:
-    routine: SavedRoutine | None = db.get(SavedRoutine, routine_id)
-    if not routine or routine.owner != current_user.username:
-        raise HTTPException(status_code=404, detail="Routine not found")
-    return routine
+async def get_routine(routine_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> SavedRoutine:
+    return await services.get_routine(db, current_user.username, routine_id)
 
 
 @app.put("/routines/{routine_id}")
-def update_routine(routine_id: int, body: UpdateSavedRoutine, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> dict:
-    routine: SavedRoutine | None = db.get(SavedRoutine, routine_id)
-    if not routine or routine.owner != current_user.username:
-        raise HTTPException(status_code=404, detail="Routine not found")
+async def update_routine(routine_id: int, body: UpdateSavedRoutine, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    values: dict = {}
     if body.title is not None:
-        routine.title = body.title
-    # optionally update content if provided
-    if hasattr(body, 'content') and getattr(body, 'content') is not None:
-        routine.content = getattr(body, 'content')
-    db.add(routine)
-    db.commit()
-    db.refresh(routine)
-    return {"id": routine.id, "title": routine.title}
+        values["title"] = body.title
+    # optionally update content if provided; a plan alone also rewrites content to match
+    plan: RoutinePlan | None = body.plan
+    if body.content is not None:
+        values["content"] = body.content
+        plan = plan or parse_routine_output(body.content)
+    elif plan is not None:
+        values["content"] = render_routine_text(plan)
+    owned = (SavedRoutine.id == routine_id, SavedRoutine.owner == current_user.username)
+    if values:
+        stmt = update(SavedRoutine).where(*owned).values(**values).returning(SavedRoutine.id, SavedRoutine.title)
+    else:
+        stmt = select(SavedRoutine.id, SavedRoutine.title).where(*owned)
+    row = (await db.exec(stmt)).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Routine not found")
+    if plan is not None:
+        await db.exec(delete(RoutineItem).where(RoutineItem.routine_id == routine_id))
+        await services.store_routine_items(db, routine_id, plan)
+    await db.commit()
+    await services.routines_changed(current_user.username)
+    if values or plan is not None:
+        await change_feed.publish(current_user.username, "routines", "upsert", [{"id": row.id, "title": row.title}])
+    return {"id": row.id, "title": row.title}
 
 
 @app.delete("/routines/{routine_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_routine(routine_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> None:
-    routine: SavedRoutine | None = db.get(SavedRoutine, routine_id)
-    if not routine or routine.owner != current_user.username:
+async def delete_routine(routine_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> None:
+    result = await db.exec(delete(SavedRoutine).where(SavedRoutine.id == routine_id, SavedRoutine.owner == current_user.username))
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Routine not found")
-    db.delete(routine)
-    db.commit()
+    await db.commit()
+    await services.routines_changed(current_user.username)
+    await change_feed.publish(current_user.username, "routines", "delete", [routine_id])
+
+
+### EXPORT / IMPORT ###
+
+
+@app.get("/export")
+async def export_data(current_user: User = Depends(get_current_user)) -> StreamingResponse:
+    """The caller's tasks and saved routines as NDJSON, streamed straight from the database."""
+    filename = f"vibecycle-{current_user.username}.ndjson"
+    return StreamingResponse(
+        transfer.export_ndjson(current_user.username),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/import")
+async def import_data(request: Request, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    """Load an NDJSON export (or any file of task and routine lines) into the caller's account."""
+    return await transfer.import_ndjson(db, current_user.username, request.stream())
+
+
+### COMPLETIONS ###
+
+
+@app.post("/completions", status_code=status.HTTP_202_ACCEPTED)
+async def record_completion(body: CompletionCreate, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> dict:
+    """Mark a task done. The event is buffered and written with others in the background."""
+    return await completions.record_completion(db, current_user.username, body)
+
+
+@app.get("/completions/stats")
+async def completion_stats(
+    period: Literal["day", "week"] = "day",
+    periods: int = Query(30, ge=1, le=completions.MAX_STATS_PERIODS),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> dict:
+    """Completion counts per day or week, oldest first, ending with the current one."""
+    return await completions.completion_stats(db, current_user.username, period, periods)
+
+
+### CHANGES ###
+
+# Comment line sent on an idle SSE feed so proxies do not drop the connection
+CHANGE_FEED_HEARTBEAT = get_settings().change_feed_heartbeat
+
+
+async def _feed_user(connection: HTTPConnection, token: str | None) -> User:
+    # EventSource and browser WebSockets cannot set headers, hence the ?token= fallback.
+    # Feeds outlive any request-scoped session, so authenticate on a short-lived one.
+    scheme, _, credentials = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        token = credentials
+    async with new_session() as db:
+        return await get_current_user(db, token)
+
+
+def _change_event(event: dict) -> dict:
+    return {key: value for key, value in event.items() if key != "owner"}
+
+
+@app.get("/changes")
+async def change_stream(request: Request, token: str | None = None, last_event_id: str | None = Header(None)) -> StreamingResponse:
+    """Server-sent events with the caller's task and routine changes; resumes from Last-Event-ID."""
+    username = (await _feed_user(request, token)).username
+
+    async def events():
+        with change_feed.subscribe(username, last_event_id) as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), CHANGE_FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\n" + _sse("change", _change_event(event))
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/changes/ws")
+async def change_socket(websocket: WebSocket, token: str | None = None, last_event_id: str | None = None) -> None:
+    """The same events as GET /changes, one JSON message each."""
+    try:
+        username = (await _feed_user(websocket, token)).username
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    async def forward(queue: asyncio.Queue) -> None:
+        while True:
+            await websocket.send_json(_change_event(await queue.get()))
+
+    with change_feed.subscribe(username, last_event_id) as queue:
+        sender = asyncio.create_task(forward(queue))
+        try:
+            # clients have nothing to send; reading only notices the disconnect
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            sender.cancel()
 
 
 @app.post("/token")
-async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)) -> Token:
-    user: User | None = db.get(User, form_data.username)
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)) -> Token:
+    user: User | None = await db.get(User, form_data.username)
     invalid_creds_message = "Incorrect username or password"
 
     if user is None:
@@ -247,54 +558,67 @@ async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=invalid_creds_message,
         )
-    
-    if not auth.verify_password(plain_password=form_data.password, hashed_password=user.hashed_password):
+    username, hashed_password = user.username, user.hashed_password
+    # End the read transaction so the pooled connection is not held while bcrypt runs
+    await db.rollback()
+
+    valid, new_hash = await auth.verify_password_async(form_data.password, hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=invalid_creds_message,
         )
+    if new_hash:
+        # transparently upgrade hashes made with an older cost setting
+        await db.exec(update(User).where(User.username == username).values(hashed_password=new_hash))
+        await db.commit()
     
-    access_token_expires = timedelta(minutes=int(auth.ACCESS_TOKEN_EXPIRE_MINUTES))
-    access_token = auth.create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
+    access_token_expires = timedelta(minutes=get_settings().access_token_expire_minutes)
+    access_token = auth.create_access_token(data={"sub": username}, expires_delta=access_token_expires)
     return Token(access_token=access_token, token_type="bearer")
 
 @app.post("/users", status_code=status.HTTP_201_CREATED)
-async def create_user(new_user: CreateUserRequest, db: Session = Depends(get_db)) -> None:
-    hashed_password: str = auth.get_password_hash(new_user.password)
+async def create_user(new_user: CreateUserRequest, db: AsyncSession = Depends(get_db)) -> None:
+    hashed_password: str = await auth.get_password_hash_async(new_user.password)
     user: User = User(**new_user.model_dump(), hashed_password=hashed_password)
     db.add(user)
-    db.commit()
+    await db.commit()
+    await collection_versions.bump("users", "*")
 
 ### DELETE ###
 
 @app.delete("/tasks/{task_name}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(task_name: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> None:
-    task: Tasks | None = db.get(Tasks, task_name)
-    if not task or task.owner != current_user.username:
-        raise HTTPException(status_code=404, detail=f"Task '{task_name}' not found")
-    db.delete(task)
-    db.commit()
+async def delete_task(task_name: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> None:
+    await services.delete_task(db, current_user.username, task_name)
 
 
 @app.delete("/users/empty", status_code=status.HTTP_204_NO_CONTENT)
-def delete_empty_users(db: Session = Depends(get_db)) -> None:
+async def delete_empty_users(db: AsyncSession = Depends(get_db)) -> None:
     # delete any users with empty username
-    db.exec(text("""DELETE FROM users WHERE COALESCE(username, '') = ''"""))
-    db.commit()
+    await db.exec(text("""DELETE FROM users WHERE COALESCE(username, '') = ''"""))
+    await db.commit()
+    await collection_versions.bump("users", "*")
 
 
 @app.delete("/users/{username}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(username: str, db: Session = Depends(get_db)) -> None:
-    user: User | None = db.get(User, username)
+async def delete_user(username: str, db: AsyncSession = Depends(get_db)) -> None:
+    user: User | None = await db.get(User, username)
     if not user:
         raise HTTPException(status_code=404, detail=f"User '{username}' not found")
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
+    await auth.invalidate_user(username)
+    services.task_embeddings.forget(username)
+    await collection_versions.bump("users", "*")
 
 
 @app.get("/admin/tasks")
-def admin_list_tasks(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> list[dict]:
+async def admin_list_tasks(request: Request, response: Response, params: ListParams = Depends(), current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> list[dict]:
     """Temporary diagnostic endpoint: lists all tasks with owner for debugging.
     Only callable by authenticated users in the local environment. Remove after use."""
-    tasks = db.exec(select(Tasks)).all()
-    return [{"task_name": t.task_name, "owner": t.owner} for t in tasks]
\ No newline at end of file
+    if cached := await conditional_list("tasks", "*", request, response):
+        return cached
+    return await paginate(
+        db, Tasks, params, key=["owner", "task_name"], allowed=services.TASK_COLUMNS,
+        default=["task_name", "owner"], response=response,
+    )
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""MCP tools for agents, calling the service layer in-process.
+
+Mounted into the API at /mcp/ (MCP_MOUNT), where every call authenticates with the
+caller's bearer token, or run standalone over stdio with `python my_server.py`. Stdio
+has no headers, so the standalone server acts as the user named in MCP_USER.
+"""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal
+
+from fastapi import HTTPException, Response
+from fastmcp import FastMCP
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_http_headers, get_http_request
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import search, services
+from app.database import new_session
+from app.llm.gateway import GatewayBusy, GatewayTimeout
+from app.models import Tasks
+from app.pagination import MAX_PAGE_SIZE, ListParams
+from app.ratelimit import DEFAULT_COST, ROUTE_COSTS, rate_limiter
+from app.routers.auth import get_current_user
+from app.schemas import RoutineGenerateRequest
+from app.settings import get_settings
+
+MCP_USER = get_settings().mcp_user
+
+mcp = FastMCP(
+    "Vibe Cycle",
+    instructions="Manage the user's tasks, generate morning and evening routines from them, and read saved routines.",
+)
+
+
+async def _username(db: AsyncSession) -> str:
+    scheme, _, token = get_http_headers(include={"authorization"}).get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return (await get_current_user(db, token)).username
+    try:
+        get_http_request()
+    except RuntimeError:
+        # stdio: a local process started by the operator
+        if MCP_USER:
+            return MCP_USER
+        raise ToolError("Set MCP_USER to choose the user the standalone server acts as") from None
+    raise ToolError("Missing bearer token")
+
+
+@asynccontextmanager
+async def _session() -> AsyncIterator[tuple[AsyncSession, str]]:
+    # the same pool as the API; HTTP-style errors become tool errors the agent can read
+    async with new_session() as db:
+        try:
+            yield db, await _username(db)
+        except HTTPException as e:
+            raise ToolError(str(e.detail)) from None
+        except ValidationError as e:
+            raise ToolError(str(e)) from None
+        except GatewayBusy as e:
+            raise ToolError(f"Routine generation is busy, try again in {e.retry_after}s") from None
+        except GatewayTimeout as e:
+            raise ToolError(str(e)) from None
+
+
+async def _charge(username: str, method: str, path: str) -> None:
+    # tool calls share the caller's bucket, at the cost of the matching HTTP route
+    if not rate_limiter.enabled:
+        return
+    decision = await rate_limiter.check([f"user:{username}"], ROUTE_COSTS.get((method, path), DEFAULT_COST))
+    if not decision.allowed:
+        raise ToolError(f"Rate limit exceeded, try again in {decision.retry_after}s")
+
+
+def _page(limit: int, cursor: str | None, fields: str | None = None) -> ListParams:
+    return ListParams(limit=min(max(limit, 1), MAX_PAGE_SIZE), cursor=cursor, fields=fields)
+
+
+@mcp.tool
+async def list_tasks(limit: int = 200, cursor: str | None = None) -> dict:
+    """List the user's tasks ordered by name. Pass `next_cursor` back to get the following page."""
+    async with _session() as (db, username):
+        response = Response()
+        tasks = await services.list_tasks(db, username, _page(limit, cursor), response)
+        return {"tasks": tasks, "next_cursor": response.headers.get("X-Next-Cursor")}
+
+
+@mcp.tool
+async def upsert_tasks(tasks: list[Tasks]) -> dict:
+    """Create or update up to 1000 tasks by name; fields left out keep their stored values."""
+    async with _session() as (db, username):
+        await _charge(username, "POST", "/tasks:batch")
+        return {"results": await services.upsert_tasks(db, username, tasks)}
+
+
+@mcp.tool
+async def delete_tasks(task_names: list[str]) -> dict:
+    """Delete up to 1000 tasks by name."""
+    async with _session() as (db, username):
+        await _charge(username, "DELETE", "/tasks:batch")
+        return {"results": await services.delete_tasks(db, username, task_names)}
+
+
+@mcp.tool
+async def generate_routine(
+    energy_level: int = 3,
+    notes: str | None = None,
+    mode: Literal["llm", "heuristic", "hybrid"] = "llm",
+) -> dict:
+    """Generate a morning and evening routine from the user's tasks for an energy level from 1 (low) to 5 (full).
+
+    `notes` are extra wishes to prioritise. `heuristic` answers instantly without the model;
+    `hybrid` lets the model only reword the scheduler's plan.
+    """
+    async with _session() as (db, username):
+        await _charge(username, "POST", "/routine")
+        body = RoutineGenerateRequest(energy_level=energy_level, notes=notes, mode=mode)
+        return await services.generate_routine(db, username, body)
+
+
+@mcp.tool
+async def list_routines(limit: int = 50, cursor: str | None = None) -> dict:
+    """List the user's saved routines (id and title). Pass `next_cursor` back to get the following page."""
+    async with _session() as (db, username):
+        response = Response()
+        routines = await services.list_routines(db, username, _page(limit, cursor, "id,title"), response)
+        return {"routines": routines, "next_cursor": response.headers.get("X-Next-Cursor")}
+
+
+def _search(query: str, limit: int, cursor: str | None) -> search.SearchParams:
+    return search.SearchParams(q=query, limit=min(max(limit, 1), search.MAX_SEARCH_LIMIT), cursor=cursor)
+
+
+@mcp.tool
+async def search_tasks(query: str, limit: int = 20, cursor: str | None = None) -> dict:
+    """Find the user's tasks whose name or routine type contain all words of `query`, best match first."""
+    async with _session() as (db, username):
+        response = Response()
+        tasks = await search.search_tasks(db, username, _search(query, limit, cursor), response)
+        return {"tasks": tasks, "next_cursor": response.headers.get("X-Next-Cursor")}
+
+
+@mcp.tool
+async def search_routines(query: str, limit: int = 20, cursor: str | None = None) -> dict:
+    """Find saved routines whose title or text contain all words of `query`, with highlighted snippets."""
+    async with _session() as (db, username):
+        response = Response()
+        routines = await search.search_routines(db, username, _search(query, limit, cursor), response)
+        return {"routines": routines, "next_cursor": response.headers.get("X-Next-Cursor")}
+
+
+@mcp.tool
+async def get_routine(routine_id: int) -> dict:
+    """Read one saved routine, including its full text."""
+    async with _session() as (db, username):
+        return (await services.get_routine(db, username, routine_id)).model_dump()
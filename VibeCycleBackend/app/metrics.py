@@ -0,0 +1,227 @@
+"""Prometheus-format metrics without a client library.
+
+Every update happens on the event loop thread (request middleware, SQLAlchemy events
+fired from the async session's greenlets, code awaiting the password-hash executor),
+so the counters are plain dict/list updates with no locks. Do not record from
+worker threads.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+# Request latency and per-request DB time, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: Any, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: Any) -> None:
+        self.values[labels] = value
+
+
+class CallbackMetric:
+    """Value read from elsewhere at scrape time (e.g. the LLM gateway's own counters)."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float], kind: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {_number(self.read())}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labelnames = labelnames
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self.values: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, *labels: Any) -> None:
+        row = self.values.get(labels)
+        if row is None:
+            row = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        names = self.labelnames + ("le",)
+        for labels, row in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), row):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(names, labels + (_number(bound),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(row[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.register(Gauge("http_requests_in_flight", "Requests currently being served.", ("method",)))
+http_request_duration = registry.register(
+    Histogram("http_request_duration_seconds", "Request latency by route template.", LATENCY_BUCKETS, ("method", "route", "status"))
+)
+http_exceptions = registry.register(Counter("http_unhandled_exceptions_total", "Exceptions that reached the global handler.", ("type",)))
+db_queries = registry.register(Histogram("db_queries_per_request", "SQL statements executed per request.", COUNT_BUCKETS, ("route",)))
+db_request_time = registry.register(Histogram("db_time_per_request_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS, ("route",)))
+db_query_duration = registry.register(Histogram("db_query_duration_seconds", "Duration of single SQL statements.", QUERY_BUCKETS))
+password_hash_duration = registry.register(
+    Histogram("password_hash_duration_seconds", "bcrypt hash/verify time, including the wait for an executor thread.", LATENCY_BUCKETS, ("operation",))
+)
+llm_queue_wait = registry.register(Histogram("llm_queue_wait_seconds", "Time spent waiting for an LLM gateway slot.", LATENCY_BUCKETS))
+llm_generation_duration = registry.register(Histogram("llm_generation_seconds", "Wall time of LLM generations.", LATENCY_BUCKETS, ("model", "kind")))
+llm_load_duration = registry.register(Histogram("llm_load_duration_seconds", "Model load time reported by Ollama.", LATENCY_BUCKETS, ("model",)))
+llm_tokens = registry.register(Counter("llm_tokens_total", "Tokens evaluated by the model server.", ("model", "phase")))
+llm_tokens_per_second = registry.register(
+    Histogram("llm_tokens_per_second", "Generation speed reported by Ollama (eval_count / eval_duration).", TOKEN_RATE_BUCKETS, ("model",))
+)
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+
+
+# Set by the middleware so SQLAlchemy events can attribute statements to the current request
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def instrument_engine(sync_engine) -> None:
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_query_duration.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    event.listen(sync_engine, "before_cursor_execute", before)
+    event.listen(sync_engine, "after_cursor_execute", after)
+
+
+def record_llm_response(model: str, response: Any) -> None:
+    """Keep the counters Ollama returns with a finished generation."""
+
+    def field(name: str) -> Any:
+        return response[name] if name in response else None
+
+    prompt_tokens, eval_tokens = field("prompt_eval_count"), field("eval_count")
+    if prompt_tokens:
+        llm_tokens.inc(model, "prompt", amount=prompt_tokens)
+    if eval_tokens:
+        llm_tokens.inc(model, "completion", amount=eval_tokens)
+        eval_duration = field("eval_duration")
+        if eval_duration:
+            # Ollama durations are nanoseconds
+            llm_tokens_per_second.observe(eval_tokens / (eval_duration / 1e9), model)
+    load_duration = field("load_duration")
+    if load_duration:
+        llm_load_duration.observe(load_duration / 1e9, model)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no per-request task or body buffering) timing every HTTP request."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status_code = 500
+        stats = RequestStats()
+        token = current_request.set(stats)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec(method)
+            current_request.reset(token)
+            # the route template, never the raw path, keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_duration.observe(elapsed, method, route, status_code)
+            db_queries.observe(stats.queries, route)
+            db_request_time.observe(stats.query_seconds, route)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field
+from datetime import date, datetime
 from typing import Optional
 
 class User(SQLModel, table=True):
@@ -7,16 +8,64 @@ class User(SQLModel, table=True):
     hashed_password: str
 
 class Tasks(SQLModel, table=True):
+    # Composite key (owner, task_name): task names are unique per user, and the
+    # leading owner column doubles as the index for owner-scoped listing
+    owner: str | None = Field(default=None, primary_key=True)
     task_name: str = Field(primary_key=True)
     routine_type: str | None = None
     necessity_level: int | None = None
     difficulty_level: int | None = None
     amount_of_time: int | None = None
-    owner: str | None = None
 
 
 class SavedRoutine(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    owner: str
+    owner: str = Field(index=True)
     title: str | None = None
     content: str
+
+
+class RoutineItem(SQLModel, table=True):
+    # Normalized items of a SavedRoutine so durations can be listed and summed in SQL
+    __tablename__ = "routine_item"
+    id: int | None = Field(default=None, primary_key=True)
+    routine_id: int = Field(foreign_key="savedroutine.id", index=True, ondelete="CASCADE")
+    period: str  # "morning" or "evening"
+    position: int
+    title: str
+    minutes: int
+    optional: bool = False
+
+
+class RoutineJob(SQLModel, table=True):
+    # Durable queue for routine generation jobs (only written when ROUTINE_JOBS_DURABLE is on)
+    __tablename__ = "routine_job"
+    id: str = Field(primary_key=True)
+    owner: str = Field(index=True)
+    dedup_key: str
+    status: str = Field(index=True)  # queued, running, succeeded, failed or cancelled
+    request: str  # RoutineGenerateRequest as JSON
+    result: str | None = None  # JSON
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
+
+
+class Completion(SQLModel, table=True):
+    # One "done" click, written in batches by the completion buffer (app/completions.py).
+    # routine_id is not a foreign key: history outlives the routine, and an event buffered
+    # before its routine was deleted must not fail the whole batch.
+    __tablename__ = "completion"
+    id: int | None = Field(default=None, primary_key=True)
+    owner: str = Field(index=True)
+    routine_id: int | None = None
+    task: str
+    completed_at: datetime
+
+
+class CompletionDaily(SQLModel, table=True):
+    # Completions per user and UTC day, kept up to date with each flush so stats never scan the events
+    __tablename__ = "completion_daily"
+    owner: str = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    completions: int = 0
@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import json
+from typing import Any
+
+from fastapi import HTTPException, Query, Request, Response
+from sqlalchemy import select, tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.cache import collection_versions
+
+
+MAX_PAGE_SIZE = 1000
+
+
+class ListParams:
+    """Common query parameters for list endpoints: keyset cursor, page size and field projection.
+
+    Without `limit` every remaining row is returned, as before pagination existed, so
+    clients that do not follow X-Next-Cursor are never silently cut short.
+    """
+
+    def __init__(
+        self,
+        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; all rows when omitted"),
+        cursor: str | None = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header"),
+        fields: str | None = Query(None, description="Comma-separated list of fields to return"),
+    ) -> None:
+        self.limit = limit
+        self.cursor = cursor
+        self.fields = fields
+
+
+def encode_cursor(values: list[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, width: int) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != width:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def select_fields(requested: str | None, allowed: list[str], default: list[str]) -> list[str]:
+    if requested is None:
+        return list(default)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+async def paginate(
+    db: AsyncSession,
+    model,
+    params: ListParams,
+    *,
+    key: list[str],
+    allowed: list[str],
+    default: list[str] | None = None,
+    where: tuple = (),
+    response: Response,
+) -> list[dict]:
+    """Keyset-paginate `model` ordered by its `key` columns.
+
+    Only the projected columns are selected. The cursor for the next page, if any,
+    is returned in the X-Next-Cursor header (and a Link header) so list bodies stay plain arrays.
+    """
+    output = select_fields(params.fields, allowed, default or allowed)
+    # key columns are always selected so the next cursor can be built
+    names = output + [name for name in key if name not in output]
+    key_columns = [getattr(model, name) for name in key]
+    # plain SQLAlchemy select so a single projected column still comes back as rows
+    stmt = select(*[getattr(model, name) for name in names]).where(*where)
+    if params.cursor:
+        after = decode_cursor(params.cursor, len(key))
+        if len(key_columns) == 1:
+            stmt = stmt.where(key_columns[0] > after[0])
+        else:
+            stmt = stmt.where(tuple_(*key_columns) > tuple_(*after))
+    stmt = stmt.order_by(*key_columns)
+    if params.limit is not None:
+        stmt = stmt.limit(params.limit + 1)
+
+    rows = (await db.exec(stmt)).all()
+    items = [dict(zip(names, row)) for row in rows[: params.limit]]
+    if params.limit is not None and len(rows) > params.limit:
+        next_cursor = encode_cursor([items[-1][name] for name in key])
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<?cursor={next_cursor}&limit={params.limit}>; rel="next"'
+    return [{name: item[name] for name in output} for item in items]
+
+
+async def list_etag(collection: str, owner: str, request: Request) -> str | None:
+    """Weak ETag for a list response, or None when conditional GET is off.
+
+    Version tokens kept in a per-process cache would not see writes made through other
+    workers, so ETags are only issued when the tokens live in a shared backend (REDIS_URL).
+    """
+    if not collection_versions.shared:
+        return None
+    # The version token changes on every write; the query string distinguishes pages and projections
+    version = await collection_versions.current(collection, owner)
+    query = hashlib.sha1(str(request.url.query).encode()).hexdigest()[:12]
+    return f'W/"{version}-{query}"'
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+async def conditional_list(collection: str, owner: str, request: Request, response: Response) -> Response | None:
+    """Set the list's ETag on `response`; returns the 304 to send instead when the client's copy is current."""
+    etag = await list_etag(collection, owner, request)
+    if etag is None:
+        return None
+    if cached := not_modified(request, etag):
+        return cached
+    response.headers["ETag"] = etag
+    return None
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from app.settings import get_settings
+
+# Regenerates one user's routine for one energy level and caches it for the given ttl
+Runner = Callable[[str, int, float], Awaitable[object]]
+
+ENERGY_LEVELS = (1, 2, 3, 4, 5)
+
+
+class RoutinePrecomputer:
+    """Refreshes the cached routines for every energy level after a user's tasks change.
+
+    Changes are debounced per user: each one restarts that user's timer, so a burst of
+    edits leads to one refresh `delay` seconds after the last of them. At most
+    `concurrency` users are refreshed at a time, keeping most gateway slots free for
+    interactive requests.
+    """
+
+    def __init__(self, runner: Runner, delay: float = 10.0, ttl: float = 86400.0, concurrency: int = 1, enabled: bool = True) -> None:
+        self.runner = runner
+        self.delay = delay
+        # precomputed entries are dropped by the next task change, so they can live long when
+        # the cache is shared; see from_settings
+        self.ttl = ttl
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._timers: dict[str, asyncio.Task] = {}
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+
+    @classmethod
+    def from_settings(cls, runner: Runner, shared_cache: bool) -> "RoutinePrecomputer":
+        settings = get_settings()
+        # A per-process cache only sees this worker's task changes, so an entry can outlive
+        # a change made through another one; it lives no longer than a regular entry then
+        ttl = settings.routine_precompute_ttl if shared_cache else min(settings.routine_precompute_ttl, settings.routine_cache_ttl)
+        return cls(
+            runner,
+            delay=settings.routine_precompute_delay,
+            ttl=ttl,
+            concurrency=settings.routine_precompute_concurrency,
+            enabled=settings.routine_precompute,
+        )
+
+    def schedule(self, username: str) -> None:
+        # called from request handlers, so there is always a running loop
+        if not self.enabled:
+            return
+        timer = self._timers.get(username)
+        if timer is not None and not timer.done():
+            timer.cancel()
+        self.scheduled += 1
+        self._timers[username] = asyncio.get_running_loop().create_task(self._refresh(username))
+
+    async def _refresh(self, username: str) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+            async with self._semaphore:
+                for energy_level in ENERGY_LEVELS:
+                    await self.runner(username, energy_level, self.ttl)
+            self.completed += 1
+        except asyncio.CancelledError:
+            # superseded by a newer change, or shutting down
+            raise
+        except Exception:
+            self.failed += 1
+        finally:
+            if self._timers.get(username) is asyncio.current_task():
+                del self._timers[username]
+
+    async def stop(self) -> None:
+        timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+        self._timers.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "delay": self.delay,
+            "pending": len(self._timers),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
@@ -0,0 +1,244 @@
+"""Token-bucket admission control, applied before routing so rejected requests never reach
+the database, the password hasher or the model server.
+
+Every request draws from a bucket per client IP and, when authenticated, also from a bucket
+per user; it is admitted only if both have room, and then charged to both. So one user is
+limited on every address, and one address cannot get fresh buckets by rotating tokens. Each
+request costs the weight of its route: a model call or a bcrypt hash takes far more of the
+bucket than a list read.
+"""
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from app.cache import _redis_client
+from app.metrics import CallbackMetric, registry
+from app.routers.auth import decode_token
+from app.settings import get_settings
+
+# (method, path) -> tokens per request; everything else costs DEFAULT_COST
+ROUTE_COSTS = {
+    ("POST", "/routine"): 20,
+    ("POST", "/routine/stream"): 20,
+    ("POST", "/routine/jobs"): 20,
+    # one generation per day, but the shared prefix is evaluated once
+    ("POST", "/routine/week"): 60,
+    ("POST", "/ai/generate"): 20,
+    ("POST", "/token"): 10,
+    ("POST", "/users"): 10,
+    ("POST", "/tasks:batch"): 5,
+    ("DELETE", "/tasks:batch"): 5,
+    ("GET", "/export"): 10,
+    ("POST", "/import"): 20,
+}
+DEFAULT_COST = 1
+EXEMPT_PATHS = frozenset({"/metrics", "/docs", "/redoc", "/openapi.json"})
+
+
+@dataclass(frozen=True, slots=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    # seconds until the bucket is full again, and until this request would fit
+    reset: int
+    retry_after: int
+
+
+class BucketBackend(Protocol):
+    # Takes `cost` from every bucket in `keys` if all of them hold that much, else from none.
+    # Returns whether it did and the tokens left in the emptiest bucket.
+    async def take(self, keys: list[str], cost: float, capacity: float, rate: float) -> tuple[bool, float]: ...
+
+
+class MemoryBuckets:
+    """Buckets for a single process; updated on the event loop thread only, so no locks.
+
+    Each worker process has its own, so with several workers a client gets up to
+    workers x capacity; the launcher refuses several workers without REDIS_URL.
+    """
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        self.maxsize = maxsize
+        # key -> [tokens, last refill time]
+        self._buckets: dict[str, list[float]] = {}
+
+    async def take(self, keys: list[str], cost: float, capacity: float, rate: float) -> tuple[bool, float]:
+        now = time.monotonic()
+        if len(self._buckets) + len(keys) > self.maxsize:
+            self._prune(now, capacity, rate, room=len(keys))
+        buckets = []
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now]
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            buckets.append(bucket)
+        allowed = all(bucket[0] >= cost for bucket in buckets)
+        if allowed:
+            for bucket in buckets:
+                bucket[0] -= cost
+        return allowed, min(bucket[0] for bucket in buckets)
+
+    def _prune(self, now: float, capacity: float, rate: float, room: int) -> None:
+        # a bucket that has refilled is the same as no bucket at all
+        full = [key for key, (tokens, updated) in self._buckets.items() if tokens + (now - updated) * rate >= capacity]
+        for key in full:
+            del self._buckets[key]
+        if len(self._buckets) + room > self.maxsize:
+            # still full of active clients: forget the least recently created ones
+            for key in list(self._buckets)[: len(self._buckets) + room - self.maxsize]:
+                del self._buckets[key]
+
+
+# Refill every bucket and take from all or none in one atomic step; the state expires once
+# a bucket would be full again
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local levels = {}
+local allowed = 1
+for i, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    levels[i] = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+    if levels[i] < cost then
+        allowed = 0
+    end
+end
+local remaining = capacity
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i]
+    if allowed == 1 then
+        tokens = tokens - cost
+    end
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+    remaining = math.min(remaining, tokens)
+end
+return {allowed, tostring(remaining)}
+"""
+
+
+class RedisBuckets:
+    """Buckets shared by every app process, for any asyncio client speaking the Redis protocol
+    with Lua scripting (redis.asyncio, fakeredis[lua], ...)."""
+
+    def __init__(self, client: Any, prefix: str = "vibecycle:ratelimit:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, keys: list[str], cost: float, capacity: float, rate: float) -> tuple[bool, float]:
+        # wall-clock time, so processes on different hosts agree on refill
+        allowed, tokens = await self._script(keys=[self.prefix + key for key in keys], args=[capacity, rate, cost, time.time()])
+        return bool(allowed), float(tokens)
+
+
+class RateLimiter:
+    def __init__(self, backend: BucketBackend, capacity: float = 120.0, rate: float = 2.0, enabled: bool = True) -> None:
+        self.backend = backend
+        self.capacity = capacity
+        # tokens added back per second
+        self.rate = rate
+        self.enabled = enabled
+        self.rejected = 0
+
+    @classmethod
+    def from_settings(cls) -> "RateLimiter":
+        settings = get_settings()
+        return cls(
+            RedisBuckets(_redis_client(settings.redis_url)) if settings.redis_url else MemoryBuckets(),
+            capacity=settings.rate_limit_capacity,
+            rate=settings.rate_limit_refill,
+            enabled=settings.rate_limit,
+        )
+
+    async def check(self, identities: list[str], cost: float) -> Decision:
+        # a route costing more than a full bucket would otherwise never be admitted
+        cost = min(cost, self.capacity)
+        allowed, tokens = await self.backend.take(identities, cost, self.capacity, self.rate)
+        if not allowed:
+            self.rejected += 1
+        return Decision(
+            allowed=allowed,
+            limit=int(self.capacity),
+            remaining=max(0, math.floor(tokens)),
+            reset=math.ceil((self.capacity - tokens) / self.rate),
+            retry_after=0 if allowed else max(1, math.ceil((cost - tokens) / self.rate)),
+        )
+
+    def headers(self, decision: Decision) -> list[tuple[bytes, bytes]]:
+        policy = f"{int(self.capacity)};w={math.ceil(self.capacity / self.rate)}"
+        headers = [
+            (b"ratelimit-limit", str(decision.limit).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(decision.reset).encode()),
+            (b"ratelimit-policy", policy.encode()),
+        ]
+        if not decision.allowed:
+            headers.append((b"retry-after", str(decision.retry_after).encode()))
+        return headers
+
+
+def _identities(scope) -> list[str]:
+    # behind a proxy the client address is the proxy's unless uvicorn is told to trust its
+    # X-Forwarded-For (--forwarded-allow-ips)
+    client = scope.get("client")
+    identities = [f"ip:{client[0] if client else 'unknown'}"]
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    # cached after the first request, so this is normally a dict lookup
+                    username = decode_token(token).get("sub")
+                except Exception:
+                    break
+                if username:
+                    identities.append(f"user:{username}")
+            break
+    return identities
+
+
+class RateLimitMiddleware:
+    """Plain ASGI middleware: charges the route's cost and answers 429 without calling the app."""
+
+    def __init__(self, app, limiter: RateLimiter) -> None:
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.limiter.enabled or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"].rstrip("/") or "/"
+        decision = await self.limiter.check(_identities(scope), ROUTE_COSTS.get((scope["method"], path), DEFAULT_COST))
+        headers = self.limiter.headers(decision)
+        if not decision.allowed:
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Rate limit exceeded, try again shortly"},
+            )
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+rate_limiter = RateLimiter.from_settings()
+registry.register(CallbackMetric("http_rate_limited_total", "Requests rejected with 429 by the rate limiter.", lambda: rate_limiter.rejected, "counter"))
@@ -1,6 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from app.database import get_db
+from app.llm.gateway import get_gateway
+from app.models import User
+from app.routers.auth import get_current_user
+from app.routines import ROUTINE_MODEL
+from app.schemas import PromptRequest
 
 
 router = APIRouter()
+
+
+@router.post("/generate")
+async def generate(body: PromptRequest, current_user: User = Depends(get_current_user)) -> dict:
+    # Free-form generation through the shared gateway (same limits as routine generation). Always
+    # the routine model: letting callers pick one would let any user load any model on the server
+    response = await get_gateway().generate(model=ROUTINE_MODEL, prompt=body.prompt)
+    return {"response": response["response"]}
+
+
+@router.get("/gateway")
+async def gateway_stats(current_user: User = Depends(get_current_user)) -> dict:
+    return get_gateway().stats()
@@ -1,29 +1,43 @@
-import os
+import asyncio
+import time
 import jwt
 from jwt.exceptions import InvalidTokenError
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime, timezone
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
+from app.cache import CollectionVersions, LRUCache, MemoryCache, RedisCache, _redis_client
 from app.database import get_db
+from app.metrics import password_hash_duration
 from app.models import User
 from app.schemas import Token
-from app.utils.security import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from dotenv import load_dotenv
+from app.settings import get_settings
 
-load_dotenv()
+settings = get_settings()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+# bcrypt releases the GIL, so a small dedicated pool keeps hashing off the event loop
+# without letting a login storm take over the default threadpool used by sync handlers
+_password_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Short-lived caches so authenticated requests skip JWT verification and the user lookup.
+# Entries never outlive the token's own expiry; deleting a user rotates their version token.
+# With REDIS_URL the tokens are shared, so a deletion reaches every worker's cache; without
+# it, other workers keep accepting the user's token for up to AUTH_CACHE_TTL.
+_token_cache = LRUCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+_user_cache = LRUCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+_user_versions = CollectionVersions(
+    RedisCache(_redis_client(settings.redis_url)) if settings.redis_url else MemoryCache(_user_cache),
+    ttl=settings.auth_cache_ttl,
+)
+
 router = APIRouter()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -32,14 +46,33 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> User:
     return pwd_context.hash(password)
 
-def get_user(db: Session, username: str) -> User | None:
-    return db.get(User, username)
+async def verify_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify off the event loop. Returns (valid, new_hash); new_hash is set when the stored
+    hash uses outdated settings (e.g. fewer BCRYPT_ROUNDS) and should be replaced."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_password_executor, pwd_context.verify_and_update, plain_password, hashed_password)
+    finally:
+        password_hash_duration.observe(time.perf_counter() - started, "verify")
 
-def authenticate_user(db: Session, username: str, password: str) -> User | bool:
-    user: User = get_user(db, username)
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_password_executor, pwd_context.hash, password)
+    finally:
+        password_hash_duration.observe(time.perf_counter() - started, "hash")
+
+async def get_user(db: AsyncSession, username: str) -> User | None:
+    return await db.get(User, username)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> User | bool:
+    user: User = await get_user(db, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, _ = await verify_password_async(password, user.hashed_password)
+    if not valid:
         return False
     return user
 
@@ -50,25 +83,60 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt: str = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt: str = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-async def get_current_user(db: Session = Depends(get_db), token: Annotated[str, Depends(oauth2_scheme)] = None) -> User:
+def _cache_ttl(exp: int | None) -> float:
+    if exp is None:
+        return settings.auth_cache_ttl
+    return min(settings.auth_cache_ttl, exp - time.time())
+
+
+def decode_token(token: str) -> dict:
+    payload: dict | None = _token_cache.get(token)
+    if payload is not None:
+        # cached entries expire with the token, but guard against clock edges anyway
+        if payload.get("exp") is None or payload["exp"] > time.time():
+            return payload
+    payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    ttl = _cache_ttl(payload.get("exp"))
+    if ttl > 0:
+        _token_cache.set(token, payload, ttl)
+    return payload
+
+
+async def _user_cache_key(username: str, exp: int | None) -> str:
+    return f"user:{username}:{exp}:{await _user_versions.current('user', username)}"
+
+
+async def invalidate_user(username: str) -> None:
+    await _user_versions.bump("user", username)
+
+
+async def get_current_user(db: AsyncSession = Depends(get_db), token: Annotated[str, Depends(oauth2_scheme)] = None) -> User:
     credentials_exception: HTTPException = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload: dict = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload: dict = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except InvalidTokenError:
         raise credentials_exception
-    user: User = get_user(db, username)
+    cache_key = await _user_cache_key(username, payload.get("exp"))
+    fields: dict | None = _user_cache.get(cache_key)
+    if fields is not None:
+        # a new instance per request, so no request can mutate what another one sees
+        return User(**fields)
+    user = await get_user(db, username)
     if user is None:
         raise credentials_exception
+    ttl = _cache_ttl(payload.get("exp"))
+    if ttl > 0:
+        _user_cache.set(cache_key, user.model_dump(), ttl)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -0,0 +1,257 @@
+import json
+import re
+from dataclasses import dataclass
+
+from pydantic import ValidationError
+
+from app.models import Tasks
+from app.scheduler import candidate_from_task, score
+from app.schemas import RoutineGenerateRequest, RoutinePlan, RoutinePlanItem
+from app.settings import get_settings
+
+
+ROUTINE_MODEL = "llama3"
+# Bump whenever the prompt wording changes so cached generations are not reused
+ROUTINE_PROMPT_VERSION = 3
+# Upper bound on the estimated prompt size; lower-ranked tasks are left out beyond it
+ROUTINE_PROMPT_BUDGET = get_settings().routine_prompt_budget
+# JSON schema handed to Ollama's structured output mode
+ROUTINE_PLAN_SCHEMA = RoutinePlan.model_json_schema(mode="validation")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_NOTE_SPLIT_RE = re.compile(r"[\r\n;•\-\u2022,]+")
+
+
+def strip_tags(s: str) -> str:
+    return _TAG_RE.sub("", s or "").strip()
+
+
+def collect_client_items(body: RoutineGenerateRequest) -> list[str]:
+    # Collect client-supplied items (prefer notes over explicit list when present)
+    client_items: list[str] = []
+    if body.notes:
+        notes_text = strip_tags(body.notes)
+        # split by newlines and common separators
+        parts = [p.strip() for p in _NOTE_SPLIT_RE.split(notes_text) if p.strip()]
+        client_items.extend(parts)
+    if body.tasks:
+        # explicit tasks override/augment; keep them after notes so notes are preferred
+        client_items.extend([t.strip() for t in body.tasks if t and t.strip()])
+    return client_items
+
+
+def collect_routine_items(body: RoutineGenerateRequest, db_tasks: list[Tasks]) -> list[str]:
+    client_items = collect_client_items(body)
+
+    # Build final merged list (notes/tasks first, then DB tasks), dedupe case-insensitively
+    final_items: list[str] = []
+    seen = set()
+
+    def add_item(name: str):
+        key = name.strip().lower()
+        if not key or key in seen:
+            return
+        seen.add(key)
+        final_items.append(name.strip())
+
+    for item in client_items:
+        add_item(item)
+
+    for t in db_tasks:
+        # include any DB task names (and amount_of_time if present)
+        name = t.task_name
+        if getattr(t, "amount_of_time", None):
+            name = f"{name} ({t.amount_of_time} min)"
+        add_item(name)
+
+    return final_items
+
+
+def rank_routine_items(body: RoutineGenerateRequest, db_tasks: list[Tasks], energy_level: int | None = None) -> list[str]:
+    """Prompt items in priority order: client items first, then stored tasks by scheduler score."""
+    energy_level = body.energy_level if energy_level is None else energy_level
+    ranked = sorted(db_tasks, key=lambda t: -score(candidate_from_task(t), energy_level))
+    return collect_routine_items(body, ranked)
+
+
+def estimate_tokens(text: str) -> int:
+    # Llama-family tokenizers average about four characters per token on English text
+    return -(-len(text) // 4)
+
+
+# The instructions come first and never change, so the model server can reuse the
+# evaluated prefix across requests; only the short tail after them varies.
+_ROUTINE_INSTRUCTIONS = (
+    "Generate one morning routine and one evening routine in a list format that includes the estimated amount of time for each task with the total estimated amount of time at the end of each list for someone with the energy level given below (1 = low, 5 = full energy). "
+    "Include optional additional tasks that can be done if the person has a little more energy. "
+    "Prefer tasks from the user's available tasks list and use that list as the primary source; it is ordered by priority. "
+    "If a task from the list is not applicable, you may skip it, but favor items from the provided list. "
+)
+_ROUTINE_REQUEST = "\nEnergy level: {energy_level}\nUser tasks: {task_list}\n"
+
+_ROUTINE_JSON_INSTRUCTIONS = (
+    "Respond with JSON only. Put morning tasks in 'morning' and evening tasks in 'evening'. "
+    "Each task has a short 'title', its estimated duration in whole 'minutes', and 'optional' set to true "
+    "only for the extra tasks for someone with a little more energy."
+)
+
+# Structured variant, used together with format=ROUTINE_PLAN_SCHEMA
+ROUTINE_JSON_TEMPLATE = _ROUTINE_INSTRUCTIONS + _ROUTINE_JSON_INSTRUCTIONS + _ROUTINE_REQUEST
+
+# Multi-day generation: the task list goes into a shared prefix that the model server
+# evaluates once; each day only adds the short suffix
+ROUTINE_DAYS_PREFIX_TEMPLATE = _ROUTINE_INSTRUCTIONS + _ROUTINE_JSON_INSTRUCTIONS + (
+    " You will be asked for one day at a time; plan each day on its own.\nUser tasks: {task_list}\n"
+)
+ROUTINE_DAY_TEMPLATE = "Day: {label}\nEnergy level: {energy_level}\n"
+
+# Plain-text variant for streaming, where partial JSON would be useless to the client
+ROUTINE_TEXT_TEMPLATE = _ROUTINE_INSTRUCTIONS + (
+    "Do not use the '*' character anywhere in the output; avoid asterisk bullets. Use hyphens ('-') or numbered lists instead."
+    " Produce ONLY a list of tasks with an estimated duration for each task, followed by a single line with the total estimated time. "
+    "Do NOT include section headings, explanations, optional sections, or any extra commentary. "
+    "Each task must appear on its own line in one of these formats (examples):\n"
+    "- Task name (10 min)\n"
+    "1. Task name - 10 min\n"
+    "At the end include exactly one line that starts with 'Total estimated time:' followed by the total (e.g. 'Total estimated time: 45 min')."
+    " If the user has no tasks, return a single line: 'No tasks available.'"
+) + _ROUTINE_REQUEST
+
+
+@dataclass
+class RoutinePrompt:
+    text: str
+    items: list[str]
+    total_items: int
+    estimated_tokens: int
+
+    def meta(self, response=None) -> dict:
+        meta = {
+            "estimated_tokens": self.estimated_tokens,
+            "items": len(self.items),
+            "total_items": self.total_items,
+            "truncated": len(self.items) < self.total_items,
+        }
+        # the model server's own count, when the answer came from it
+        if response is not None and "prompt_eval_count" in response:
+            meta["eval_tokens"] = response["prompt_eval_count"]
+        return meta
+
+
+def _fit_prompt(template: str, energy_level: int, ranked_items: list[str], budget: int) -> RoutinePrompt:
+    # Keep the highest ranked items that fit; at least one so the model has something to plan
+    used = estimate_tokens(template.format(energy_level=energy_level, task_list=""))
+    kept: list[str] = []
+    for item in ranked_items:
+        cost = estimate_tokens(item + "; ")
+        if kept and used + cost > budget:
+            break
+        kept.append(item)
+        used += cost
+    text = template.format(energy_level=energy_level, task_list="; ".join(kept))
+    return RoutinePrompt(text=text, items=kept, total_items=len(ranked_items), estimated_tokens=estimate_tokens(text))
+
+
+def build_routine_prompt(energy_level: int, ranked_items: list[str], budget: int = ROUTINE_PROMPT_BUDGET) -> RoutinePrompt:
+    return _fit_prompt(ROUTINE_JSON_TEMPLATE, energy_level, ranked_items, budget)
+
+
+def build_routine_days_prefix(energy_level: int, ranked_items: list[str], budget: int = ROUTINE_PROMPT_BUDGET) -> RoutinePrompt:
+    return _fit_prompt(ROUTINE_DAYS_PREFIX_TEMPLATE, energy_level, ranked_items, budget)
+
+
+def build_routine_day_prompt(label: str, energy_level: int) -> str:
+    return ROUTINE_DAY_TEMPLATE.format(label=label, energy_level=energy_level)
+
+
+def build_routine_text_prompt(energy_level: int, ranked_items: list[str], budget: int = ROUTINE_PROMPT_BUDGET) -> RoutinePrompt:
+    return _fit_prompt(ROUTINE_TEXT_TEMPLATE, energy_level, ranked_items, budget)
+
+
+# "- Task (10 min)", "1. Task - 10 min", "Task: 1 hr (optional)" ...
+_ITEM_RE = re.compile(
+    r"^\s*(?:[-•\u2022]|\d+[.)])?\s*(?P<title>.+?)\s*"
+    r"(?:\(\s*(?P<paren>\d+)\s*(?P<paren_unit>[a-z]*)\.?\s*\)|[-–:]\s*(?P<bare>\d+)\s*(?P<bare_unit>[a-z]+)\.?)"
+    r"\s*(?P<optional>\(optional\))?\s*$",
+    re.IGNORECASE,
+)
+_TOTAL_RE = re.compile(r"^\s*total\b.*?:", re.IGNORECASE)
+_HEADING_RE = re.compile(r"\b(morning|evening|optional)\b", re.IGNORECASE)
+_HOUR_UNITS = {"h", "hr", "hrs", "hour", "hours"}
+
+
+def parse_routine_text(text: str) -> RoutinePlan:
+    """Fast fallback parser for free-form "- Task (10 min)" output.
+
+    Headings containing morning/evening/optional switch the section; items before any
+    heading go to the morning. Lines that are neither items nor headings are ignored.
+    """
+    plan = RoutinePlan()
+    period, optional = "morning", False
+    for line in text.splitlines():
+        if not line.strip() or _TOTAL_RE.match(line):
+            continue
+        match = _ITEM_RE.match(line)
+        if match is None:
+            for word in _HEADING_RE.findall(line):
+                word = word.lower()
+                if word == "optional":
+                    optional = True
+                else:
+                    period, optional = word, False
+            continue
+        amount = int(match["paren"] or match["bare"])
+        unit = (match["paren_unit"] or match["bare_unit"] or "").lower()
+        minutes = amount * 60 if unit in _HOUR_UNITS else amount
+        title = match["title"].strip(" -–:")
+        if not title:
+            continue
+        item = RoutinePlanItem(title=title, minutes=minutes, optional=optional or bool(match["optional"]))
+        getattr(plan, period).append(item)
+    return plan
+
+
+def parse_routine_output(text: str) -> RoutinePlan:
+    # JSON mode output first; anything else goes through the line parser
+    try:
+        return RoutinePlan.model_validate(json.loads(text))
+    except (ValueError, ValidationError):
+        return parse_routine_text(text)
+
+
+def render_routine_text(plan: RoutinePlan) -> str:
+    # Same line formats the prompt has always asked for, so existing clients keep parsing it
+    sections = []
+    for period, items, total in (("Morning", plan.morning, plan.morning_minutes), ("Evening", plan.evening, plan.evening_minutes)):
+        if not items:
+            continue
+        lines = [f"{period} routine"]
+        lines += [f"- {item.title} ({item.minutes} min){' (optional)' if item.optional else ''}" for item in items]
+        lines.append(f"Total estimated time: {total} min")
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+
+_ROUTINE_WORDING_INSTRUCTIONS = (
+    "Below is a morning and evening routine as JSON. "
+    "Rewrite each 'title' as a short, friendly instruction suited to the given energy level. Keep exactly the same tasks in the same order, "
+    "and do not change any 'minutes' or 'optional' value. Respond with JSON only, in the same shape."
+    "\nEnergy level: {energy_level}\nRoutine: {plan}\n"
+)
+
+
+def build_routine_wording_prompt(energy_level: int, plan: RoutinePlan) -> RoutinePrompt:
+    # Hybrid mode: the scheduler already chose the tasks (within its time budget), the model only rewrites the titles
+    text = _ROUTINE_WORDING_INSTRUCTIONS.format(energy_level=energy_level, plan=plan.model_dump_json(include={"morning", "evening"}))
+    titles = [item.title for item in plan.morning + plan.evening]
+    return RoutinePrompt(text=text, items=titles, total_items=len(titles), estimated_tokens=estimate_tokens(text))
+
+
+def apply_routine_wording(plan: RoutinePlan, worded: RoutinePlan) -> RoutinePlan:
+    """Take only the titles from the model's answer; anything that does not line up keeps the original."""
+    if len(worded.morning) != len(plan.morning) or len(worded.evening) != len(plan.evening):
+        return plan
+    return RoutinePlan(
+        morning=[item.model_copy(update={"title": new.title.strip() or item.title}) for item, new in zip(plan.morning, worded.morning)],
+        evening=[item.model_copy(update={"title": new.title.strip() or item.title}) for item, new in zip(plan.evening, worded.evening)],
+    )
@@ -0,0 +1,152 @@
+import heapq
+from dataclasses import dataclass
+
+from app.models import Tasks
+from app.schemas import RoutinePlan, RoutinePlanItem
+
+
+# Minutes available per period at each energy level (1 = low, 5 = full energy)
+ENERGY_BUDGETS = {1: 30, 2: 45, 3: 60, 4: 80, 5: 100}
+# Optional extras may use this much of the budget on top of the main routine
+OPTIONAL_SHARE = 0.25
+# Tasks without amount_of_time (and free-form note items) are assumed to take this long
+DEFAULT_TASK_MINUTES = 10
+# Levels are 1-5; missing levels count as the middle of the scale
+DEFAULT_LEVEL = 3
+# Only the best-scoring candidates go into the knapsack, which keeps large task lists in the millisecond range
+MAX_CANDIDATES = 200
+
+
+@dataclass(frozen=True, slots=True)
+class Candidate:
+    title: str
+    minutes: int
+    necessity: int = DEFAULT_LEVEL
+    difficulty: int = DEFAULT_LEVEL
+    # "morning", "evening" or None for tasks that fit either period
+    period: str | None = None
+    # named by the client in notes/tasks for this request
+    requested: bool = False
+
+
+def _level(value: int | None) -> int:
+    if value is None:
+        return DEFAULT_LEVEL
+    return min(5, max(1, value))
+
+
+def candidate_from_task(task: Tasks, requested: bool = False) -> Candidate:
+    minutes, period = task.amount_of_time, (task.routine_type or "").strip().lower()
+    return Candidate(
+        title=task.task_name.strip(),
+        minutes=minutes if minutes and minutes > 0 else DEFAULT_TASK_MINUTES,
+        necessity=_level(task.necessity_level),
+        difficulty=_level(task.difficulty_level),
+        period=period if period in ("morning", "evening") else None,
+        requested=requested,
+    )
+
+
+def build_candidates(client_items: list[str], db_tasks: list[Tasks]) -> list[Candidate]:
+    """Merge client items and stored tasks, deduplicated case-insensitively like the prompt list.
+
+    `db_tasks` may be Tasks instances or rows selecting the same columns.
+    """
+    stored: dict[str, Tasks] = {}
+    for task in db_tasks:
+        key = (task.task_name or "").strip().lower()
+        if key:
+            stored.setdefault(key, task)
+    candidates: list[Candidate] = []
+    seen = set()
+    for name in client_items:
+        key = name.strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        task = stored.get(key)
+        # a client item naming a stored task keeps the task's levels and duration
+        candidates.append(Candidate(title=name.strip(), minutes=DEFAULT_TASK_MINUTES, requested=True) if task is None else candidate_from_task(task, True))
+    candidates.extend(candidate_from_task(task) for key, task in stored.items() if key not in seen)
+    return candidates
+
+
+def score(candidate: Candidate, energy_level: int) -> float:
+    """Value of doing a task at this energy level; the knapsack maximizes the sum of these."""
+    value = candidate.necessity * 10.0
+    # hard tasks are worth less when energy is low, easy ones a little more
+    strain = candidate.difficulty - energy_level
+    value -= 6.0 * max(0, strain)
+    value += 2.0 * max(0, -strain)
+    if candidate.requested:
+        value += 25.0
+    return max(value, 1.0)
+
+
+def _knapsack(items: list[Candidate], budget: int, energy_level: int) -> list[Candidate]:
+    # 0/1 knapsack over whole minutes; budgets are at most a couple of hundred minutes
+    best = [0.0] * (budget + 1)
+    keep = [[False] * (budget + 1) for _ in items]
+    for index, item in enumerate(items):
+        if item.minutes > budget:
+            continue
+        value = score(item, energy_level)
+        row = keep[index]
+        for capacity in range(budget, item.minutes - 1, -1):
+            candidate_value = best[capacity - item.minutes] + value
+            if candidate_value > best[capacity]:
+                best[capacity] = candidate_value
+                row[capacity] = True
+    chosen: list[Candidate] = []
+    capacity = budget
+    for index in range(len(items) - 1, -1, -1):
+        if keep[index][capacity]:
+            chosen.append(items[index])
+            capacity -= items[index].minutes
+    return chosen
+
+
+def _sort_key(candidate: Candidate) -> tuple:
+    return (candidate.difficulty, -candidate.necessity, candidate.title.lower())
+
+
+def _fill_optional(leftovers: list[Candidate], budget: int, energy_level: int) -> list[Candidate]:
+    extras: list[Candidate] = []
+    ranked = sorted(leftovers, key=lambda c: (-score(c, energy_level) / c.minutes, c.title.lower()))
+    for candidate in ranked:
+        if candidate.minutes <= budget:
+            extras.append(candidate)
+            budget -= candidate.minutes
+    return extras
+
+
+def schedule_routine(candidates: list[Candidate], energy_level: int) -> RoutinePlan:
+    """Pack candidates into a morning and an evening routine for the given energy level.
+
+    Each period is a 0/1 knapsack over its minute budget; morning is filled first from
+    morning and unassigned tasks, evening from evening tasks and whatever is left. The
+    result is deterministic: morning runs easy to hard, evening hard to easy.
+    """
+    energy_level = min(5, max(1, energy_level))
+    budget = ENERGY_BUDGETS[energy_level]
+    pool = heapq.nlargest(MAX_CANDIDATES, candidates, key=lambda c: (score(c, energy_level), -c.minutes, c.title.lower()))
+    # stable input order for the DP so equal-value choices do not depend on heap internals
+    pool.sort(key=lambda c: c.title.lower())
+
+    morning = _knapsack([c for c in pool if c.period in ("morning", None)], budget, energy_level)
+    taken = {id(c) for c in morning}
+    evening = _knapsack([c for c in pool if c.period in ("evening", None) and id(c) not in taken], budget, energy_level)
+    taken.update(id(c) for c in evening)
+
+    extra_budget = int(budget * OPTIONAL_SHARE)
+    morning_extra = _fill_optional([c for c in pool if c.period in ("morning", None) and id(c) not in taken], extra_budget, energy_level)
+    taken.update(id(c) for c in morning_extra)
+    evening_extra = _fill_optional([c for c in pool if c.period in ("evening", None) and id(c) not in taken], extra_budget, energy_level)
+
+    def items(chosen: list[Candidate], extras: list[Candidate], reverse: bool) -> list[RoutinePlanItem]:
+        ordered = sorted(chosen, key=_sort_key, reverse=reverse)
+        return [RoutinePlanItem(title=c.title, minutes=c.minutes) for c in ordered] + [
+            RoutinePlanItem(title=c.title, minutes=c.minutes, optional=True) for c in extras
+        ]
+
+    return RoutinePlan(morning=items(morning, morning_extra, False), evening=items(evening, evening_extra, True))
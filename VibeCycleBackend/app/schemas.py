@@ -1,4 +1,34 @@
-from pydantic import BaseModel, Field
+from typing import Literal
+
+from pydantic import AwareDatetime, BaseModel, Field, computed_field
+
+
+class RoutinePlanItem(BaseModel):
+    title: str = Field(..., min_length=1)
+    minutes: int = Field(..., ge=0)
+    optional: bool = False
+
+
+class RoutinePlan(BaseModel):
+    """Structured morning/evening routine; totals count only the non-optional items."""
+
+    morning: list[RoutinePlanItem] = []
+    evening: list[RoutinePlanItem] = []
+
+    @computed_field
+    @property
+    def morning_minutes(self) -> int:
+        return sum(item.minutes for item in self.morning if not item.optional)
+
+    @computed_field
+    @property
+    def evening_minutes(self) -> int:
+        return sum(item.minutes for item in self.evening if not item.optional)
+
+    @computed_field
+    @property
+    def total_minutes(self) -> int:
+        return self.morning_minutes + self.evening_minutes
 
 
 class CreateRoutineRequest(BaseModel):
@@ -8,10 +38,30 @@ class CreateRoutineRequest(BaseModel):
 class CreateSavedRoutine(BaseModel):
     title: str | None = None
     content: str
+    # structured form of content; parsed from content when omitted
+    plan: RoutinePlan | None = None
+
+
+class TaskRecord(BaseModel):
+    # a task line of an NDJSON import; the owner is always the importing user
+    task_name: str = Field(..., min_length=1)
+    routine_type: str | None = None
+    necessity_level: int | None = None
+    difficulty_level: int | None = None
+    amount_of_time: int | None = None
+
+
+class CompletionCreate(BaseModel):
+    # completed_at defaults to the time the server receives the click
+    task: str = Field(..., min_length=1, max_length=200)
+    routine_id: int | None = None
+    completed_at: AwareDatetime | None = None
 
 
 class UpdateSavedRoutine(BaseModel):
     title: str | None = None
+    content: str | None = None
+    plan: RoutinePlan | None = None
 
 
 # require non-empty username and password
@@ -32,4 +82,24 @@ class RoutineGenerateRequest(BaseModel):
     # Free-form notes (may be plain text or small HTML snippet) to prioritize when generating
     notes: str | None = None
     # Optional explicit list of task names
-    tasks: list[str] | None = None
\ No newline at end of file
+    tasks: list[str] | None = None
+    # llm: model writes the routine, falling back to the heuristic scheduler on errors/timeouts
+    # heuristic: scheduler only, no model call; hybrid: scheduler picks, model only rewords
+    mode: Literal["llm", "heuristic", "hybrid"] = "llm"
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class RoutineDay(BaseModel):
+    label: str = Field(..., min_length=1, max_length=40)
+    energy_level: int = Field(3, ge=1, le=5)
+
+
+class WeeklyRoutineRequest(BaseModel):
+    # Seven weekdays by default; pass e.g. five days labelled "Energy 1".."Energy 5" for energy variants
+    days: list[RoutineDay] = Field(default_factory=lambda: [RoutineDay(label=day) for day in WEEKDAYS], min_length=1, max_length=7)
+    notes: str | None = None
+    tasks: list[str] | None = None
+
+class PromptRequest(BaseModel):
+    prompt: str = Field(..., min_length=1)
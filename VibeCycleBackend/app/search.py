@@ -0,0 +1,209 @@
+"""Ranked full-text search over a user's saved routines and tasks.
+
+Postgres matches a generated `search_vector` column through its GIN index (added by
+migration e7b3c1d0a2f6); SQLite, for local and test databases, uses FTS5 tables that
+triggers keep in step with their base tables. Either way only matching rows are read,
+and highlighted snippets are built for the returned page only.
+"""
+from urllib.parse import urlencode
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.pagination import decode_cursor, encode_cursor
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+HIGHLIGHT_START, HIGHLIGHT_STOP = "<mark>", "</mark>"
+
+# Postgres weighs title/name matches as A and the rest as B (1.0 and 0.4 in ts_rank_cd);
+# the SQLite bm25 column weights keep the same ratio
+POSTGRES_SCHEMA = [
+    """ALTER TABLE savedroutine ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', content), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_savedroutine_search ON savedroutine USING gin (search_vector)",
+    """ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', task_name), 'A') || setweight(to_tsvector('english', coalesce(routine_type, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks USING gin (search_vector)",
+]
+
+# savedroutine_fts is an external-content table: the text lives in savedroutine only, found by
+# its integer key. tasks has no integer key, and its implicit rowid may be renumbered by VACUUM,
+# so tasks_fts keeps its own copy of the text under an id from tasks_fts_key, which maps the
+# stable (owner, task_name) key to an INTEGER PRIMARY KEY that VACUUM leaves alone.
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE savedroutine_fts USING fts5(title, content, content='savedroutine', content_rowid='id', tokenize='porter unicode61')",
+    """CREATE TRIGGER savedroutine_fts_insert AFTER INSERT ON savedroutine BEGIN
+        INSERT INTO savedroutine_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER savedroutine_fts_delete AFTER DELETE ON savedroutine BEGIN
+        INSERT INTO savedroutine_fts (savedroutine_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER savedroutine_fts_update AFTER UPDATE OF title, content ON savedroutine BEGIN
+        INSERT INTO savedroutine_fts (savedroutine_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO savedroutine_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    "INSERT INTO savedroutine_fts (savedroutine_fts) VALUES ('rebuild')",
+    "CREATE TABLE tasks_fts_key (id INTEGER PRIMARY KEY, owner TEXT NOT NULL, task_name TEXT NOT NULL, UNIQUE (owner, task_name))",
+    "CREATE VIRTUAL TABLE tasks_fts USING fts5(task_name, routine_type, tokenize='porter unicode61')",
+    """CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts_key (owner, task_name) VALUES (new.owner, new.task_name);
+        INSERT INTO tasks_fts (rowid, task_name, routine_type) VALUES (last_insert_rowid(), new.task_name, new.routine_type);
+    END""",
+    """CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        DELETE FROM tasks_fts WHERE rowid = (SELECT id FROM tasks_fts_key WHERE owner = old.owner AND task_name = old.task_name);
+        DELETE FROM tasks_fts_key WHERE owner = old.owner AND task_name = old.task_name;
+    END""",
+    """CREATE TRIGGER tasks_fts_update AFTER UPDATE OF owner, task_name, routine_type ON tasks BEGIN
+        UPDATE tasks_fts_key SET owner = new.owner, task_name = new.task_name WHERE owner = old.owner AND task_name = old.task_name;
+        UPDATE tasks_fts SET task_name = new.task_name, routine_type = new.routine_type
+        WHERE rowid = (SELECT id FROM tasks_fts_key WHERE owner = new.owner AND task_name = new.task_name);
+    END""",
+    "INSERT INTO tasks_fts_key (owner, task_name) SELECT owner, task_name FROM tasks",
+    """INSERT INTO tasks_fts (rowid, task_name, routine_type)
+        SELECT k.id, t.task_name, t.routine_type FROM tasks t JOIN tasks_fts_key k ON k.owner = t.owner AND k.task_name = t.task_name""",
+]
+
+# Keyset condition for the next page: after the last hit in (score desc, key asc) order
+_AFTER = " AND ({score} < :score OR ({score} = :score AND {key} > :key))"
+
+# The inner query pages through matches by rank; ts_headline, which re-parses the text,
+# then only runs for the rows of the page
+_POSTGRES_ROUTINES = """
+WITH query AS (SELECT websearch_to_tsquery('english', :q) AS query),
+page AS (
+    SELECT r.id, r.title, r.content, {score} AS score
+    FROM savedroutine r, query
+    WHERE r.owner = :owner AND r.search_vector @@ query.query{after}
+    ORDER BY score DESC, r.id
+    LIMIT :limit
+)
+SELECT page.id, page.title, page.score, ts_headline('english', page.content, query.query, :headline) AS snippet
+FROM page, query
+ORDER BY page.score DESC, page.id
+"""
+
+_POSTGRES_TASKS = """
+WITH query AS (SELECT websearch_to_tsquery('english', :q) AS query),
+page AS (
+    SELECT t.task_name, t.routine_type, t.necessity_level, t.difficulty_level, t.amount_of_time, {score} AS score
+    FROM tasks t, query
+    WHERE t.owner = :owner AND t.search_vector @@ query.query{after}
+    ORDER BY score DESC, t.task_name
+    LIMIT :limit
+)
+SELECT page.*, ts_headline('english', page.task_name, query.query, :headline) AS snippet
+FROM page, query
+ORDER BY page.score DESC, page.task_name
+"""
+
+_SQLITE_ROUTINES = """
+SELECT r.id, r.title, {score} AS score, snippet(savedroutine_fts, 1, :start, :stop, '…', 16) AS snippet
+FROM savedroutine_fts JOIN savedroutine r ON r.id = savedroutine_fts.rowid
+WHERE savedroutine_fts MATCH :q AND r.owner = :owner{after}
+ORDER BY score DESC, r.id
+LIMIT :limit
+"""
+
+_SQLITE_TASKS = """
+SELECT t.task_name, t.routine_type, t.necessity_level, t.difficulty_level, t.amount_of_time,
+       {score} AS score, highlight(tasks_fts, 0, :start, :stop) AS snippet
+FROM tasks_fts
+JOIN tasks_fts_key k ON k.id = tasks_fts.rowid
+JOIN tasks t ON t.owner = k.owner AND t.task_name = k.task_name
+WHERE tasks_fts MATCH :q AND k.owner = :owner{after}
+ORDER BY score DESC, t.task_name
+LIMIT :limit
+"""
+
+# (dialect, collection) -> (query, score expression, keyset column, extra parameters)
+_SEARCHES = {
+    ("postgresql", "routines"): (
+        _POSTGRES_ROUTINES, "ts_rank_cd(r.search_vector, query.query)::float8", "r.id",
+        {"headline": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=24, MinWords=8, MaxFragments=2"},
+    ),
+    ("postgresql", "tasks"): (
+        _POSTGRES_TASKS, "ts_rank_cd(t.search_vector, query.query)::float8", "t.task_name",
+        {"headline": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, HighlightAll=true"},
+    ),
+    # bm25 is lower for better matches, so it is negated to sort like ts_rank
+    ("sqlite", "routines"): (
+        _SQLITE_ROUTINES, "-bm25(savedroutine_fts, 2.5, 1.0)", "r.id",
+        {"start": HIGHLIGHT_START, "stop": HIGHLIGHT_STOP},
+    ),
+    ("sqlite", "tasks"): (
+        _SQLITE_TASKS, "-bm25(tasks_fts, 2.5, 1.0)", "t.task_name",
+        {"start": HIGHLIGHT_START, "stop": HIGHLIGHT_STOP},
+    ),
+}
+
+
+async def create_search_indexes(conn: AsyncConnection) -> None:
+    # for databases made by create_db_and_tables; Alembic installs the same objects otherwise
+    if conn.dialect.name == "postgresql":
+        statements = POSTGRES_SCHEMA
+    elif (await conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'savedroutine_fts'"))).first():
+        return
+    else:
+        statements = SQLITE_SCHEMA
+    for statement in statements:
+        await conn.execute(text(statement))
+
+
+class SearchParams:
+    """Query parameters for search endpoints: the words to look for, page size and keyset cursor."""
+
+    def __init__(
+        self,
+        q: str = Query(..., min_length=1, max_length=256, description="Words to look for; a hit contains all of them"),
+        limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+        cursor: str | None = Query(None, description="Opaque cursor from the previous page's X-Next-Cursor header"),
+    ) -> None:
+        self.q = q
+        self.limit = limit
+        self.cursor = cursor
+
+
+def fts5_query(q: str) -> str:
+    # each word as a quoted FTS5 string, so user input is never read as query syntax
+    return " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+async def _search(db: AsyncSession, collection: str, username: str, params: SearchParams, response: Response) -> list[dict]:
+    """Hits for `params.q` in the user's routines or tasks, best first.
+
+    Each hit has a `score` (higher is better, comparable within one search only) and a
+    `snippet` with the matched words wrapped in <mark>. The next page's cursor goes into
+    the X-Next-Cursor header, as for the list endpoints.
+    """
+    if not params.q.split():
+        return []
+    dialect = db.bind.dialect.name
+    sql, score, key, options = _SEARCHES[(dialect, collection)]
+    values = {"q": params.q if dialect == "postgresql" else fts5_query(params.q), "owner": username, "limit": params.limit + 1, **options}
+    after = ""
+    if params.cursor:
+        values["score"], values["key"] = decode_cursor(params.cursor, 2)
+        if not isinstance(values["score"], (int, float)):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        after = _AFTER.format(score=score, key=key)
+    rows = (await db.exec(text(sql.format(score=score, after=after)).bindparams(**values))).mappings().all()
+    hits = [dict(row) for row in rows[: params.limit]]
+    if len(rows) > params.limit:
+        last = hits[-1]
+        next_cursor = encode_cursor([last["score"], last["id" if collection == "routines" else "task_name"]])
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<?{urlencode({"q": params.q, "cursor": next_cursor, "limit": params.limit})}>; rel="next"'
+    return hits
+
+
+async def search_routines(db: AsyncSession, username: str, params: SearchParams, response: Response) -> list[dict]:
+    return await _search(db, "routines", username, params, response)
+
+
+async def search_tasks(db: AsyncSession, username: str, params: SearchParams, response: Response) -> list[dict]:
+    return await _search(db, "tasks", username, params, response)
@@ -0,0 +1,356 @@
+"""Task and routine operations shared by the HTTP API and the MCP tools.
+
+Callers pass an open session and the authenticated username; each operation does its
+own commit and the follow-up work (cache invalidation, precompute, change feed), so the
+same pool, caches and LLM gateway limits apply whichever way a request comes in.
+"""
+import asyncio
+import json
+import time
+
+from fastapi import HTTPException, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import delete, func, insert
+
+from app.cache import collection_versions, routine_cache
+from app.changes import change_feed
+from app.database import insert_on_conflict, new_session
+from app.embeddings import TaskEmbeddings
+from app.llm.gateway import GatewayBusy, get_gateway
+from app.models import RoutineItem, SavedRoutine, Tasks
+from app.pagination import ListParams, paginate
+from app.precompute import RoutinePrecomputer
+from app.routines import (
+    ROUTINE_MODEL,
+    ROUTINE_PLAN_SCHEMA,
+    ROUTINE_PROMPT_VERSION,
+    apply_routine_wording,
+    build_routine_day_prompt,
+    build_routine_days_prefix,
+    build_routine_prompt,
+    build_routine_wording_prompt,
+    collect_client_items,
+    collect_routine_items,
+    estimate_tokens,
+    parse_routine_output,
+    rank_routine_items,
+    render_routine_text,
+)
+from app.scheduler import build_candidates, schedule_routine
+from app.schemas import RoutineGenerateRequest, RoutinePlan, WeeklyRoutineRequest
+from app.settings import get_settings
+
+TASK_COLUMNS = list(Tasks.model_fields)
+ROUTINE_COLUMNS = list(SavedRoutine.model_fields)
+TASK_FIELDS = ("routine_type", "necessity_level", "difficulty_level", "amount_of_time")
+# the stored rows after an upsert, since fields sent as None keep their old values
+TASK_RETURNING = [getattr(Tasks, column) for column in TASK_COLUMNS]
+MAX_TASK_BATCH = 1000
+# Day generations of one /routine/week request that run at once (the gateway limit still applies)
+ROUTINE_WEEK_PARALLELISM = get_settings().routine_week_parallelism
+
+
+async def tasks_changed(username: str) -> None:
+    await routine_cache.invalidate_user(username)
+    routine_precompute.schedule(username)
+    await collection_versions.bump("tasks", username)
+    await collection_versions.bump("tasks", "*")
+
+
+async def routines_changed(username: str) -> None:
+    await collection_versions.bump("routines", username)
+
+
+### TASKS ###
+
+
+async def list_tasks(db: AsyncSession, username: str, params: ListParams, response: Response) -> list[dict]:
+    # only tasks owned by the user; the next-page cursor goes into the response headers
+    return await paginate(
+        db, Tasks, params, key=["task_name"], allowed=TASK_COLUMNS,
+        where=(Tasks.owner == username,), response=response,
+    )
+
+
+def task_upsert(db: AsyncSession, rows: list[dict] | None = None):
+    # Single-statement upsert keyed on (owner, task_name); fields left as None keep their stored value.
+    # Without rows, the statement is for executemany-style parameter lists.
+    stmt = insert_on_conflict(db, Tasks)
+    if rows is not None:
+        stmt = stmt.values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["owner", "task_name"],
+        set_={field: func.coalesce(stmt.excluded[field], getattr(Tasks, field)) for field in TASK_FIELDS},
+    )
+
+
+def task_row(task: Tasks, owner: str) -> dict:
+    row = {"owner": owner, "task_name": task.task_name}
+    row.update({field: getattr(task, field, None) for field in TASK_FIELDS})
+    return row
+
+
+def check_batch_size(items: list) -> None:
+    if len(items) > MAX_TASK_BATCH:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {MAX_TASK_BATCH} items")
+
+
+async def save_task_rows(db: AsyncSession, username: str, rows: list[dict]) -> list[dict]:
+    saved = (await db.exec(task_upsert(db, rows).returning(*TASK_RETURNING))).mappings().all()
+    await db.commit()
+    await tasks_changed(username)
+    saved = [dict(row) for row in saved]
+    await change_feed.publish(username, "tasks", "upsert", saved)
+    return saved
+
+
+async def upsert_tasks(db: AsyncSession, username: str, tasks: list[Tasks]) -> list[dict]:
+    """Upsert many tasks in one transaction and one statement, with the same rules as POST /tasks.
+
+    Repeated names within a batch are merged in order (later non-null fields win), since one
+    upsert statement cannot touch the same row twice. Results are returned in request order.
+    """
+    check_batch_size(tasks)
+    merged: dict[str, dict] = {}
+    results: list[dict] = []
+    for task in tasks:
+        name = (task.task_name or "").strip()
+        if not name:
+            results.append({"task_name": task.task_name, "status": "invalid", "detail": "task_name is required"})
+            continue
+        row = task_row(task, username)
+        if task.task_name in merged:
+            merged[task.task_name].update({k: v for k, v in row.items() if v is not None})
+            results.append({"task_name": task.task_name, "status": "merged"})
+            continue
+        merged[task.task_name] = row
+        results.append({"task_name": task.task_name, "status": "saved"})
+
+    if merged:
+        await save_task_rows(db, username, list(merged.values()))
+    return results
+
+
+async def delete_tasks(db: AsyncSession, username: str, task_names: list[str]) -> list[dict]:
+    check_batch_size(task_names)
+    stmt = (
+        delete(Tasks)
+        .where(Tasks.owner == username, Tasks.task_name.in_(set(task_names)))
+        .returning(Tasks.task_name)
+    )
+    deleted = set((await db.exec(stmt)).scalars().all()) if task_names else set()
+    await db.commit()
+    if deleted:
+        await tasks_changed(username)
+        await change_feed.publish(username, "tasks", "delete", sorted(deleted))
+    return [{"task_name": name, "status": "deleted" if name in deleted else "not_found"} for name in task_names]
+
+
+async def delete_task(db: AsyncSession, username: str, task_name: str) -> None:
+    result = await db.exec(delete(Tasks).where(Tasks.owner == username, Tasks.task_name == task_name))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail=f"Task '{task_name}' not found")
+    await db.commit()
+    await tasks_changed(username)
+    await change_feed.publish(username, "tasks", "delete", [task_name])
+
+
+### ROUTINES ###
+
+
+async def list_routines(db: AsyncSession, username: str, params: ListParams, response: Response) -> list[dict]:
+    # list views can pass fields=id,title to skip the routine content
+    return await paginate(
+        db, SavedRoutine, params, key=["id"], allowed=ROUTINE_COLUMNS,
+        where=(SavedRoutine.owner == username,), response=response,
+    )
+
+
+async def get_routine(db: AsyncSession, username: str, routine_id: int) -> SavedRoutine:
+    routine: SavedRoutine | None = await db.get(SavedRoutine, routine_id)
+    if not routine or routine.owner != username:
+        raise HTTPException(status_code=404, detail="Routine not found")
+    return routine
+
+
+def routine_item_rows(routine_id: int, plan: RoutinePlan) -> list[dict]:
+    return [
+        {"routine_id": routine_id, "period": period, "position": position, "title": item.title, "minutes": item.minutes, "optional": item.optional}
+        for period in ("morning", "evening")
+        for position, item in enumerate(getattr(plan, period))
+    ]
+
+
+async def store_routine_items(db: AsyncSession, routine_id: int, plan: RoutinePlan) -> None:
+    rows = routine_item_rows(routine_id, plan)
+    if rows:
+        await db.exec(insert(RoutineItem).values(rows))
+
+
+async def select_task_rows(db: AsyncSession, username: str) -> list:
+    # Plain rows rather than ORM instances: those cost several times more to build and
+    # read, which dominates scheduling for users with thousands of tasks
+    return (await db.exec(select(Tasks.task_name, *[getattr(Tasks, field) for field in TASK_FIELDS]).where(Tasks.owner == username))).all()
+
+
+async def generate_routine(db: AsyncSession, username: str, body: RoutineGenerateRequest, cache_ttl: float | None = None) -> dict:
+    # Validate energy level via Pydantic (1-5)
+    energy_level = body.energy_level
+    db_tasks = await select_task_rows(db, username)
+
+    final_items = collect_routine_items(body, db_tasks)
+
+    if not final_items:
+        return {"routine": "No tasks found. Add some tasks first to generate routines."}
+
+    # The scheduler is cheap enough to run on every request; it is the whole answer in
+    # heuristic mode, the task selection in hybrid mode and the fallback in llm mode
+    plan = schedule_routine(build_candidates(collect_client_items(body), db_tasks), energy_level)
+    if body.mode == "heuristic":
+        return plan_result(plan, body.mode, "heuristic")
+
+    model_tag = f"hybrid:{ROUTINE_MODEL}" if body.mode == "hybrid" else ROUTINE_MODEL
+    cache_key = await routine_cache.key(username, model_tag, energy_level, final_items, ROUTINE_PROMPT_VERSION)
+    cached = await routine_cache.get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    if body.mode == "hybrid":
+        prompt = build_routine_wording_prompt(energy_level, plan)
+    else:
+        prompt_tasks = await task_embeddings.select(username, body.notes, db_tasks)
+        prompt = build_routine_prompt(energy_level, rank_routine_items(body, prompt_tasks))
+
+    try:
+        response = await get_gateway().generate(model=ROUTINE_MODEL, prompt=prompt.text, format=ROUTINE_PLAN_SCHEMA)
+    except GatewayBusy:
+        raise
+    except Exception as e:
+        # Model slow or down: answer with the scheduler's plan rather than an error (not cached)
+        return {
+            **plan_result(plan, body.mode, "heuristic"),
+            "fallback": True,
+            "fallback_reason": str(e) or type(e).__name__,
+            "prompt": prompt.meta(),
+        }
+
+    if body.mode == "hybrid":
+        result = plan_result(apply_routine_wording(plan, parse_routine_output(response['response'])), body.mode, "hybrid")
+    else:
+        result = {**routine_result(response['response']), "mode": body.mode, "source": "llm"}
+    result["prompt"] = prompt.meta(response)
+    await routine_cache.set(cache_key, json.dumps(result), cache_ttl)
+    return result
+
+
+def plan_result(plan: RoutinePlan, mode: str, source: str) -> dict:
+    return {"routine": render_routine_text(plan), "plan": plan.model_dump(), "mode": mode, "source": source}
+
+
+def routine_result(text: str) -> dict:
+    # "routine" stays the familiar text form; "plan" is the validated structure behind it
+    plan = parse_routine_output(text)
+    if not plan.morning and not plan.evening:
+        # nothing recognisable, hand the model's text back as-is
+        return {"routine": text, "plan": None}
+    return {"routine": render_routine_text(plan), "plan": plan.model_dump()}
+
+
+async def generate_week(db: AsyncSession, username: str, body: WeeklyRoutineRequest) -> dict:
+    """One routine per day, with the task part of the prompt evaluated by the model only once.
+
+    Days whose generation fails get the scheduler's plan instead; the result is cached only
+    when every day came from the model. "prompt" reports the tokens the shared prefix saved.
+    """
+    db_tasks = await select_task_rows(db, username)
+    final_items = collect_routine_items(body, db_tasks)
+    if not final_items:
+        return {"days": [], "routine": "No tasks found. Add some tasks first to generate routines."}
+
+    day_keys = [f"{index}:{day.label}:{day.energy_level}" for index, day in enumerate(body.days)]
+    cache_key = await routine_cache.key(username, f"week:{ROUTINE_MODEL}", 0, final_items + day_keys, ROUTINE_PROMPT_VERSION)
+    cached = await routine_cache.get(cache_key)
+    if cached is not None:
+        return json.loads(cached)
+
+    energy_level = round(sum(day.energy_level for day in body.days) / len(body.days))
+    prompt_tasks = await task_embeddings.select(username, body.notes, db_tasks)
+    prefix = build_routine_days_prefix(energy_level, rank_routine_items(body, prompt_tasks, energy_level))
+    candidates = build_candidates(collect_client_items(body), db_tasks)
+    gateway = get_gateway()
+
+    # Evaluate the shared prefix once: num_predict=0 returns its context without generating.
+    # Each day then sends only its suffix along with that context.
+    context, prefix_tokens = None, prefix.estimated_tokens
+    try:
+        response = await gateway.generate(model=ROUTINE_MODEL, prompt=prefix.text, options={"num_predict": 0})
+        context = response["context"] if "context" in response else None
+        if "prompt_eval_count" in response and response["prompt_eval_count"]:
+            prefix_tokens = response["prompt_eval_count"]
+    except GatewayBusy:
+        raise
+    except Exception:
+        # days below send the full prompt, and fall back to the scheduler if the model is down
+        pass
+
+    limit = asyncio.Semaphore(ROUTINE_WEEK_PARALLELISM)
+
+    async def plan_day(day) -> tuple[dict, int | None]:
+        suffix = build_routine_day_prompt(day.label, day.energy_level)
+        prompt = suffix if context else prefix.text + suffix
+        options = {"context": context} if context else {}
+        async with limit:
+            try:
+                response = await gateway.generate(model=ROUTINE_MODEL, prompt=prompt, format=ROUTINE_PLAN_SCHEMA, **options)
+            except Exception as e:
+                plan = schedule_routine(candidates, day.energy_level)
+                result = {**plan_result(plan, "llm", "heuristic"), "fallback": True, "fallback_reason": str(e) or type(e).__name__}
+                return {"label": day.label, "energy_level": day.energy_level, **result}, None
+        evaluated = response["prompt_eval_count"] if "prompt_eval_count" in response and response["prompt_eval_count"] else estimate_tokens(prompt)
+        result = {**routine_result(response["response"]), "mode": "llm", "source": "llm"}
+        return {"label": day.label, "energy_level": day.energy_level, **result}, evaluated
+
+    planned = await asyncio.gather(*(plan_day(day) for day in body.days))
+    days = [day for day, _ in planned]
+    evaluated = [tokens for _, tokens in planned if tokens is not None]
+    # what the model days would have cost as separate /routine calls, vs what was evaluated
+    independent = sum(prefix_tokens + estimate_tokens(build_routine_day_prompt(day["label"], day["energy_level"])) for day, tokens in planned if tokens is not None)
+    spent = (prefix_tokens if context else 0) + sum(evaluated)
+    result = {
+        "days": days,
+        "prompt": {
+            **prefix.meta(),
+            "context_reused": context is not None,
+            "prefix_tokens": prefix_tokens,
+            "prompt_tokens": spent,
+            "independent_prompt_tokens": independent,
+            "saved_prompt_tokens": independent - spent,
+        },
+    }
+    if all(not day.get("fallback") for day in days):
+        await routine_cache.set(cache_key, json.dumps(result))
+    return result
+
+
+async def generate_in_background(owner: str, body: RoutineGenerateRequest, cache_ttl: float | None = None) -> dict:
+    # already off the request path, so wait for a gateway slot instead of failing, but only
+    # for LLM_BUSY_WAIT: a gateway that stays saturated fails the job rather than pinning a worker
+    deadline = time.monotonic() + get_settings().llm_busy_wait
+    while True:
+        try:
+            async with new_session() as db:
+                return await generate_routine(db, owner, body, cache_ttl)
+        except GatewayBusy as e:
+            if time.monotonic() + e.retry_after > deadline:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+
+async def _precompute_routine(username: str, energy_level: int, ttl: float) -> None:
+    # same request as a plain POST /routine at this energy level, so that request is a cache hit
+    await generate_in_background(username, RoutineGenerateRequest(energy_level=energy_level), ttl)
+
+
+routine_precompute = RoutinePrecomputer.from_settings(_precompute_routine, shared_cache=routine_cache.shared)
+task_embeddings = TaskEmbeddings.from_settings(lambda model, inputs: get_gateway().embed(model, inputs))
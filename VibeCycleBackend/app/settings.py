@@ -0,0 +1,121 @@
+"""All settings of the app, read once from the environment (or .env) on first use.
+
+Every module takes its configuration from `get_settings()` instead of reading variables
+itself, so there is one loader, one place listing the variables and their defaults
+(see the README tables) and no per-module parsing at import time.
+"""
+from dataclasses import MISSING, dataclass, fields
+from functools import lru_cache
+
+from decouple import config
+
+
+def _keep_alive(value: str) -> float | str | None:
+    # Ollama takes a duration ("30m") or a number of seconds (negative keeps the model loaded)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+# fields that need more than int(), float() or decouple's boolean parsing
+_CASTS = {"llm_keep_alive": _keep_alive}
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    # required
+    database_url: str
+    secret_key: str
+    algorithm: str
+    access_token_expire_minutes: int
+
+    # database pool
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 10000
+
+    # authentication
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    auth_cache_ttl: float = 30.0
+    auth_cache_size: int = 4096
+
+    # model server
+    ollama_host: str | None = None
+    llm_concurrency: int = 2
+    llm_queue_size: int = 16
+    llm_timeout: float = 120.0
+    llm_retry_after: int = 5
+    llm_busy_wait: float = 300.0
+    llm_keep_alive: float | str | None = "30m"
+    llm_warmup: bool = True
+
+    # routine generation
+    routine_prompt_budget: int = 1024
+    routine_cache_ttl: float = 600.0
+    routine_cache_size: int = 1024
+    routine_job_workers: int = 2
+    routine_job_ttl: float = 600.0
+    routine_job_queue_size: int = 100
+    routine_jobs_durable: bool = False
+    routine_precompute: bool = True
+    routine_precompute_delay: float = 10.0
+    routine_precompute_ttl: float = 86400.0
+    routine_precompute_concurrency: int = 1
+    routine_week_parallelism: int = 2
+    routine_embed_top_k: int = 30
+    routine_embed_cache_size: int = 128
+    embed_model: str = "nomic-embed-text"
+    embed_retry_after: float = 30.0
+
+    # shared cache and rate limiting
+    redis_url: str = ""
+    rate_limit: bool = True
+    rate_limit_capacity: float = 120.0
+    rate_limit_refill: float = 2.0
+
+    # change feed
+    change_feed_backend: str = "memory"
+    change_feed_queue_size: int = 256
+    change_feed_replay: int = 1000
+    change_feed_heartbeat: float = 15.0
+
+    # MCP
+    mcp_mount: bool = True
+    mcp_user: str = ""
+
+    # export and import
+    export_batch: int = 1000
+    import_batch: int = 1000
+    max_import_line: int = 1_048_576
+
+    # completions
+    completion_batch: int = 500
+    completion_flush_interval: float = 2.0
+    completion_buffer_size: int = 10000
+
+    # launcher
+    web_concurrency: int = 1
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        # each field comes from its upper-cased variable; fields without a default are required
+        values = {}
+        for field in fields(cls):
+            options = {} if field.default is MISSING else {"default": field.default}
+            cast = _CASTS.get(field.name, field.type if field.type in (int, float, bool) else None)
+            if cast is not None:
+                options["cast"] = cast
+            values[field.name] = config(field.name.upper(), **options)
+        return cls(**values)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return Settings.from_env()
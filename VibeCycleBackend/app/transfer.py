@@ -0,0 +1,219 @@
+"""Bulk export and import of a user's tasks and saved routines as NDJSON, one record per line:
+
+    {"type": "export", "version": 1, "owner": "ann", "exported_at": "..."}
+    {"type": "task", "task_name": "Stretch", "routine_type": "morning", "amount_of_time": 10, ...}
+    {"type": "routine", "title": "Monday", "content": "...", "plan": {"morning": [...], "evening": [...]}}
+
+Both directions hold a bounded number of rows in memory whatever the row count: the
+export reads from server-side cursors a partition at a time, and the import parses the
+upload as it arrives and writes every IMPORT_BATCH records in their own transaction.
+"""
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import services
+from app.changes import change_feed
+from app.database import new_session
+from app.models import RoutineItem, SavedRoutine, Tasks
+from app.routines import parse_routine_output
+from app.schemas import CreateSavedRoutine, RoutinePlan, TaskRecord
+from app.settings import get_settings
+
+EXPORT_VERSION = 1
+# rows fetched per round trip, and lines per chunk of the response
+EXPORT_BATCH = get_settings().export_batch
+# records written per transaction
+IMPORT_BATCH = get_settings().import_batch
+MAX_IMPORT_LINE = get_settings().max_import_line
+# errors listed in the import response; the rest are only counted as skipped
+MAX_IMPORT_ERRORS = 100
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+### EXPORT ###
+
+
+async def export_ndjson(username: str) -> AsyncIterator[str]:
+    # its own session: the response body is produced after the endpoint has returned
+    async with new_session() as db:
+        yield _line({"type": "export", "version": EXPORT_VERSION, "owner": username, "exported_at": datetime.now(timezone.utc).isoformat()})
+        async for chunk in _task_lines(db, username):
+            yield chunk
+        async for chunk in _routine_lines(db, username):
+            yield chunk
+
+
+async def _task_lines(db: AsyncSession, username: str) -> AsyncIterator[str]:
+    stmt = (
+        select(Tasks.task_name, *[getattr(Tasks, field) for field in services.TASK_FIELDS])
+        .where(Tasks.owner == username)
+        .order_by(Tasks.task_name)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+    rows = await db.stream(stmt)
+    async for partition in rows.partitions():
+        yield "".join(_line({"type": "task", **row._asdict()}) for row in partition)
+
+
+async def _routine_lines(db: AsyncSession, username: str) -> AsyncIterator[str]:
+    # Routines and their items come from two cursors in the same order and are merged here,
+    # rather than a join that would repeat each routine's content once per item
+    routines = await db.stream(
+        select(SavedRoutine.id, SavedRoutine.title, SavedRoutine.content)
+        .where(SavedRoutine.owner == username)
+        .order_by(SavedRoutine.id)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )
+    items = (await db.stream(
+        select(RoutineItem.routine_id, RoutineItem.period, RoutineItem.title, RoutineItem.minutes, RoutineItem.optional)
+        .join(SavedRoutine, RoutineItem.routine_id == SavedRoutine.id)
+        .where(SavedRoutine.owner == username)
+        # "morning" sorts after "evening", so descending puts the morning section first
+        .order_by(RoutineItem.routine_id, RoutineItem.period.desc(), RoutineItem.position)
+        .execution_options(yield_per=EXPORT_BATCH)
+    )).__aiter__()
+    item = await anext(items, None)
+    async for partition in routines.partitions():
+        lines = []
+        for routine in partition:
+            plan: dict[str, list] = {"morning": [], "evening": []}
+            while item is not None and item.routine_id <= routine.id:
+                if item.routine_id == routine.id:
+                    plan.setdefault(item.period, []).append({"title": item.title, "minutes": item.minutes, "optional": item.optional})
+                item = await anext(items, None)
+            lines.append(_line({"type": "routine", "title": routine.title, "content": routine.content, "plan": plan}))
+        yield "".join(lines)
+
+
+### IMPORT ###
+
+
+async def _split_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes | None]:
+    # None stands for a line longer than MAX_IMPORT_LINE, which is dropped as it arrives
+    buffer = b""
+    oversized = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield None if oversized or len(line) > MAX_IMPORT_LINE else line
+            oversized = False
+        if len(buffer) > MAX_IMPORT_LINE:
+            buffer = b""
+            oversized = True
+    if oversized or len(buffer) > MAX_IMPORT_LINE:
+        yield None
+    elif buffer:
+        yield buffer
+
+
+class _ImportBatch:
+    def __init__(self) -> None:
+        # task name -> row; a name repeated within a batch is merged, later non-null fields win
+        self.tasks: dict[str, dict] = {}
+        self.routines: list[tuple[CreateSavedRoutine, RoutinePlan]] = []
+
+    def __len__(self) -> int:
+        return len(self.tasks) + len(self.routines)
+
+    def add_task(self, username: str, record: TaskRecord) -> None:
+        row = {"owner": username, **record.model_dump(include={"task_name", *services.TASK_FIELDS})}
+        if record.task_name in self.tasks:
+            self.tasks[record.task_name].update({key: value for key, value in row.items() if value is not None})
+        else:
+            self.tasks[record.task_name] = row
+
+    def add_routine(self, record: CreateSavedRoutine) -> None:
+        self.routines.append((record, record.plan or parse_routine_output(record.content)))
+
+    async def write(self, db: AsyncSession, username: str) -> tuple[int, int]:
+        # executemany statements: asyncpg pipelines them, SQLite runs them on one prepared statement
+        if self.tasks:
+            await db.exec(services.task_upsert(db), params=list(self.tasks.values()))
+        if self.routines:
+            stmt = insert(SavedRoutine).returning(SavedRoutine.id, sort_by_parameter_order=True)
+            params = [{"owner": username, "title": record.title, "content": record.content} for record, _ in self.routines]
+            ids = (await db.exec(stmt, params=params)).scalars().all()
+            item_rows = [row for routine_id, (_, plan) in zip(ids, self.routines) for row in services.routine_item_rows(routine_id, plan)]
+            if item_rows:
+                await db.exec(insert(RoutineItem), params=item_rows)
+        await db.commit()
+        written = len(self.tasks), len(self.routines)
+        self.tasks, self.routines = {}, []
+        return written
+
+
+async def import_ndjson(db: AsyncSession, username: str, chunks: AsyncIterable[bytes]) -> dict:
+    """Upsert tasks by name and add routines from an NDJSON stream (as written by the export).
+
+    Lines are validated one by one; invalid ones are skipped and reported with their line
+    number instead of failing the import. Each batch commits on its own, so an import cut
+    short keeps the batches written before it.
+    """
+    # the session has been open since authentication; release its connection while the upload arrives
+    await db.rollback()
+    batch = _ImportBatch()
+    imported = {"tasks": 0, "routines": 0}
+    skipped = 0
+    errors: list[dict] = []
+
+    def reject(number: int, detail: str) -> None:
+        nonlocal skipped
+        skipped += 1
+        if len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"line": number, "detail": detail})
+
+    try:
+        number = 0
+        async for line in _split_lines(chunks):
+            number += 1
+            if line is None:
+                reject(number, f"Line longer than {MAX_IMPORT_LINE} bytes")
+                continue
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record.get("type") if isinstance(record, dict) else None
+                if kind == "task":
+                    batch.add_task(username, TaskRecord.model_validate(record))
+                elif kind == "routine":
+                    batch.add_routine(CreateSavedRoutine.model_validate(record))
+                elif kind == "export":
+                    if record.get("version") != EXPORT_VERSION:
+                        raise HTTPException(status_code=422, detail=f"Unsupported export version {record.get('version')!r}")
+                else:
+                    reject(number, f"Unknown record type {kind!r}")
+            except ValidationError as e:
+                reject(number, "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors()))
+                continue
+            except ValueError as e:
+                # not JSON, or not UTF-8
+                reject(number, str(e))
+                continue
+            if len(batch) >= IMPORT_BATCH:
+                tasks, routines = await batch.write(db, username)
+                imported["tasks"] += tasks
+                imported["routines"] += routines
+        tasks, routines = await batch.write(db, username)
+        imported["tasks"] += tasks
+        imported["routines"] += routines
+    finally:
+        # once for the whole import: clients refetch rather than receive every row as an event
+        if imported["tasks"]:
+            await services.tasks_changed(username)
+            await change_feed.publish(username, "tasks", "reset", [])
+        if imported["routines"]:
+            await services.routines_changed(username)
+            await change_feed.publish(username, "routines", "reset", [])
+    return {**imported, "skipped": skipped, "errors": errors}
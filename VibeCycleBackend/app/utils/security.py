@@ -6,7 +6,7 @@ from jwt.exceptions import InvalidTokenError
 from decouple import config
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from passlib.context import CryptContext
 
 from app.models import User
@@ -27,11 +27,11 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def hash_password(password: str) -> str:
     raise NotImplementedError()
 
-def authenticate_user(username: str, password: str, db: Session) -> User | bool:
+def authenticate_user(username: str, password: str, db: AsyncSession) -> User | bool:
     raise NotImplementedError()
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     raise NotImplementedError()
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: AsyncSession = Depends(get_db)) -> User:
     raise NotImplementedError()
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""Shared setup for the benchmark scripts: SQLite database, env defaults and latency stats.
+
+Run benchmarks from VibeCycleBackend, e.g. `python -m benchmarks.login_storm`.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def configure_env(**overrides: str) -> str:
+    # Must run before anything under app/ is imported: settings are read once, on first use
+    db_path = os.path.join(tempfile.mkdtemp(prefix="vibecycle-bench-"), "bench.db")
+    defaults = {
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "SECRET_KEY": "benchmark-secret-key-benchmark-secret-key",
+        "ALGORITHM": "HS256",
+        "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+        # a benchmark drives a few clients far harder than real users would
+        "RATE_LIMIT": "false",
+    }
+    defaults.update(overrides)
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+    return os.environ["DATABASE_URL"]
+
+
+async def create_schema() -> None:
+    from app.database import create_db_and_tables
+
+    await create_db_and_tables()
+
+
+def percentiles(samples: list[float]) -> dict:
+    """Summarize latencies given in seconds as milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
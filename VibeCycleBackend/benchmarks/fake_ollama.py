@@ -0,0 +1,164 @@
+"""Stub Ollama server for benchmarks: answers /api/generate with a canned routine.
+
+Latency is modelled as a fixed time to first token plus a steady token rate, for both
+streaming (NDJSON) and non-streaming calls. Structured-output requests (`format`)
+get a JSON plan, everything else the plain-text list. A request carrying `context`
+is charged only for its new prompt tokens, as with Ollama's prefix cache, and
+`num_predict: 0` just evaluates the prompt and returns its context. /api/embed returns
+hashed bag-of-words vectors, so texts sharing words come out similar.
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.3 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+
+ROUTINE_PLAN = {
+    "morning": [
+        {"title": "Drink a glass of water", "minutes": 2, "optional": False},
+        {"title": "Stretch", "minutes": 10, "optional": False},
+        {"title": "Plan the day", "minutes": 5, "optional": False},
+        {"title": "Short walk", "minutes": 15, "optional": True},
+    ],
+    "evening": [
+        {"title": "Tidy up", "minutes": 10, "optional": False},
+        {"title": "Read", "minutes": 20, "optional": False},
+        {"title": "Journal", "minutes": 10, "optional": True},
+    ],
+}
+ROUTINE_TEXT = (
+    "- Drink a glass of water (2 min)\n- Stretch (10 min)\n- Plan the day (5 min)\n"
+    "- Tidy up (10 min)\n- Read (20 min)\nTotal estimated time: 47 min"
+)
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+EMBED_DIMENSIONS = 64
+
+
+def embed_text(text: str) -> list[float]:
+    vector = [0.0] * EMBED_DIMENSIONS
+    for word in _WORD_RE.findall(text.lower()):
+        vector[zlib.crc32(word.encode()) % EMBED_DIMENSIONS] += 1.0
+    return vector
+
+
+def create_app(latency: float = 0.2, tokens_per_second: float = 50.0, load_seconds: float = 0.0):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI(title="fake-ollama")
+    app.state.loaded = load_seconds <= 0
+    app.state.requests = 0
+
+    def chunk(model: str, text: str, done: bool, **extra) -> dict:
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "response": text,
+            "done": done,
+            **({"done_reason": "stop"} if done else {}),
+            **extra,
+        }
+
+    async def load() -> int:
+        # first call pays the model load, like a cold Ollama
+        if app.state.loaded:
+            return 0
+        await asyncio.sleep(load_seconds)
+        app.state.loaded = True
+        return int(load_seconds * 1e9)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        model = body.get("model", "llama3")
+        prompt = body.get("prompt", "")
+        load_ns = await load()
+        if not prompt:
+            # keep-alive warmup: load only
+            return chunk(model, "", True, load_duration=load_ns)
+        prompt_tokens = max(1, len(prompt) // 4)
+        context = list(body.get("context") or []) + list(range(prompt_tokens))
+        if (body.get("options") or {}).get("num_predict") == 0:
+            await asyncio.sleep(latency)
+            return chunk(model, "", True, context=context, prompt_eval_count=prompt_tokens, eval_count=0, load_duration=load_ns)
+        text = json.dumps(ROUTINE_PLAN) if body.get("format") else ROUTINE_TEXT
+        tokens = _TOKEN_RE.findall(text)
+        counts = {"prompt_eval_count": prompt_tokens, "eval_count": len(tokens), "load_duration": load_ns, "context": context}
+
+        if not body.get("stream", True):
+            started = time.perf_counter()
+            await asyncio.sleep(latency + len(tokens) / tokens_per_second)
+            return chunk(model, text, True, eval_duration=int((time.perf_counter() - started) * 1e9), **counts)
+
+        async def lines():
+            started = time.perf_counter()
+            await asyncio.sleep(latency)
+            for token in tokens:
+                yield json.dumps(chunk(model, token, False)) + "\n"
+                await asyncio.sleep(1 / tokens_per_second)
+            yield json.dumps(chunk(model, "", True, eval_duration=int((time.perf_counter() - started) * 1e9), **counts)) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        inputs = body.get("input") or []
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        return {"model": body.get("model", "nomic-embed-text"), "embeddings": [embed_text(text) for text in inputs]}
+
+    return app
+
+
+class FakeOllama:
+    """Runs the stub on a free local port inside the current event loop."""
+
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 50.0, load_seconds: float = 0.0, port: int = 0) -> None:
+        import uvicorn
+
+        self.app = create_app(latency, tokens_per_second, load_seconds)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "FakeOllama":
+        self._task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            await asyncio.sleep(0.01)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.server.should_exit = True
+        await self._task
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self.app.state.requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--load-seconds", type=float, default=0.0, help="one-off model load on the first call")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(create_app(args.latency, args.tokens_per_second, args.load_seconds), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
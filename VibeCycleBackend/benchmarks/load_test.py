@@ -0,0 +1,201 @@
+"""Mixed-traffic load test: the app on SQLite, generations served by the stub Ollama server.
+
+Each virtual user logs in with their own account and then loops over a weighted mix
+of operations (logins, task CRUD, routine generation, saved routine list/get) until
+the run ends. The JSON report has throughput and p50/p95/p99 latency per operation,
+plus the commit it ran against, so runs can be compared across commits.
+
+    python -m benchmarks.load_test --users 20 --duration 30 --output run.json
+    python -m benchmarks.load_test --mix routine=5,task_list=1 --latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+
+from benchmarks.common import configure_env, create_schema, percentiles
+from benchmarks.fake_ollama import FakeOllama
+
+DEFAULT_MIX = {
+    "login": 1,
+    "task_create": 3,
+    "task_list": 4,
+    "task_get": 3,
+    "task_delete": 1,
+    "routine": 2,
+    "routine_save": 1,
+    "routines_list": 2,
+    "routine_get": 2,
+}
+NOTES = [None, None, "stretch, water", "meditate; journal", "walk the dog"]
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, client, index: int, password: str, rng: random.Random) -> None:
+        self.client = client
+        self.username = f"load{index}"
+        self.password = password
+        self.rng = rng
+        self.headers: dict = {}
+        self.tasks: list[str] = []
+        self.routines: list[int] = []
+        self.counter = 0
+
+    async def login(self):
+        response = await self.client.post("/token", data={"username": self.username, "password": self.password})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def task_create(self):
+        self.counter += 1
+        name = f"{self.username} task {self.counter}"
+        task = {"task_name": name, "amount_of_time": self.rng.choice([5, 10, 15, 20, 30]),
+                "necessity_level": self.rng.randint(1, 5), "difficulty_level": self.rng.randint(1, 5)}
+        response = await self.client.post("/tasks", json=task, headers=self.headers)
+        if response.status_code == 201:
+            self.tasks.append(name)
+        return response
+
+    async def task_list(self):
+        return await self.client.get("/tasks", params={"limit": 50}, headers=self.headers)
+
+    async def task_get(self):
+        if not self.tasks:
+            return await self.task_create()
+        return await self.client.get(f"/tasks/{self.rng.choice(self.tasks)}", headers=self.headers)
+
+    async def task_delete(self):
+        if not self.tasks:
+            return await self.task_create()
+        name = self.tasks.pop(self.rng.randrange(len(self.tasks)))
+        return await self.client.delete(f"/tasks/{name}", headers=self.headers)
+
+    async def routine(self):
+        body = {"energy_level": self.rng.randint(1, 5), "notes": self.rng.choice(NOTES)}
+        return await self.client.post("/routine", json=body, headers=self.headers)
+
+    async def routine_save(self):
+        body = {"title": f"routine {self.counter}", "content": "- Stretch (10 min)\n- Read (20 min)\nTotal estimated time: 30 min"}
+        response = await self.client.post("/routines", json=body, headers=self.headers)
+        if response.status_code == 201:
+            self.routines.append(response.json()["id"])
+        return response
+
+    async def routines_list(self):
+        return await self.client.get("/routines", params={"limit": 50}, headers=self.headers)
+
+    async def routine_get(self):
+        if not self.routines:
+            return await self.routine_save()
+        return await self.client.get(f"/routines/{self.rng.choice(self.routines)}", headers=self.headers)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    async with FakeOllama(latency=args.latency, tokens_per_second=args.tokens_per_second) as ollama:
+        # settings are read at import time, so the app is imported once the stub's port is known
+        os.environ["OLLAMA_HOST"] = ollama.url
+        from app.llm.gateway import get_gateway
+        from app.main import app
+
+        await create_schema()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            password = "load-test-password"
+            users = [VirtualUser(client, i, password, random.Random(rng.random())) for i in range(args.users)]
+            for user in users:
+                await client.post("/users", json={"username": user.username, "password": password})
+                await user.login()
+                seed = [{"task_name": f"{user.username} seed {i}", "amount_of_time": 10, "necessity_level": i % 5 + 1} for i in range(args.tasks)]
+                await client.post("/tasks:batch", json=seed, headers=user.headers)
+                user.tasks = [task["task_name"] for task in seed]
+
+            names, weights = zip(*args.mix.items())
+            samples: dict[str, list[float]] = {name: [] for name in names}
+            errors: dict[str, int] = {name: 0 for name in names}
+            deadline = time.perf_counter() + args.duration
+
+            async def drive(user: VirtualUser) -> None:
+                while time.perf_counter() < deadline:
+                    name = user.rng.choices(names, weights)[0]
+                    started = time.perf_counter()
+                    response = await getattr(user, name)()
+                    samples[name].append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        errors[name] += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(drive(user) for user in users))
+            elapsed = time.perf_counter() - started
+
+        report = {
+            "commit": git_commit(),
+            "config": {
+                "users": args.users,
+                "duration": args.duration,
+                "seed_tasks": args.tasks,
+                "latency": args.latency,
+                "tokens_per_second": args.tokens_per_second,
+                "mix": args.mix,
+                "bcrypt_rounds": os.environ.get("BCRYPT_ROUNDS"),
+            },
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": sum(len(s) for s in samples.values()),
+            "throughput_rps": round(sum(len(s) for s in samples.values()) / elapsed, 1),
+            "operations": {
+                name: {**percentiles(samples[name]), "errors": errors[name], "rps": round(len(samples[name]) / elapsed, 2)}
+                for name in names
+            },
+            "ollama_requests": ollama.requests,
+            "gateway": get_gateway().stats(),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load after setup")
+    parser.add_argument("--tasks", type=int, default=20, help="tasks seeded per user")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="operation weights, e.g. routine=2,task_list=4")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub Ollama seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="stub Ollama generation speed")
+    parser.add_argument("--bcrypt-rounds", default="8")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    configure_env(BCRYPT_ROUNDS=args.bcrypt_rounds)
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Measure how a burst of logins affects latency of unrelated endpoints.
+
+Probes GET /users/me at a fixed interval, first on an idle server and then while
+`--logins` concurrent POST /token requests are in flight. With --blocking the
+login path verifies passwords on the event loop, as it did before hashing was
+moved to a dedicated executor, for comparison.
+
+    python -m benchmarks.login_storm --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_env, create_schema, percentiles
+
+
+async def probe(client, headers: dict, stop: asyncio.Event, interval: float) -> list[float]:
+    samples: list[float] = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/users/me", headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+
+    from app.main import app
+    from app.routers import auth
+
+    await create_schema()
+
+    if args.blocking:
+        async def verify_inline(plain_password: str, hashed_password: str):
+            return auth.pwd_context.verify_and_update(plain_password, hashed_password)
+
+        auth.verify_password_async = verify_inline
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/users", json={"username": "bench", "password": "bench-password"})
+        login = await client.post("/token", data={"username": "bench", "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        stop = asyncio.Event()
+        idle_task = asyncio.create_task(probe(client, headers, stop, args.interval))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idle = await idle_task
+
+        stop = asyncio.Event()
+        storm_task = asyncio.create_task(probe(client, headers, stop, args.interval))
+        login_latencies: list[float] = []
+
+        async def one_login() -> None:
+            started = time.perf_counter()
+            response = await client.post("/token", data={"username": "bench", "password": "bench-password"})
+            response.raise_for_status()
+            login_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        storm = await storm_task
+
+    return {
+        "mode": "blocking" if args.blocking else "executor",
+        "bcrypt_rounds": auth.settings.bcrypt_rounds,
+        "hash_workers": auth.settings.password_hash_workers,
+        "logins": args.logins,
+        "storm_seconds": round(elapsed, 3),
+        "login": percentiles(login_latencies),
+        "users_me_idle": percentiles(idle),
+        "users_me_during_storm": percentiles(storm),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost")
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between probes")
+    parser.add_argument("--idle-seconds", type=float, default=1.0)
+    parser.add_argument("--blocking", action="store_true", help="verify passwords on the event loop")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    configure_env(BCRYPT_ROUNDS=str(args.rounds))
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Time the heuristic scheduler on synthetic users with 10 to 10,000 tasks.
+
+Runs the pure-Python engine directly (no HTTP, no database) for every energy level
+and reports per-plan latency percentiles for each task count.
+
+    python -m benchmarks.scheduler --sizes 10 100 1000 10000 --repeat 20
+"""
+import argparse
+import json
+import random
+import time
+from collections import namedtuple
+
+from benchmarks.common import configure_env, percentiles
+
+
+# Same shape as the rows POST /routine selects
+TaskRow = namedtuple("TaskRow", "task_name routine_type necessity_level difficulty_level amount_of_time")
+
+
+def make_tasks(count: int, rng: random.Random) -> list[TaskRow]:
+    return [
+        TaskRow(
+            task_name=f"task {i}",
+            routine_type=rng.choice(["morning", "evening", "custom", None]),
+            necessity_level=rng.choice([1, 2, 3, 4, 5, None]),
+            difficulty_level=rng.choice([1, 2, 3, 4, 5, None]),
+            amount_of_time=rng.choice([5, 10, 15, 20, 30, 45, 60, None]),
+        )
+        for i in range(count)
+    ]
+
+
+def run(args: argparse.Namespace) -> dict:
+    from app.scheduler import build_candidates, schedule_routine
+
+    rng = random.Random(args.seed)
+    report: dict = {"repeat": args.repeat, "sizes": {}}
+    for size in args.sizes:
+        tasks = make_tasks(size, rng)
+        notes = [f"task {rng.randrange(size)}" for _ in range(3)] + ["stretch"]
+        samples = []
+        for _ in range(args.repeat):
+            for energy_level in range(1, 6):
+                started = time.perf_counter()
+                plan = schedule_routine(build_candidates(notes, tasks), energy_level)
+                samples.append(time.perf_counter() - started)
+        report["sizes"][str(size)] = {**percentiles(samples), "last_plan_minutes": plan.total_minutes}
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    configure_env()
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Cold-start cost of the API: how long `import app.main` takes in a fresh interpreter.
+
+Each run is a new process, so nothing is cached in memory (the OS file cache and .pyc
+files are, as on a real restart). Reports the median and spread over the runs, the
+packages that account for most of the time (from `python -X importtime`) and whether the
+optional heavy dependencies stayed out of the import. With --serve, also the time from
+spawning a server to its first response, for uvicorn and for the preloading launcher.
+
+    python -m benchmarks.startup --runs 10 --serve --budget 1.5
+
+With --budget SECONDS the script exits non-zero when the median import is slower, so it
+can guard against a new module-level import in CI.
+"""
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+
+from benchmarks.common import ROOT, configure_env
+
+# Imported on first use only; none of them should load with app.main
+LAZY_MODULES = ("fastmcp", "ollama", "httpx", "numpy", "redis")
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {LAZY_MODULES!r} if name in sys.modules]}}))
+"""
+
+
+def python(*args: str, **options) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True, **options)
+
+
+def import_times(runs: int) -> tuple[list[float], list[str]]:
+    samples, loaded = [], []
+    for _ in range(runs):
+        result = json.loads(python("-c", IMPORT_SCRIPT).stdout)
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+    return samples, loaded
+
+
+def slowest_packages(top: int) -> list[dict]:
+    # -X importtime lines: "import time: self [us] | cumulative | imported package";
+    # self times summed per top-level package add up to the whole import
+    stderr = python("-X", "importtime", "-c", "import app.main").stderr
+    totals: dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(own)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": name, "ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response(command: list[str], port: int, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, *command], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1):
+                    return time.perf_counter() - started
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"{' '.join(command)} exited with status {server.returncode}")
+                time.sleep(0.02)
+        raise TimeoutError(f"no response from {' '.join(command)} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10, help="packages listed by import time")
+    parser.add_argument("--serve", action="store_true", help="also time the first response of a fresh server")
+    parser.add_argument("--workers", type=int, default=2, help="launcher workers for --serve")
+    parser.add_argument("--budget", type=float, help="fail when the median import takes longer (seconds)")
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    configure_env(LLM_WARMUP="false", ROUTINE_PRECOMPUTE="false")
+    python("-c", "import app.main")  # write the .pyc files, so the first run is not an outlier
+    samples, loaded = import_times(args.runs)
+    report: dict = {
+        "import": {
+            "runs": args.runs,
+            "median_ms": round(statistics.median(samples) * 1000, 1),
+            "min_ms": round(min(samples) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1),
+        },
+        "slowest_packages": slowest_packages(args.top),
+        "lazy_modules_loaded": loaded,
+    }
+    if args.serve:
+        port = free_port()
+        report["first_response_ms"] = {
+            "uvicorn": round(first_response(["-m", "uvicorn", "app.main:app", "--port", str(port)], port) * 1000, 1),
+            f"launcher_{args.workers}_workers": round(first_response(
+                # no Redis or Postgres here: stale per-worker caches do not affect the timing
+                ["-m", "app.launcher", "--port", str(port), "--workers", str(args.workers), "--allow-local-state"], port
+            ) * 1000, 1),
+        }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    if args.budget is not None and statistics.median(samples) > args.budget:
+        sys.exit(f"median import {statistics.median(samples):.3f}s is over the {args.budget:.3f}s budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare importing tasks one POST /tasks at a time against a single POST /tasks:batch.
+
+Reports wall time, HTTP requests and SQL statements for each path, then the same
+for deleting them again (DELETE /tasks/{name} per item vs DELETE /tasks:batch).
+
+    python -m benchmarks.task_batch --tasks 200
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import configure_env, create_schema
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    from app.database import get_engine
+    from app.main import app
+
+    await create_schema()
+    statements = {"count": 0}
+
+    def count_statement(*_):
+        statements["count"] += 1
+
+    event.listen(get_engine().sync_engine, "before_cursor_execute", count_statement)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/users", json={"username": "bench", "password": "bench-password"})
+        login = await client.post("/token", data={"username": "bench", "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        # warm the auth cache so both paths pay the same per-request overhead
+        await client.get("/users/me", headers=headers)
+
+        tasks = [
+            {"task_name": f"task {i}", "amount_of_time": 5 + i % 30, "necessity_level": i % 5 + 1, "difficulty_level": i % 3 + 1}
+            for i in range(args.tasks)
+        ]
+        report: dict = {"tasks": args.tasks}
+
+        async def measure(label: str, requests) -> None:
+            statements["count"] = 0
+            started = time.perf_counter()
+            count = 0
+            for request in requests:
+                response = await request
+                response.raise_for_status()
+                count += 1
+            report[label] = {
+                "seconds": round(time.perf_counter() - started, 4),
+                "http_requests": count,
+                "sql_statements": statements["count"],
+            }
+
+        await measure("create_per_item", (client.post("/tasks", json=task, headers=headers) for task in tasks))
+        await measure(
+            "delete_per_item",
+            (client.delete(f"/tasks/{task['task_name']}", headers=headers) for task in tasks),
+        )
+        await measure("create_batch", [client.post("/tasks:batch", json=tasks, headers=headers)])
+        names = [task["task_name"] for task in tasks]
+        await measure("delete_batch", [client.request("DELETE", "/tasks:batch", json=names, headers=headers)])
+
+    for op in ("create", "delete"):
+        per_item, batch = report[f"{op}_per_item"]["seconds"], report[f"{op}_batch"]["seconds"]
+        report[f"{op}_speedup"] = round(per_item / batch, 1) if batch else None
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    configure_env(BCRYPT_ROUNDS="4")
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Round-trip a large account through GET /export and POST /import over real HTTP.
+
+For each size, seeds one user with that many tasks (plus one routine per 10 tasks, with
+three items each), streams the export to a file and uploads the file to a second user
+in chunks. Reports wall time, rows per second and the peak Python memory allocated
+during each step; a streaming implementation keeps the peak flat as the row count grows.
+
+    python -m benchmarks.transfer --rows 10000,100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import configure_env, create_schema
+
+UPLOAD_CHUNK = 64 * 1024
+
+
+async def seed(owner: str, rows: int) -> None:
+    from sqlalchemy import insert
+
+    from app.database import new_session
+    from app.models import RoutineItem, SavedRoutine, Tasks
+
+    async with new_session() as db:
+        for start in range(0, rows, 10_000):
+            await db.exec(insert(Tasks), params=[
+                {"owner": owner, "task_name": f"task {i:07d}", "routine_type": ("morning", "evening")[i % 2],
+                 "necessity_level": i % 5 + 1, "difficulty_level": i % 3 + 1, "amount_of_time": 5 + i % 30}
+                for i in range(start, min(rows, start + 10_000))
+            ])
+        routines = rows // 10
+        ids = (await db.exec(
+            insert(SavedRoutine).returning(SavedRoutine.id, sort_by_parameter_order=True),
+            params=[{"owner": owner, "title": f"routine {i}", "content": f"Morning:\n- task {i:07d} (10 min)"} for i in range(routines)],
+        )).scalars().all()
+        if ids:
+            await db.exec(insert(RoutineItem), params=[
+                {"routine_id": routine_id, "period": period, "position": position, "title": f"item {position}", "minutes": 10, "optional": False}
+                for routine_id in ids
+                for position, period in enumerate(("morning", "morning", "evening"))
+            ])
+        await db.commit()
+
+
+async def measure(step):
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = await step()
+    finally:
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, {"seconds": round(seconds, 3), "peak_mib": round(peak / 2**20, 2)}
+
+
+async def run(args: argparse.Namespace) -> dict:
+    import httpx
+    import uvicorn
+
+    from app.main import app
+
+    await create_schema()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    workdir = tempfile.mkdtemp(prefix="vibecycle-transfer-")
+    report: dict = {"runs": []}
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+        async def login(username: str) -> dict:
+            await client.post("/users", json={"username": username, "password": "bench-password"})
+            token = (await client.post("/token", data={"username": username, "password": "bench-password"})).json()["access_token"]
+            return {"Authorization": f"Bearer {token}"}
+
+        for rows in args.rows:
+            source, target = f"export{rows}", f"import{rows}"
+            source_headers, target_headers = await login(source), await login(target)
+            await seed(source, rows)
+            path = os.path.join(workdir, f"{source}.ndjson")
+
+            async def export() -> int:
+                async with client.stream("GET", "/export", headers=source_headers) as response:
+                    response.raise_for_status()
+                    with open(path, "wb") as fh:
+                        async for chunk in response.aiter_bytes():
+                            fh.write(chunk)
+                return os.path.getsize(path)
+
+            async def upload():
+                with open(path, "rb") as fh:
+                    while chunk := fh.read(UPLOAD_CHUNK):
+                        yield chunk
+
+            async def import_() -> dict:
+                response = await client.post("/import", content=upload(), headers=target_headers)
+                response.raise_for_status()
+                return response.json()
+
+            size, export_stats = await measure(export)
+            imported, import_stats = await measure(import_)
+            records = rows + rows // 10
+            report["runs"].append({
+                "tasks": rows,
+                "routines": rows // 10,
+                "export": {**export_stats, "bytes": size, "rows_per_second": round(records / export_stats["seconds"])},
+                "import": {**import_stats, "rows_per_second": round(records / import_stats["seconds"]), **imported},
+            })
+
+    server.should_exit = True
+    await serving
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=lambda value: [int(part) for part in value.split(",")], default=[10_000, 100_000])
+    parser.add_argument("--output", help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    configure_env(BCRYPT_ROUNDS="4", ROUTINE_PRECOMPUTE="false", LLM_WARMUP="false")
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
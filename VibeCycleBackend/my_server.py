@@ -1,13 +1,10 @@
-from fastmcp import FastMCP # pyright: ignore[reportMissingImports]
-from fastapi import FastAPI
+"""Standalone MCP server over stdio, acting as one user:
 
+    MCP_USER=alice python my_server.py
 
-app = FastAPI()
-mcp = FastMCP("Vibe Cycle")
-
-@mcp.tool
-def greet(name: str) -> str:
-    return f"Hello, {name}!"
+The API serves the same tools at /mcp/ for callers with a bearer token (app/mcp_tools.py).
+"""
+from app.mcp_tools import mcp
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    mcp.run()
@@ -0,0 +1,66 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from benchmarks.common import configure_env
+
+# Settings are read once, on first use, so this runs before anything under app/ is imported
+configure_env(ROUTINE_PRECOMPUTE="false", LLM_WARMUP="false", REDIS_URL="")
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from benchmarks.common import create_schema
+
+    asyncio.run(create_schema())
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def new_user(client):
+    """Creates a fresh user on each call and returns its bearer headers."""
+
+    def create() -> dict:
+        username = f"user-{uuid.uuid4().hex[:8]}"
+        client.post("/users", json={"username": username, "password": "pw"})
+        token = client.post("/token", data={"username": username, "password": "pw"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    return create
+
+
+@pytest.fixture
+def auth_headers(new_user) -> dict:
+    return new_user()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache_backend(request):
+    from app.cache import LRUCache, MemoryCache, RedisCache
+
+    if request.param == "memory":
+        return MemoryCache(LRUCache(maxsize=128, ttl=60))
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCache(fakeredis.FakeAsyncRedis())
+
+
+@pytest.fixture
+def model_calls(monkeypatch) -> list[dict]:
+    """Answers routine generations with the fake server's canned plan, recording each call."""
+    from app.llm.gateway import get_gateway
+    from benchmarks.fake_ollama import ROUTINE_PLAN
+
+    calls = []
+
+    async def generate(**request) -> dict:
+        calls.append(request)
+        return {"response": json.dumps(ROUTINE_PLAN)}
+
+    monkeypatch.setattr(get_gateway(), "generate", generate)
+    return calls
@@ -0,0 +1,7 @@
+from app.routines import ROUTINE_MODEL
+
+
+def test_generate_always_uses_the_routine_model(client, auth_headers, model_calls):
+    response = client.post("/ai/generate", json={"prompt": "Hello", "model": "some-other-model"}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [call["model"] for call in model_calls] == [ROUTINE_MODEL]
@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sqlite3
+
+import pytest
+
+from app.cache import CollectionVersions, RedisCache
+from app.routers import auth
+from app.routers.auth import get_current_user
+
+
+def test_cached_user_is_a_new_instance_per_request(client, auth_headers):
+    # the first authenticated request caches the user; without a session only cache hits can succeed
+    assert client.get("/tasks", headers=auth_headers).status_code == 200
+    token = auth_headers["Authorization"].removeprefix("Bearer ")
+
+    async def current_user():
+        return await get_current_user(db=None, token=token)
+
+    first, second = asyncio.run(current_user()), asyncio.run(current_user())
+    assert first is not second
+    first.hashed_password = "changed"
+    assert second.hashed_password != "changed"
+    assert asyncio.run(current_user()).hashed_password != "changed"
+
+
+@pytest.mark.skipif(not os.environ["DATABASE_URL"].startswith("sqlite"), reason="deletes the row through sqlite3")
+def test_user_deleted_by_another_worker_is_rejected_with_a_shared_cache(client, auth_headers, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(auth._user_versions, "backend", RedisCache(fakeredis.FakeAsyncRedis(server=server)))
+    assert client.get("/tasks", headers=auth_headers).status_code == 200
+
+    # another worker deletes the user: the row goes, and it rotates the version in the shared Redis
+    username = auth.decode_token(auth_headers["Authorization"].removeprefix("Bearer "))["sub"]
+    conn = sqlite3.connect(os.environ["DATABASE_URL"].removeprefix("sqlite:///"))
+    with conn:
+        conn.execute("DELETE FROM users WHERE username = ?", (username,))
+    conn.close()
+    other_worker = CollectionVersions(RedisCache(fakeredis.FakeAsyncRedis(server=server)))
+    asyncio.run(other_worker.bump("user", username))
+
+    assert client.get("/tasks", headers=auth_headers).status_code == 401
@@ -0,0 +1,119 @@
+import asyncio
+import math
+
+import pytest
+
+from app.cache import CollectionVersions, LRUCache, MemoryCache, RedisCache, RoutineCache
+
+
+def test_backend_get_set_delete(cache_backend):
+    async def check():
+        assert await cache_backend.get("missing") is None
+        await cache_backend.set("key", "value", 30)
+        assert await cache_backend.get("key") == "value"
+        await cache_backend.delete("key")
+        assert await cache_backend.get("key") is None
+
+    asyncio.run(check())
+
+
+def test_only_redis_is_shared(cache_backend):
+    assert cache_backend.shared is isinstance(cache_backend, RedisCache)
+    assert CollectionVersions(cache_backend).shared is cache_backend.shared
+
+
+def test_lru_evicts_least_recently_used_and_expired():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.set("d", 4, ttl=0)
+    assert cache.get("d") is None
+
+
+def test_redis_ttl_is_whole_seconds():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis()
+
+    async def check():
+        backend = RedisCache(client, prefix="test:")
+        await backend.set("short", "x", 0.2)
+        await backend.set("long", "x", 90.5)
+        return await client.ttl("test:short"), await client.ttl("test:long")
+
+    assert asyncio.run(check()) == (1, math.ceil(90.5))
+
+
+def test_collection_versions_rotate_on_bump(cache_backend):
+    versions = CollectionVersions(cache_backend)
+
+    async def check():
+        first = await versions.current("tasks", "ann")
+        assert await versions.current("tasks", "ann") == first
+        await versions.bump("tasks", "ann")
+        bumped = await versions.current("tasks", "ann")
+        assert bumped != first
+        assert await versions.current("tasks", "bob") != bumped
+
+    asyncio.run(check())
+
+
+def test_routine_cache_counts_hits_and_misses(cache_backend):
+    cache = RoutineCache(cache_backend)
+
+    async def check():
+        key = await cache.key("ann", "model", 3, ["Stretch", "read "], 1)
+        # item order, case and padding do not change the key
+        assert await cache.key("ann", "model", 3, ["Read", "stretch"], 1) == key
+        assert await cache.get(key) is None
+        await cache.set(key, "routine")
+        assert await cache.get(key) == "routine"
+        await cache.invalidate_user("ann")
+        new_key = await cache.key("ann", "model", 3, ["Stretch", "read "], 1)
+        assert new_key != key
+        assert await cache.get(new_key) is None
+
+    asyncio.run(check())
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["backend"] == type(cache_backend).__name__
+
+
+def test_memory_cache_shares_its_lru():
+    lru = LRUCache()
+    asyncio.run(MemoryCache(lru).set("key", "value", 30))
+    assert lru.get("key") == "value"
+
+
+def test_invalidation_reaches_other_processes_through_a_shared_backend():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    # one RoutineCache per worker process, each with its own connection to the same Redis
+    worker_a = RoutineCache(RedisCache(fakeredis.FakeAsyncRedis(server=server)))
+    worker_b = RoutineCache(RedisCache(fakeredis.FakeAsyncRedis(server=server)))
+
+    async def check():
+        key = await worker_a.key("ann", "model", 3, ["Stretch"], 1)
+        await worker_a.set(key, "routine")
+        assert await worker_b.get(await worker_b.key("ann", "model", 3, ["Stretch"], 1)) == "routine"
+        await worker_a.invalidate_user("ann")
+        assert await worker_b.get(await worker_b.key("ann", "model", 3, ["Stretch"], 1)) is None
+
+    asyncio.run(check())
+    assert worker_a.shared and worker_b.shared
+
+
+def test_in_process_caches_do_not_see_each_others_invalidations():
+    # why several workers need REDIS_URL: each keeps its own version tokens
+    worker_a = RoutineCache(MemoryCache(LRUCache()))
+    worker_b = RoutineCache(MemoryCache(LRUCache()))
+
+    async def check():
+        before = await worker_b.key("ann", "model", 3, ["Stretch"], 1)
+        await worker_a.invalidate_user("ann")
+        assert await worker_b.key("ann", "model", 3, ["Stretch"], 1) == before
+
+    asyncio.run(check())
+    assert not worker_a.shared
@@ -0,0 +1,65 @@
+import pytest
+
+from app.cache import collection_versions, routine_cache
+
+
+@pytest.fixture
+def shared_caches(monkeypatch, cache_backend):
+    # the app's routine cache and list versions, moved onto the backend under test
+    monkeypatch.setattr(routine_cache, "backend", cache_backend)
+    monkeypatch.setattr(routine_cache.versions, "backend", cache_backend)
+    monkeypatch.setattr(collection_versions, "backend", cache_backend)
+    return cache_backend
+
+
+def generate(client, headers) -> dict:
+    response = client.post("/routine", json={"energy_level": 3}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.parametrize("write", [
+    lambda client, headers: client.post("/tasks", json={"task_name": "Read", "amount_of_time": 20}, headers=headers),
+    # saving an existing name updates it; necessity only reorders the prompt, so the key
+    # would not change on its own
+    lambda client, headers: client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10, "necessity_level": 5}, headers=headers),
+    lambda client, headers: client.delete("/tasks/Stretch", headers=headers),
+    lambda client, headers: client.post("/tasks:batch", json=[{"task_name": "Walk", "amount_of_time": 30}], headers=headers),
+    lambda client, headers: client.request("DELETE", "/tasks:batch", json=["Stretch"], headers=headers),
+], ids=["create", "update", "delete", "batch-upsert", "batch-delete"])
+def test_task_writes_invalidate_cached_routines(client, auth_headers, shared_caches, model_calls, write):
+    client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10}, headers=auth_headers)
+    client.post("/tasks", json={"task_name": "Plan the day", "amount_of_time": 5}, headers=auth_headers)
+    hits, misses = routine_cache.hits, routine_cache.misses
+
+    first = generate(client, auth_headers)
+    assert generate(client, auth_headers) == first
+    assert (routine_cache.hits - hits, routine_cache.misses - misses, len(model_calls)) == (1, 1, 1)
+
+    assert write(client, auth_headers).status_code < 300
+    generate(client, auth_headers)
+    assert (routine_cache.hits - hits, routine_cache.misses - misses, len(model_calls)) == (1, 2, 2)
+
+
+def test_routine_cache_stats_endpoint(client, auth_headers, shared_caches, model_calls):
+    client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10}, headers=auth_headers)
+    generate(client, auth_headers)
+    generate(client, auth_headers)
+    stats = client.get("/routine/cache", headers=auth_headers).json()
+    assert stats["backend"] == type(shared_caches).__name__
+    assert (stats["hits"], stats["misses"]) == (routine_cache.hits, routine_cache.misses)
+
+
+def test_task_list_etag_follows_writes(client, auth_headers, shared_caches):
+    client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10}, headers=auth_headers)
+    response = client.get("/tasks", headers=auth_headers)
+    etag = response.headers.get("etag")
+    if not shared_caches.shared:
+        # per-process versions could miss another worker's writes, so no conditional GET
+        assert etag is None
+        return
+    assert client.get("/tasks", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+    client.post("/tasks", json={"task_name": "Read", "amount_of_time": 20}, headers=auth_headers)
+    response = client.get("/tasks", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert [task["task_name"] for task in response.json()] == ["Read", "Stretch"]
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from app.changes import PostgresChangeFeed
+
+
+class FlakyEngine:
+    """Stands in for the async engine: the first `failures` connections fail, later ones record each NOTIFY."""
+
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.notified: list[dict] = []
+
+    @asynccontextmanager
+    async def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        yield self
+
+    async def execute(self, statement, params: dict) -> None:
+        self.notified.append(json.loads(params["payload"]))
+
+    async def commit(self) -> None:
+        pass
+
+
+def test_failed_notify_is_followed_by_a_reset_for_every_worker():
+    engine = FlakyEngine(failures=2)
+    feed = PostgresChangeFeed("postgresql://unused", lambda: engine, reconnect_delay=0.01)
+
+    async def run():
+        with feed.subscribe("ann") as queue:
+            await feed.publish("ann", "tasks", "upsert", [{"task_name": "Read"}])
+            # this worker's subscribers refetch straight away
+            assert (await queue.get())["op"] == "reset"
+            # the first resend fails as well; the next one reaches the other workers
+            for _ in range(100):
+                if engine.notified:
+                    break
+                await asyncio.sleep(0.01)
+        await feed.stop()
+
+    asyncio.run(run())
+    assert feed.failed == 1
+    assert [(event["owner"], event["collection"], event["op"]) for event in engine.notified] == [("ann", "tasks", "reset")]
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app import completions
+from app.completions import CompletionBuffer
+
+
+def test_clicks_show_up_in_the_daily_and_weekly_rollups(client, auth_headers):
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    for completed_at in (now, now, now - timedelta(days=1), now - timedelta(days=7), now - timedelta(days=40)):
+        response = client.post("/completions", json={"task": "Stretch", "completed_at": completed_at.isoformat()}, headers=auth_headers)
+        assert response.status_code == 202
+
+    # the caller's own buffered clicks are flushed before the stats are read
+    days = client.get("/completions/stats?periods=8", headers=auth_headers).json()
+    assert days["total"] == 4
+    assert [day["completions"] for day in days["series"]] == [1, 0, 0, 0, 0, 0, 1, 2]
+    assert days["series"][-1]["start"] == today.isoformat()
+
+    weeks = client.get("/completions/stats?period=week&periods=2", headers=auth_headers).json()
+    monday = today - timedelta(days=today.weekday())
+    assert [week["start"] for week in weeks["series"]] == [(monday - timedelta(weeks=1)).isoformat(), monday.isoformat()]
+    # yesterday is in last week when today is a Monday
+    assert [week["completions"] for week in weeks["series"]] == ([2, 2] if today.weekday() == 0 else [1, 3])
+
+
+def test_completions_are_validated(client, auth_headers):
+    future = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    assert client.post("/completions", json={"task": "Stretch", "completed_at": future}, headers=auth_headers).status_code == 422
+    assert client.post("/completions", json={"task": "Stretch", "routine_id": 10**9}, headers=auth_headers).status_code == 404
+
+
+def test_a_full_buffer_answers_503(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(completions.completion_buffer, "max_pending", 0)
+    response = client.post("/completions", json={"task": "Stretch"}, headers=auth_headers)
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_the_buffer_flushes_full_batches_at_once_and_keeps_failed_ones(monkeypatch):
+    written, failing = [], [True]
+
+    async def write(batch: list[dict]) -> None:
+        if failing[0]:
+            raise ConnectionError("database down")
+        written.append([event["task"] for event in batch])
+
+    monkeypatch.setattr(CompletionBuffer, "_write", staticmethod(write))
+    now = datetime.now(timezone.utc)
+
+    async def run():
+        buffer = CompletionBuffer(batch_size=2, interval=60)
+        buffer.add("ann", None, "a", now)
+        buffer.add("ann", None, "b", now)
+        # a full batch wakes the flusher without waiting for the interval
+        await asyncio.sleep(0.05)
+        assert buffer.stats() == {"pending": 2, "flushed": 0, "batches": 0, "failures": 1}
+        failing[0] = False
+        buffer.add("bob", None, "c", now)
+        assert buffer.pending("bob") and not buffer.pending("cid")
+        # shutdown writes what is left, including the batch that failed
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(run())
+    assert written == [["a", "b"], ["c"]]
+    assert buffer.stats() == {"pending": 0, "flushed": 3, "batches": 2, "failures": 1}
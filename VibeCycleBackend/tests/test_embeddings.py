@@ -0,0 +1,37 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.embeddings import TaskEmbeddings
+
+pytest.importorskip("numpy")
+
+TASKS = [SimpleNamespace(task_name=name) for name in ("Yoga", "Stretch", "Read", "Email")]
+
+
+def test_failed_embedding_is_not_retried_until_the_cooldown_ends():
+    calls = []
+    down = True
+
+    async def embed(model: str, texts: list[str]) -> list[list[float]]:
+        calls.append(texts)
+        if down:
+            raise ConnectionError("model server down")
+        return [[float(len(text)), 1.0] for text in texts]
+
+    embeddings = TaskEmbeddings(embed, model="test", top_k=2, retry_after=0.2)
+
+    def select():
+        return asyncio.run(embeddings.select("ann", "yoga", TASKS))
+
+    assert select() == TASKS
+    assert select() == TASKS
+    assert len(calls) == 1
+    assert (embeddings.failures, embeddings.skipped) == (1, 1)
+
+    down = False
+    time.sleep(0.25)
+    assert len(select()) == 2
+    assert embeddings.stats()["selections"] == 1
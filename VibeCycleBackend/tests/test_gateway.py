@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from app.llm.gateway import GatewayBusy, GatewayTimeout, LLMGateway, get_gateway
+
+
+class FakeClient:
+    """Stands in for ollama.AsyncClient: every generation waits for `release`."""
+
+    def __init__(self) -> None:
+        self.calls: list[dict] = []
+        self.release = asyncio.Event()
+
+    async def generate(self, **request) -> dict:
+        self.calls.append(request)
+        await self.release.wait()
+        return {"response": request["prompt"].upper()}
+
+
+def gateway(**options) -> tuple[LLMGateway, FakeClient]:
+    gateway = LLMGateway(**options)
+    gateway.client = FakeClient()
+    return gateway, gateway.client
+
+
+def test_identical_prompts_in_flight_share_one_generation():
+    async def run():
+        gw, client = gateway(concurrency=2)
+        first = asyncio.create_task(gw.generate("m", "hello"))
+        second = asyncio.create_task(gw.generate("m", "hello"))
+        other = asyncio.create_task(gw.generate("m", "bye"))
+        await asyncio.sleep(0)
+        client.release.set()
+        results = await asyncio.gather(first, second, other)
+        # finished flights are forgotten: the same prompt later runs again
+        await gw.generate("m", "hello")
+        return gw, client, results
+
+    gw, client, results = asyncio.run(run())
+    assert results == [{"response": "HELLO"}, {"response": "HELLO"}, {"response": "BYE"}]
+    assert [call["prompt"] for call in client.calls] == ["hello", "bye", "hello"]
+    assert gw.coalesced == 1
+
+
+def test_a_cancelled_caller_does_not_cancel_a_shared_generation():
+    async def run():
+        gw, client = gateway()
+        first = asyncio.create_task(gw.generate("m", "hello"))
+        second = asyncio.create_task(gw.generate("m", "hello"))
+        await asyncio.sleep(0)
+        first.cancel()
+        client.release.set()
+        return await second
+
+    assert asyncio.run(run()) == {"response": "HELLO"}
+
+
+def test_a_full_queue_is_rejected_with_retry_after():
+    async def run():
+        gw, client = gateway(concurrency=1, max_queue=1, retry_after=7)
+        running = asyncio.create_task(gw.generate("m", "one"))
+        waiting = asyncio.create_task(gw.generate("m", "two"))
+        await asyncio.sleep(0.01)
+        assert (gw.in_flight, gw.waiting) == (1, 1)
+        with pytest.raises(GatewayBusy) as busy:
+            await gw.generate("m", "three")
+        client.release.set()
+        await asyncio.gather(running, waiting)
+        return gw, busy.value
+
+    gw, busy = asyncio.run(run())
+    assert busy.retry_after == 7
+    assert gw.rejected == 1
+    assert (gw.in_flight, gw.waiting) == (0, 0)
+
+
+def test_a_slow_generation_times_out_and_frees_its_slot():
+    async def run():
+        gw, client = gateway(concurrency=1, timeout=0.05)
+        with pytest.raises(GatewayTimeout):
+            await gw.generate("m", "slow")
+        client.release.set()
+        return gw, await gw.generate("m", "fast")
+
+    gw, result = asyncio.run(run())
+    assert result == {"response": "FAST"}
+    assert gw.timeouts == 1
+    assert gw.in_flight == 0
+
+
+def test_busy_gateway_maps_to_429(client, auth_headers, monkeypatch):
+    client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10}, headers=auth_headers)
+
+    async def busy(**request):
+        raise GatewayBusy(retry_after=7)
+
+    monkeypatch.setattr(get_gateway(), "generate", busy)
+    response = client.post("/routine", json={"energy_level": 3}, headers=auth_headers)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "7"
@@ -0,0 +1,176 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app import jobs
+from app.jobs import JobManager, JobStore
+
+
+@pytest.fixture
+def blocked_runner():
+    """A runner that holds every job until the test sets the returned event."""
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def runner(owner: str, request: dict) -> dict:
+        started.set()
+        await release.wait()
+        return {"routine": "done"}
+
+    return runner, started, release
+
+
+def _submit_and_cancel_elsewhere(runner, started, release=None):
+    async def run():
+        owner = f"user-{uuid.uuid4().hex[:8]}"
+        worker = JobManager(runner, workers=1, store=JobStore())
+        other_process = JobManager(runner, workers=1, store=JobStore())
+        try:
+            job, _ = await worker.submit(owner, uuid.uuid4().hex, {})
+            await asyncio.wait_for(started.wait(), 5)
+            seen = await other_process.get(owner, job.id)
+            assert seen is not None and seen.status == "running"
+            assert (await other_process.cancel(seen)).status == "cancelled"
+            if release is not None:
+                release.set()
+            await asyncio.wait_for(job.done.wait(), 5)
+            return job, await JobStore().load(job.id)
+        finally:
+            await worker.stop()
+            await other_process.stop()
+
+    return asyncio.run(run())
+
+
+def test_cancelling_in_another_process_stops_the_running_job(client, blocked_runner, monkeypatch):
+    monkeypatch.setattr(jobs, "CANCEL_POLL_INTERVAL", 0.05)
+    runner, started, _ = blocked_runner
+    job, stored = _submit_and_cancel_elsewhere(runner, started)
+    assert job.status == stored.status == "cancelled"
+    assert job.result is None
+
+
+def test_a_result_arriving_after_a_cancellation_does_not_overwrite_it(client, blocked_runner, monkeypatch):
+    # the run finishes before the worker's next poll notices the cancelled row
+    monkeypatch.setattr(jobs, "CANCEL_POLL_INTERVAL", 60)
+    runner, started, release = blocked_runner
+    job, stored = _submit_and_cancel_elsewhere(runner, started, release)
+    assert job.status == stored.status == "cancelled"
+    assert stored.result is None
+
+
+def test_a_job_fails_once_the_gateway_stays_busy_past_the_wait(monkeypatch):
+    from dataclasses import replace
+
+    from app import services
+    from app.llm.gateway import GatewayBusy
+    from app.schemas import RoutineGenerateRequest
+
+    attempts = []
+
+    async def busy(db, owner, body, cache_ttl=None):
+        attempts.append(owner)
+        raise GatewayBusy(retry_after=0.02)
+
+    monkeypatch.setattr(services, "generate_routine", busy)
+    settings = replace(services.get_settings(), llm_busy_wait=0.1)
+    monkeypatch.setattr(services, "get_settings", lambda: settings)
+
+    async def runner(owner: str, request: dict) -> dict:
+        return await services.generate_in_background(owner, RoutineGenerateRequest(**request))
+
+    async def run():
+        manager = JobManager(runner, workers=1)
+        try:
+            job, _ = await manager.submit("ann", "key", {"energy_level": 3})
+            await asyncio.wait_for(job.done.wait(), 5)
+            return job
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(run())
+    assert job.status == "failed"
+    assert job.error == "LLM gateway queue is full"
+    assert 1 < len(attempts) < 10
+
+
+def test_job_lifecycle_over_http(client, auth_headers, model_calls):
+    client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10}, headers=auth_headers)
+    submitted = client.post("/routine/jobs", json={"energy_level": 2}, headers=auth_headers)
+    assert submitted.status_code == 202
+    job = submitted.json()
+    assert submitted.headers["location"] == f"/routine/jobs/{job['job_id']}"
+    assert job["status"] in ("queued", "running") and not job["deduplicated"]
+
+    finished = client.get(f"{submitted.headers['location']}?wait=10", headers=auth_headers).json()
+    assert finished["status"] == "succeeded"
+    assert finished["result"]["plan"]["morning"]
+    # not pending any more, so the same request is a new job
+    again = client.post("/routine/jobs", json={"energy_level": 2}, headers=auth_headers).json()
+    assert again["job_id"] != job["job_id"]
+    # cancelling a finished job leaves it as it was
+    assert client.delete(submitted.headers["location"], headers=auth_headers).json()["status"] == "succeeded"
+
+
+def test_jobs_are_private_to_their_owner(client, auth_headers, model_calls):
+    location = client.post("/routine/jobs", json={"energy_level": 2}, headers=auth_headers).headers["location"]
+    username = f"user-{uuid.uuid4().hex[:8]}"
+    client.post("/users", json={"username": username, "password": "pw"})
+    token = client.post("/token", data={"username": username, "password": "pw"}).json()["access_token"]
+    assert client.get(location, headers={"Authorization": f"Bearer {token}"}).status_code == 404
+
+
+def test_a_full_queue_answers_429(client, auth_headers, monkeypatch):
+    from app.main import routine_jobs
+
+    monkeypatch.setattr(routine_jobs, "max_pending", 0)
+    response = client.post("/routine/jobs", json={"energy_level": 2}, headers=auth_headers)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+
+
+def test_identical_pending_requests_share_a_job_and_queued_jobs_can_be_cancelled(blocked_runner):
+    runner, started, release = blocked_runner
+
+    async def run():
+        manager = JobManager(runner, workers=1)
+        try:
+            running, _ = await manager.submit("ann", "a", {})
+            await asyncio.wait_for(started.wait(), 5)
+            queued, created = await manager.submit("ann", "b", {})
+            same, duplicate = await manager.submit("ann", "b", {})
+            assert created and not duplicate and same is queued
+            # the same request from someone else is their own job
+            assert (await manager.submit("bob", "b", {}))[0] is not queued
+            assert (await manager.cancel(queued)).status == "cancelled"
+            release.set()
+            await asyncio.wait_for(running.done.wait(), 5)
+            return running, queued
+        finally:
+            await manager.stop()
+
+    running, queued = asyncio.run(run())
+    assert running.status == "succeeded" and running.result == {"routine": "done"}
+    assert queued.status == "cancelled" and queued.result is None
+
+
+def test_failed_jobs_keep_the_error_and_expire_after_the_ttl(monkeypatch):
+    monkeypatch.setattr(jobs, "PRUNE_INTERVAL", 0)
+
+    async def runner(owner: str, request: dict) -> dict:
+        raise ValueError("no tasks")
+
+    async def run():
+        manager = JobManager(runner, workers=1, ttl=0.05)
+        try:
+            job, _ = await manager.submit("ann", "a", {})
+            await asyncio.wait_for(job.done.wait(), 5)
+            kept = await manager.get("ann", job.id)
+            await asyncio.sleep(0.1)
+            return job, kept, await manager.get("ann", job.id)
+        finally:
+            await manager.stop()
+
+    job, kept, expired = asyncio.run(run())
+    assert kept is job and (job.status, job.error) == ("failed", "no tasks")
+    assert expired is None
@@ -0,0 +1,13 @@
+import dataclasses
+
+from app import launcher
+from app.settings import get_settings
+
+
+def test_local_state_lists_what_workers_would_not_share(monkeypatch):
+    def settings(**changes):
+        monkeypatch.setattr(launcher, "get_settings", lambda: dataclasses.replace(get_settings(), **changes))
+        return launcher.local_state()
+
+    assert [problem.split()[0].rstrip(":") for problem in settings(redis_url="", change_feed_backend="memory")] == ["REDIS_URL", "CHANGE_FEED_BACKEND=memory"]
+    assert settings(redis_url="redis://cache", change_feed_backend="postgres") == []
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastmcp")
+
+from fastmcp import Client
+from fastmcp.exceptions import ToolError
+
+from app import mcp_tools
+from app.ratelimit import MemoryBuckets, rate_limiter
+
+
+def call(tool: str, **arguments):
+    async def run():
+        async with Client(mcp_tools.mcp) as mcp:
+            return (await mcp.call_tool(tool, arguments)).data
+
+    return asyncio.run(run())
+
+
+def as_caller(monkeypatch, headers: dict) -> None:
+    # what an HTTP call to the mounted /mcp/ app would see
+    monkeypatch.setattr(mcp_tools, "get_http_headers", lambda include=None: {"authorization": headers["Authorization"]})
+
+
+def test_tools_act_as_the_bearer_tokens_user(client, auth_headers, monkeypatch):
+    as_caller(monkeypatch, auth_headers)
+    results = call("upsert_tasks", tasks=[{"task_name": "Stretch", "amount_of_time": 10}])["results"]
+    assert results == [{"task_name": "Stretch", "status": "saved"}]
+    assert [task["task_name"] for task in call("list_tasks")["tasks"]] == ["Stretch"]
+    # the same tasks over HTTP: both go through the service layer
+    assert [task["task_name"] for task in client.get("/tasks", headers=auth_headers).json()] == ["Stretch"]
+
+
+def test_tools_refuse_bad_tokens_and_a_standalone_server_without_mcp_user(client, monkeypatch):
+    as_caller(monkeypatch, {"Authorization": "Bearer not-a-token"})
+    with pytest.raises(ToolError, match="credentials"):
+        call("list_tasks")
+    monkeypatch.undo()
+    monkeypatch.setattr(mcp_tools, "MCP_USER", "")
+    with pytest.raises(ToolError, match="MCP_USER"):
+        call("list_tasks")
+
+
+def test_tool_calls_are_charged_to_the_users_bucket(client, auth_headers, monkeypatch):
+    as_caller(monkeypatch, auth_headers)
+    monkeypatch.setattr(rate_limiter, "backend", MemoryBuckets())
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    # room for one routine (cost 20) but not two
+    monkeypatch.setattr(rate_limiter, "capacity", 30)
+    monkeypatch.setattr(rate_limiter, "rate", 0.01)
+    call("upsert_tasks", tasks=[{"task_name": "Stretch", "amount_of_time": 10}])
+    assert call("generate_routine", mode="heuristic")["source"] == "heuristic"
+    with pytest.raises(ToolError, match="Rate limit exceeded"):
+        call("generate_routine", mode="heuristic")
+    # reads are not charged
+    assert call("list_tasks")["tasks"]
@@ -0,0 +1,25 @@
+import subprocess
+import sys
+from pathlib import Path
+
+SCRAPE_BEFORE_ANY_GENERATION = """
+from app.llm.gateway import get_gateway
+from app.metrics import registry
+
+lines = registry.render().splitlines()
+assert "llm_gateway_in_flight 0" in lines and "llm_gateway_rejected_total 0" in lines, lines
+assert get_gateway.cache_info().currsize == 0
+"""
+
+
+def test_a_scrape_does_not_build_the_gateway():
+    # a fresh interpreter: in this one the gateway is already built by other tests
+    subprocess.run([sys.executable, "-c", SCRAPE_BEFORE_ANY_GENERATION], cwd=Path(__file__).parents[1], check=True)
+
+
+def test_gateway_counters_are_read_once_it_exists(monkeypatch):
+    from app.llm.gateway import get_gateway
+    from app.metrics import registry
+
+    monkeypatch.setattr(get_gateway(), "rejected", 3)
+    assert "llm_gateway_rejected_total 3" in registry.render().splitlines()
@@ -0,0 +1,95 @@
+import asyncio
+
+from app.precompute import ENERGY_LEVELS, RoutinePrecomputer
+from app.settings import get_settings
+
+
+async def runner(username: str, energy_level: int, ttl: float) -> None:
+    pass
+
+
+def test_precomputed_routines_outlive_regular_entries_only_in_a_shared_cache():
+    settings = get_settings()
+    assert RoutinePrecomputer.from_settings(runner, shared_cache=True).ttl == settings.routine_precompute_ttl
+    assert RoutinePrecomputer.from_settings(runner, shared_cache=False).ttl == min(settings.routine_precompute_ttl, settings.routine_cache_ttl)
+
+
+def recording_runner(calls: list, running: list | None = None, fail: bool = False):
+    async def run(username: str, energy_level: int, ttl: float) -> None:
+        calls.append((username, energy_level, ttl))
+        if running is not None:
+            running.append(1)
+            await asyncio.sleep(0.005)
+            running.append(-1)
+        if fail:
+            raise ConnectionError("model server down")
+
+    return run
+
+
+def test_a_burst_of_changes_leads_to_one_refresh_after_the_last():
+    calls = []
+
+    async def run():
+        precomputer = RoutinePrecomputer(recording_runner(calls), delay=0.05, ttl=60)
+        for _ in range(5):
+            precomputer.schedule("ann")
+            await asyncio.sleep(0.02)
+        # each change restarted the timer, so nothing has run yet
+        assert calls == [] and precomputer.stats()["pending"] == 1
+        await asyncio.sleep(0.1)
+        return precomputer
+
+    precomputer = asyncio.run(run())
+    assert calls == [("ann", level, 60) for level in ENERGY_LEVELS]
+    assert (precomputer.scheduled, precomputer.completed, precomputer.stats()["pending"]) == (5, 1, 0)
+
+
+def test_users_are_refreshed_one_at_a_time():
+    calls, running = [], []
+
+    async def run():
+        precomputer = RoutinePrecomputer(recording_runner(calls, running), delay=0, concurrency=1)
+        precomputer.schedule("ann")
+        precomputer.schedule("bob")
+        await asyncio.sleep(0.2)
+        return precomputer
+
+    precomputer = asyncio.run(run())
+    assert precomputer.completed == 2
+    assert sorted({username for username, _, _ in calls}) == ["ann", "bob"]
+    # the users' runs never overlap: at most one call is running at any point
+    in_flight = [sum(running[: index + 1]) for index in range(len(running))]
+    assert max(in_flight) == 1
+    # each user's levels ran back to back
+    assert [username for username, _, _ in calls] in (["ann"] * 5 + ["bob"] * 5, ["bob"] * 5 + ["ann"] * 5)
+
+
+def test_failures_are_counted_and_stop_drops_pending_refreshes():
+    calls = []
+
+    async def run():
+        precomputer = RoutinePrecomputer(recording_runner(calls, fail=True), delay=0)
+        precomputer.schedule("ann")
+        await asyncio.sleep(0.05)
+        precomputer.delay = 60
+        precomputer.schedule("bob")
+        await precomputer.stop()
+        return precomputer
+
+    precomputer = asyncio.run(run())
+    assert calls == [("ann", 1, 86400.0)]
+    assert (precomputer.failed, precomputer.completed, precomputer.stats()["pending"]) == (1, 0, 0)
+
+
+def test_a_disabled_precomputer_schedules_nothing():
+    calls = []
+
+    async def run():
+        precomputer = RoutinePrecomputer(recording_runner(calls), delay=0, enabled=False)
+        precomputer.schedule("ann")
+        await asyncio.sleep(0.02)
+        return precomputer
+
+    assert asyncio.run(run()).scheduled == 0
+    assert calls == []
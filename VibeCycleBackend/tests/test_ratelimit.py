@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.ratelimit import MemoryBuckets, RateLimiter, RedisBuckets
+
+
+@pytest.fixture(params=["memory", "redis"])
+def buckets(request):
+    if request.param == "memory":
+        return MemoryBuckets()
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa", reason="the bucket script needs fakeredis[lua]")
+    return RedisBuckets(fakeredis.FakeAsyncRedis())
+
+
+def checks(limiter: RateLimiter, *requests: tuple[list[str], float]) -> list[tuple[bool, int]]:
+    async def run():
+        return [await limiter.check(identities, cost) for identities, cost in requests]
+
+    return [(decision.allowed, decision.remaining) for decision in asyncio.run(run())]
+
+
+def test_requests_are_charged_to_both_the_address_and_the_user(buckets):
+    limiter = RateLimiter(buckets, capacity=10, rate=0.01)
+    assert checks(
+        limiter,
+        (["ip:1.2.3.4", "user:ann"], 4),
+        # ann from another address: her own bucket is the emptier one
+        (["ip:5.6.7.8", "user:ann"], 4),
+        # a fresh token from the first address still draws on that address's bucket
+        (["ip:1.2.3.4", "user:bob"], 4),
+        # rejected by ann's bucket; the address's bucket is not charged either
+        (["ip:5.6.7.8", "user:ann"], 4),
+        (["ip:5.6.7.8"], 6),
+    ) == [(True, 6), (True, 2), (True, 2), (False, 2), (True, 0)]
+
+
+def test_an_empty_bucket_rejects_until_it_refills(buckets):
+    limiter = RateLimiter(buckets, capacity=2, rate=20)
+    assert checks(limiter, (["ip:1.2.3.4"], 1), (["ip:1.2.3.4"], 1), (["ip:1.2.3.4"], 1)) == [(True, 1), (True, 0), (False, 0)]
+    assert limiter.rejected == 1
+    # 20 tokens a second: both are back well within a quarter second
+    asyncio.run(asyncio.sleep(0.25))
+    assert checks(limiter, (["ip:1.2.3.4"], 2)) == [(True, 0)]
+
+
+def test_the_middleware_reports_the_redis_buckets_in_headers(client, auth_headers, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa", reason="the bucket script needs fakeredis[lua]")
+    from app.ratelimit import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "backend", RedisBuckets(fakeredis.FakeAsyncRedis()))
+    monkeypatch.setattr(rate_limiter, "capacity", 2)
+    monkeypatch.setattr(rate_limiter, "rate", 0.01)
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+
+    first = client.get("/tasks", headers=auth_headers)
+    assert first.status_code == 200
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-remaining"] == "1"
+    assert first.headers["ratelimit-policy"] == "2;w=200"
+    assert "retry-after" not in first.headers
+
+    assert client.get("/tasks", headers=auth_headers).headers["ratelimit-remaining"] == "0"
+    rejected = client.get("/tasks", headers=auth_headers)
+    assert rejected.status_code == 429
+    assert rejected.headers["ratelimit-remaining"] == "0"
+    assert rejected.headers["retry-after"] == "100"
+    # exempt paths are neither charged nor refused
+    assert client.get("/metrics").status_code == 200
@@ -0,0 +1,38 @@
+import json
+
+from app.llm.gateway import get_gateway
+
+TEXT = "Morning routine\n- Stretch (10 min)\nEvening routine\n- Read (15 min)\n"
+
+
+def events(response) -> list[tuple[str, dict]]:
+    blocks = [block.splitlines() for block in response.text.strip().split("\n\n")]
+    return [(event.removeprefix("event: "), json.loads(data.removeprefix("data: "))) for event, data in blocks]
+
+
+def test_the_routine_streams_line_by_line_and_is_cached(client, auth_headers, monkeypatch):
+    client.post("/tasks", json={"task_name": "Stretch", "amount_of_time": 10}, headers=auth_headers)
+    calls = []
+
+    async def stream(**request):
+        calls.append(request)
+        for index in range(0, len(TEXT), 7):
+            yield {"response": TEXT[index:index + 7], "done": False}
+        yield {"response": "", "done": True, "prompt_eval_count": 42}
+
+    monkeypatch.setattr(get_gateway(), "stream", stream)
+    response = client.post("/routine/stream?granularity=line", json={"energy_level": 2}, headers=auth_headers)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    *lines, (last, done) = events(response)
+    assert [data["line"] for event, data in lines] == TEXT.strip().splitlines()
+    assert last == "done"
+    assert done["plan"]["evening"] == [{"title": "Read", "minutes": 15, "optional": False}]
+
+    again = events(client.post("/routine/stream", json={"energy_level": 2}, headers=auth_headers))
+    assert again == [("done", {**done, "cached": True})]
+    assert len(calls) == 1
+
+
+def test_only_llm_mode_streams(client, auth_headers):
+    response = client.post("/routine/stream", json={"energy_level": 2, "mode": "heuristic"}, headers=auth_headers)
+    assert response.status_code == 422
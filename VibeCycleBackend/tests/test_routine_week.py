@@ -0,0 +1,42 @@
+from app.llm.gateway import get_gateway
+
+WEEK = {"days": [{"label": "Monday", "energy_level": 2}, {"label": "Tuesday", "energy_level": 4}]}
+
+
+def test_week_evaluates_the_shared_prefix_once_and_caches_the_result(client, auth_headers, model_calls):
+    client.post("/tasks", json={"task_name": "Stretch", "necessity_level": 4, "amount_of_time": 10}, headers=auth_headers)
+
+    week = client.post("/routine/week", json=WEEK, headers=auth_headers).json()
+    assert [day["label"] for day in week["days"]] == ["Monday", "Tuesday"]
+    assert all(day["source"] == "llm" for day in week["days"])
+    prefix_call, *day_calls = model_calls
+    assert prefix_call["options"] == {"num_predict": 0}
+    assert len(day_calls) == 2
+    # the fake answers without a context, so each day sends the whole prompt
+    assert all(call["prompt"].startswith(prefix_call["prompt"]) for call in day_calls)
+    assert week["prompt"]["context_reused"] is False
+
+    assert client.post("/routine/week", json=WEEK, headers=auth_headers).json() == week
+    assert len(model_calls) == 3
+
+
+def test_week_falls_back_to_the_scheduler_per_day_without_caching(client, auth_headers, monkeypatch):
+    client.post("/tasks", json={"task_name": "Stretch", "necessity_level": 4, "amount_of_time": 10}, headers=auth_headers)
+    calls = []
+
+    async def down(**request):
+        calls.append(request)
+        raise ConnectionError("model server down")
+
+    monkeypatch.setattr(get_gateway(), "generate", down)
+    for _ in range(2):
+        week = client.post("/routine/week", json=WEEK, headers=auth_headers).json()
+        assert all(day["fallback"] and day["source"] == "heuristic" for day in week["days"])
+        assert week["days"][0]["fallback_reason"] == "model server down"
+    # nothing was cached, so the second request asked the model again
+    assert len(calls) == 6
+
+
+def test_week_without_tasks(client, auth_headers, model_calls):
+    assert client.post("/routine/week", json=WEEK, headers=auth_headers).json()["days"] == []
+    assert model_calls == []
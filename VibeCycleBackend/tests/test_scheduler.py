@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from app.models import Tasks
+from app.scheduler import ENERGY_BUDGETS, OPTIONAL_SHARE, Candidate, build_candidates, schedule_routine
+
+
+def titles(items) -> list[str]:
+    return [item.title for item in items if not item.optional]
+
+
+def minutes(items, optional: bool = False) -> int:
+    return sum(item.minutes for item in items if item.optional == optional)
+
+
+def test_the_knapsack_prefers_the_most_valuable_combination_over_the_most_valuable_task():
+    # 30 minutes at energy 1: one necessity-5 task loses to two necessity-4 tasks that fit together
+    plan = schedule_routine(
+        [
+            Candidate("Deep clean", 20, necessity=5, difficulty=1, period="morning"),
+            Candidate("Stretch", 15, necessity=4, difficulty=1, period="morning"),
+            Candidate("Water plants", 15, necessity=4, difficulty=1, period="morning"),
+        ],
+        energy_level=1,
+    )
+    assert sorted(titles(plan.morning)) == ["Stretch", "Water plants"]
+    assert plan.evening == []
+
+
+@pytest.mark.parametrize("energy_level", sorted(ENERGY_BUDGETS))
+def test_each_period_stays_within_the_energy_budget(energy_level):
+    rng = random.Random(energy_level)
+    candidates = [
+        Candidate(f"task {i}", rng.randint(1, 40), rng.randint(1, 5), rng.randint(1, 5), rng.choice(["morning", "evening", None]))
+        for i in range(300)
+    ]
+    plan = schedule_routine(candidates, energy_level)
+    budget = ENERGY_BUDGETS[energy_level]
+    for period in (plan.morning, plan.evening):
+        assert 0 < minutes(period) <= budget
+        assert minutes(period, optional=True) <= int(budget * OPTIONAL_SHARE)
+    chosen = [item.title for item in plan.morning + plan.evening]
+    assert len(chosen) == len(set(chosen))
+
+
+def test_hard_tasks_drop_out_at_low_energy():
+    candidates = [
+        Candidate("Run", 30, necessity=4, difficulty=5, period="morning"),
+        Candidate("Walk", 30, necessity=3, difficulty=1, period="morning"),
+    ]
+    assert titles(schedule_routine(candidates, 1).morning) == ["Walk"]
+    assert titles(schedule_routine(candidates, 5).morning) == ["Walk", "Run"]
+
+
+def test_requested_items_outrank_more_necessary_stored_tasks():
+    candidates = [
+        Candidate("Taxes", 30, necessity=3, period="morning"),
+        Candidate("Call mum", 30, necessity=1, period="morning", requested=True),
+    ]
+    assert titles(schedule_routine(candidates, 1).morning) == ["Call mum"]
+
+
+def test_the_plan_does_not_depend_on_input_order():
+    rng = random.Random(7)
+    candidates = [Candidate(f"task {i}", rng.randint(5, 30), rng.randint(1, 5), rng.randint(1, 5)) for i in range(50)]
+    shuffled = candidates[:]
+    rng.shuffle(shuffled)
+    assert schedule_routine(candidates, 3) == schedule_routine(shuffled, 3)
+
+
+def test_candidates_merge_client_items_with_stored_tasks():
+    stored = [
+        Tasks(task_name="Yoga", routine_type="Evening", necessity_level=5, difficulty_level=2, amount_of_time=25),
+        Tasks(task_name="Read", amount_of_time=0),
+    ]
+    candidates = build_candidates(["yoga ", "Read", "read", "Journal"], stored)
+    assert candidates == [
+        # a stored task keeps its own name, levels and period
+        Candidate("Yoga", 25, necessity=5, difficulty=2, period="evening", requested=True),
+        Candidate("Read", 10, requested=True),
+        Candidate("Journal", 10, requested=True),
+    ]
@@ -0,0 +1,31 @@
+import os
+import sqlite3
+
+import pytest
+
+
+def search(client, headers, q: str) -> list[str]:
+    response = client.get("/tasks/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200
+    return [hit["task_name"] for hit in response.json()]
+
+
+@pytest.mark.skipif(not os.environ["DATABASE_URL"].startswith("sqlite"), reason="SQLite FTS5 only")
+def test_task_index_survives_vacuum(client, auth_headers):
+    names = [f"Chore {i}" for i in range(20)] + ["Yoga stretches", "Morning yoga", "Read"]
+    client.post("/tasks:batch", json=[{"task_name": name} for name in names], headers=auth_headers)
+    client.request("DELETE", "/tasks:batch", json=names[:20], headers=auth_headers)
+
+    # tasks has no integer key, so VACUUM may renumber its implicit rowids; do it for certain
+    conn = sqlite3.connect(os.environ["DATABASE_URL"].removeprefix("sqlite:///"), isolation_level=None)
+    try:
+        conn.execute("UPDATE tasks SET rowid = rowid + 100000")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    client.post("/tasks", json={"task_name": "Read", "routine_type": "yoga evening"}, headers=auth_headers)
+    client.delete("/tasks/Morning yoga", headers=auth_headers)
+    assert sorted(search(client, auth_headers, "yoga")) == ["Read", "Yoga stretches"]
+    assert search(client, auth_headers, "chore") == []
+    assert search(client, auth_headers, "morning") == []
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from app import transfer
+
+ROUTINE = {
+    "title": "Monday",
+    "content": "Morning routine\n- Stretch (10 min)",
+    "plan": {"morning": [{"title": "Stretch", "minutes": 10, "optional": False}], "evening": [{"title": "Read", "minutes": 15, "optional": True}]},
+}
+
+
+def export(client, headers) -> list[dict]:
+    response = client.get("/export", headers=headers)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_an_export_imports_into_another_account_unchanged(client, new_user):
+    ann, bob = new_user(), new_user()
+    client.post("/tasks:batch", json=[
+        {"task_name": "Stretch", "routine_type": "morning", "amount_of_time": 10, "necessity_level": 4},
+        {"task_name": "Read"},
+    ], headers=ann)
+    client.post("/routines", json=ROUTINE, headers=ann)
+    exported = export(client, ann)
+    header, *records = exported
+    assert header["type"] == "export" and header["version"] == transfer.EXPORT_VERSION
+    assert [record["type"] for record in records] == ["task", "task", "routine"]
+
+    body = "".join(json.dumps(record) + "\n" for record in exported)
+    assert client.post("/import", content=body, headers=bob).json() == {"tasks": 2, "routines": 1, "skipped": 0, "errors": []}
+    assert export(client, bob)[1:] == records
+    # tasks are upserted by name, routines are added again
+    client.post("/import", content=body, headers=bob)
+    assert [record["type"] for record in export(client, bob)[1:]] == ["task", "task", "routine", "routine"]
+
+
+def test_bad_lines_are_skipped_and_reported(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(transfer, "MAX_IMPORT_LINE", 100)
+    lines = [
+        '{"type": "task", "task_name": "Stretch"}',
+        "not json",
+        '{"type": "task", "task_name": ""}',
+        '{"type": "habit", "name": "Stretch"}',
+        json.dumps({"type": "task", "task_name": "x" * 200}),
+        "",
+        '{"type": "routine", "content": "Evening routine\\n- Read (15 min)"}',
+    ]
+    result = client.post("/import", content="\n".join(lines), headers=auth_headers).json()
+    assert (result["tasks"], result["routines"], result["skipped"]) == (1, 1, 4)
+    assert [error["line"] for error in result["errors"]] == [2, 3, 4, 5]
+    assert result["errors"][2]["detail"] == "Unknown record type 'habit'"
+    assert result["errors"][3]["detail"] == "Line longer than 100 bytes"
+    # a routine without a plan is parsed from its content
+    routine = export(client, auth_headers)[-1]
+    assert routine["plan"]["evening"] == [{"title": "Read", "minutes": 15, "optional": False}]
+
+
+def test_an_unknown_export_version_is_refused(client, auth_headers):
+    response = client.post("/import", content='{"type": "export", "version": 99}\n', headers=auth_headers)
+    assert response.status_code == 422
+
+
+def test_lines_are_split_across_chunks_and_oversized_ones_dropped_as_they_arrive(monkeypatch):
+    monkeypatch.setattr(transfer, "MAX_IMPORT_LINE", 8)
+
+    async def chunks():
+        for chunk in (b'{"a":', b"1}\nshort\n", b"x" * 6, b"x" * 6, b"x\nend"):
+            yield chunk
+
+    async def run():
+        return [line async for line in transfer._split_lines(chunks())]
+
+    assert asyncio.run(run()) == [b'{"a":1}', b"short", None, b"end"]